@@ -0,0 +1,231 @@
+"""esquema inicial
+
+Crea el esquema tal como lo dejaba `Base.metadata.create_all`. Las bases de
+datos creadas antes de usar Alembic ya tienen parte de estas tablas: solo se
+crean las que faltan y se agregan las columnas que `init_database` agregaba
+con ALTER TABLE (incluida la carrera de los jefes de carrera existentes).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 18:00:56.456529
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JEFES_POR_CARRERA = {
+    'jefe_informatica': 'Licenciatura en Informática',
+    'jefe_enfermeria': 'Licenciatura en Enfermería',
+    'jefe_contaduria': 'Licenciatura en Contaduría',
+}
+
+
+def _crear_tabla(existentes, nombre, *columnas, indices=()):
+    """Crea la tabla y sus índices si todavía no existe."""
+    if nombre in existentes:
+        return
+    op.create_table(nombre, *columnas)
+    for indice, cols, unico in indices:
+        op.create_index(indice, nombre, cols, unique=unico)
+
+
+def _agregar_columnas_faltantes(tabla, columnas):
+    """Agrega las columnas que falten y regresa sus nombres."""
+    existentes = {c['name'] for c in sa.inspect(op.get_bind()).get_columns(tabla)}
+    faltantes = [c for c in columnas if c.name not in existentes]
+    if faltantes:
+        with op.batch_alter_table(tabla) as batch_op:
+            for columna in faltantes:
+                batch_op.add_column(columna)
+    return {c.name for c in faltantes}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+
+    _crear_tabla(
+        existentes, 'academias',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('codigo', sa.String(), nullable=True),
+        sa.Column('descripcion', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('codigo'),
+        indices=[('ix_academias_id', ['id'], False), ('ix_academias_nombre', ['nombre'], True)],
+    )
+    _crear_tabla(
+        existentes, 'aulas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('capacidad', sa.Integer(), nullable=True),
+        sa.Column('tipo', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_aulas_id', ['id'], False), ('ix_aulas_nombre', ['nombre'], True)],
+    )
+    _crear_tabla(
+        existentes, 'carreras',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('codigo', sa.String(), nullable=True),
+        sa.Column('descripcion', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('codigo'),
+        indices=[('ix_carreras_id', ['id'], False), ('ix_carreras_nombre', ['nombre'], True)],
+    )
+    _crear_tabla(
+        existentes, 'profesores',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[
+            ('ix_profesores_email', ['email'], True),
+            ('ix_profesores_id', ['id'], False),
+            ('ix_profesores_nombre', ['nombre'], False),
+        ],
+    )
+    _crear_tabla(
+        existentes, 'tipos_examen',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('descripcion', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_tipos_examen_id', ['id'], False), ('ix_tipos_examen_nombre', ['nombre'], True)],
+    )
+    _crear_tabla(
+        existentes, 'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('role', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('carrera', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[
+            ('ix_users_email', ['email'], True),
+            ('ix_users_id', ['id'], False),
+            ('ix_users_username', ['username'], True),
+        ],
+    )
+    _crear_tabla(
+        existentes, 'versiones_datos',
+        sa.Column('nombre', sa.String(), nullable=False),
+        sa.Column('version', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('nombre'),
+    )
+    _crear_tabla(
+        existentes, 'grupos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre_grupo', sa.String(), nullable=True),
+        sa.Column('carrera_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['carrera_id'], ['carreras.id']),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_grupos_id', ['id'], False)],
+    )
+    _crear_tabla(
+        existentes, 'materias',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nombre', sa.String(), nullable=True),
+        sa.Column('carrera_id', sa.Integer(), nullable=True),
+        sa.Column('profesor_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['carrera_id'], ['carreras.id']),
+        sa.ForeignKeyConstraint(['profesor_id'], ['profesores.id']),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_materias_id', ['id'], False)],
+    )
+    _crear_tabla(
+        existentes, 'examenes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=True),
+        sa.Column('hora_inicio', sa.Time(), nullable=True),
+        sa.Column('hora_fin', sa.Time(), nullable=True),
+        sa.Column('tipo', sa.String(), nullable=True),
+        sa.Column('materia_id', sa.Integer(), nullable=True),
+        sa.Column('aula_id', sa.Integer(), nullable=True),
+        sa.Column('grupo_id', sa.Integer(), nullable=True),
+        sa.Column('sinodal_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('comentarios_rechazo', sa.Text(), nullable=True),
+        sa.Column('fecha_envio', sa.Date(), nullable=True),
+        sa.Column('fecha_aprobacion', sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(['aula_id'], ['aulas.id']),
+        sa.ForeignKeyConstraint(['grupo_id'], ['grupos.id']),
+        sa.ForeignKeyConstraint(['materia_id'], ['materias.id']),
+        sa.ForeignKeyConstraint(['sinodal_id'], ['profesores.id']),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_examenes_id', ['id'], False)],
+    )
+    _crear_tabla(
+        existentes, 'horarios',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dia_semana', sa.String(), nullable=True),
+        sa.Column('hora_inicio', sa.Time(), nullable=True),
+        sa.Column('hora_fin', sa.Time(), nullable=True),
+        sa.Column('grupo_id', sa.Integer(), nullable=True),
+        sa.Column('materia_id', sa.Integer(), nullable=True),
+        sa.Column('aula_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['aula_id'], ['aulas.id']),
+        sa.ForeignKeyConstraint(['grupo_id'], ['grupos.id']),
+        sa.ForeignKeyConstraint(['materia_id'], ['materias.id']),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_horarios_id', ['id'], False)],
+    )
+    _crear_tabla(
+        existentes, 'restricciones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('profesor_id', sa.Integer(), nullable=True),
+        sa.Column('aula_id', sa.Integer(), nullable=True),
+        sa.Column('grupo_id', sa.Integer(), nullable=True),
+        sa.Column('fecha', sa.Date(), nullable=True),
+        sa.Column('hora_inicio', sa.Time(), nullable=True),
+        sa.Column('hora_fin', sa.Time(), nullable=True),
+        sa.Column('motivo', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['aula_id'], ['aulas.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['grupo_id'], ['grupos.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['profesor_id'], ['profesores.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        indices=[('ix_restricciones_id', ['id'], False)],
+    )
+
+    # Columnas que se agregaron después de crear las primeras bases de datos
+    if 'examenes' in existentes:
+        _agregar_columnas_faltantes('examenes', [
+            sa.Column('sinodal_id', sa.Integer(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True, server_default='borrador'),
+            sa.Column('comentarios_rechazo', sa.Text(), nullable=True),
+            sa.Column('fecha_envio', sa.Date(), nullable=True),
+            sa.Column('fecha_aprobacion', sa.Date(), nullable=True),
+        ])
+    if 'users' in existentes:
+        agregadas = _agregar_columnas_faltantes('users', [
+            sa.Column('carrera', sa.String(), nullable=True),
+        ])
+        if 'carrera' in agregadas:
+            # Los jefes de carrera existentes se identificaban por su usuario
+            users = sa.table('users', sa.column('username'), sa.column('role'), sa.column('carrera'))
+            for username, carrera in JEFES_POR_CARRERA.items():
+                op.execute(
+                    users.update()
+                    .where(users.c.username == username, users.c.role == 'jefe_carrera')
+                    .values(carrera=carrera)
+                )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabla in (
+        'restricciones', 'horarios', 'examenes', 'materias', 'grupos', 'versiones_datos',
+        'users', 'tipos_examen', 'profesores', 'carreras', 'aulas', 'academias',
+    ):
+        op.drop_table(tabla)
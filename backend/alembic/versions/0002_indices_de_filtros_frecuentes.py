@@ -0,0 +1,57 @@
+"""indices de filtros frecuentes
+
+Índices para las columnas por las que filtran los endpoints más usados:
+horarios por grupo, materias por carrera y exámenes por materia, fecha,
+aula, grupo, sinodal y status. Las bases creadas con `create_all` después de
+este cambio ya los tienen; en ese caso no se vuelven a crear.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 18:04:12.118032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = [
+    ('ix_horarios_grupo_id', 'horarios', ['grupo_id']),
+    ('ix_horarios_materia_id', 'horarios', ['materia_id']),
+    ('ix_materias_carrera_id', 'materias', ['carrera_id']),
+    ('ix_materias_profesor_id', 'materias', ['profesor_id']),
+    ('ix_grupos_carrera_id', 'grupos', ['carrera_id']),
+    ('ix_examenes_materia_id', 'examenes', ['materia_id']),
+    ('ix_examenes_fecha', 'examenes', ['fecha']),
+    ('ix_examenes_status', 'examenes', ['status']),
+    ('ix_examenes_aula_fecha_hora', 'examenes', ['aula_id', 'fecha', 'hora_inicio']),
+    ('ix_examenes_grupo_fecha', 'examenes', ['grupo_id', 'fecha']),
+    ('ix_examenes_sinodal_fecha', 'examenes', ['sinodal_id', 'fecha']),
+]
+
+
+def _indices_existentes(tabla):
+    return {i['name'] for i in sa.inspect(op.get_bind()).get_indexes(tabla)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existentes = {}
+    for nombre, tabla, columnas in INDICES:
+        if tabla not in existentes:
+            existentes[tabla] = _indices_existentes(tabla)
+        if nombre not in existentes[tabla]:
+            op.create_index(nombre, tabla, columnas, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for nombre, tabla, _ in reversed(INDICES):
+        op.drop_index(nombre, table_name=tabla)
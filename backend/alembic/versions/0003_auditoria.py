@@ -0,0 +1,59 @@
+"""auditoria
+
+Tabla `auditoria` con el diseño de db/init/base.sql (sin llaves foráneas, para
+que los registros sobrevivan al borrado de lo que describen). Si ya existe
+porque la base se creó con ese script, no se vuelve a crear.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 21:40:37.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if 'auditoria' not in inspector.get_table_names():
+        op.create_table(
+            'auditoria',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('accion', sa.String(length=100), nullable=False),
+            sa.Column('tabla_afectada', sa.String(length=50), nullable=True),
+            sa.Column('registro_id', sa.Integer(), nullable=True),
+            sa.Column('usuario_id', sa.Integer(), nullable=True),
+            sa.Column('examen_id', sa.Integer(), nullable=True),
+            sa.Column('grupo_id', sa.Integer(), nullable=True),
+            sa.Column('aula_id', sa.Integer(), nullable=True),
+            sa.Column('tipo_examen_id', sa.Integer(), nullable=True),
+            sa.Column('datos_anteriores', sa.Text(), nullable=True),
+            sa.Column('datos_nuevos', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_auditoria_id', 'auditoria', ['id'], unique=False)
+
+    existentes = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('auditoria')}
+    if 'ix_auditoria_created_at' not in existentes:
+        op.create_index('ix_auditoria_created_at', 'auditoria', ['created_at'], unique=False)
+    if 'ix_auditoria_tabla_registro' not in existentes:
+        op.create_index('ix_auditoria_tabla_registro', 'auditoria', ['tabla_afectada', 'registro_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_auditoria_tabla_registro', table_name='auditoria')
+    op.drop_index('ix_auditoria_created_at', table_name='auditoria')
+    op.drop_index('ix_auditoria_id', table_name='auditoria')
+    op.drop_table('auditoria')
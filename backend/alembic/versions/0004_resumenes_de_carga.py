@@ -0,0 +1,98 @@
+"""resumenes de carga
+
+Tablas `carga_profesores` y `uso_aulas` (app/estadisticas.py), llenadas a
+partir de los horarios y exámenes existentes.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 23:05:12.481930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'carga_profesores',
+        sa.Column('profesor_id', sa.Integer(), nullable=False),
+        sa.Column('carrera_id', sa.Integer(), nullable=False),
+        sa.Column('clases', sa.Integer(), nullable=False),
+        sa.Column('minutos_clase', sa.Integer(), nullable=False),
+        sa.Column('examenes_sinodal', sa.Integer(), nullable=False),
+        sa.Column('minutos_sinodal', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('profesor_id', 'carrera_id'),
+    )
+    op.create_table(
+        'uso_aulas',
+        sa.Column('aula_id', sa.Integer(), nullable=False),
+        sa.Column('carrera_id', sa.Integer(), nullable=False),
+        sa.Column('clases', sa.Integer(), nullable=False),
+        sa.Column('minutos_clase', sa.Integer(), nullable=False),
+        sa.Column('examenes', sa.Integer(), nullable=False),
+        sa.Column('minutos_examen', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('aula_id', 'carrera_id'),
+    )
+
+    # Llenado inicial con SQL plano, igual que app.estadisticas.recalcular
+    dialecto = op.get_bind().dialect.name
+    minutos_horario = _duracion('h', dialecto)
+    minutos_examen = _duracion('e', dialecto)
+    op.execute(f"""
+        INSERT INTO carga_profesores (profesor_id, carrera_id, clases, minutos_clase, examenes_sinodal, minutos_sinodal)
+        SELECT profesor_id, carrera_id, SUM(clases), SUM(minutos_clase), SUM(examenes), SUM(minutos_examen)
+        FROM (
+            SELECT m.profesor_id AS profesor_id, COALESCE(m.carrera_id, 0) AS carrera_id,
+                   1 AS clases, {minutos_horario} AS minutos_clase, 0 AS examenes, 0 AS minutos_examen
+            FROM horarios h JOIN materias m ON m.id = h.materia_id
+            WHERE m.profesor_id IS NOT NULL
+            UNION ALL
+            SELECT e.sinodal_id, COALESCE(m.carrera_id, 0), 0, 0, 1, {minutos_examen}
+            FROM examenes e LEFT JOIN materias m ON m.id = e.materia_id
+            WHERE e.sinodal_id IS NOT NULL
+        ) aportes
+        GROUP BY profesor_id, carrera_id
+    """)
+    op.execute(f"""
+        INSERT INTO uso_aulas (aula_id, carrera_id, clases, minutos_clase, examenes, minutos_examen)
+        SELECT aula_id, carrera_id, SUM(clases), SUM(minutos_clase), SUM(examenes), SUM(minutos_examen)
+        FROM (
+            SELECT h.aula_id AS aula_id, COALESCE(m.carrera_id, 0) AS carrera_id,
+                   1 AS clases, {minutos_horario} AS minutos_clase, 0 AS examenes, 0 AS minutos_examen
+            FROM horarios h LEFT JOIN materias m ON m.id = h.materia_id
+            WHERE h.aula_id IS NOT NULL
+            UNION ALL
+            SELECT e.aula_id, COALESCE(m.carrera_id, 0), 0, 0, 1, {minutos_examen}
+            FROM examenes e LEFT JOIN materias m ON m.id = e.materia_id
+            WHERE e.aula_id IS NOT NULL
+        ) aportes
+        GROUP BY aula_id, carrera_id
+    """)
+
+
+def _duracion(alias: str, dialecto: str) -> str:
+    """Minutos entre hora_inicio y hora_fin de la tabla `alias` (0 si falta alguna)."""
+    def minutos(columna):
+        if dialecto == 'sqlite':
+            # SQLite guarda las horas como texto 'HH:MM:SS'
+            return f"(CAST(substr({columna}, 1, 2) AS INTEGER) * 60 + CAST(substr({columna}, 4, 2) AS INTEGER))"
+        return f"CAST(EXTRACT(HOUR FROM {columna}) * 60 + EXTRACT(MINUTE FROM {columna}) AS INTEGER)"
+    inicio, fin = minutos(f"{alias}.hora_inicio"), minutos(f"{alias}.hora_fin")
+    return (f"CASE WHEN {alias}.hora_inicio IS NULL OR {alias}.hora_fin IS NULL OR {fin} < {inicio} THEN 0 "
+            f"ELSE {fin} - {inicio} END")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('uso_aulas')
+    op.drop_table('carga_profesores')
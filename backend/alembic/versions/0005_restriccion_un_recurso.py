@@ -0,0 +1,63 @@
+"""restriccion un recurso
+
+Cada restricción indica exactamente uno de profesor, aula o grupo, como el
+CHECK de db/init/base.sql. Las filas que no cumplen se corrigen antes: las
+que no indican ninguno se borran y las que indican varios se separan en una
+restricción por recurso, con la misma fecha, horas y motivo.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:12:44.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NOMBRE = 'ck_restricciones_un_recurso'
+CONDICION = (
+    "(CASE WHEN profesor_id IS NOT NULL THEN 1 ELSE 0 END) + "
+    "(CASE WHEN aula_id IS NOT NULL THEN 1 ELSE 0 END) + "
+    "(CASE WHEN grupo_id IS NOT NULL THEN 1 ELSE 0 END) = 1"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM restricciones WHERE profesor_id IS NULL AND aula_id IS NULL AND grupo_id IS NULL")
+    # Se conserva el primer recurso (profesor, aula, grupo) y los demás pasan a filas nuevas
+    op.execute("""
+        INSERT INTO restricciones (aula_id, fecha, hora_inicio, hora_fin, motivo)
+        SELECT aula_id, fecha, hora_inicio, hora_fin, motivo FROM restricciones
+        WHERE profesor_id IS NOT NULL AND aula_id IS NOT NULL
+    """)
+    op.execute("""
+        INSERT INTO restricciones (grupo_id, fecha, hora_inicio, hora_fin, motivo)
+        SELECT grupo_id, fecha, hora_inicio, hora_fin, motivo FROM restricciones
+        WHERE grupo_id IS NOT NULL AND (profesor_id IS NOT NULL OR aula_id IS NOT NULL)
+    """)
+    op.execute("UPDATE restricciones SET aula_id = NULL WHERE profesor_id IS NOT NULL")
+    op.execute("UPDATE restricciones SET grupo_id = NULL WHERE profesor_id IS NOT NULL OR aula_id IS NOT NULL")
+
+    # Las bases creadas con db/init/base.sql ya tienen el CHECK (sin nombre)
+    existentes = sa.inspect(op.get_bind()).get_check_constraints('restricciones')
+    if any(c.get('name') == NOMBRE or 'grupo_id IS NOT NULL' in (c.get('sqltext') or '') for c in existentes):
+        return
+    with op.batch_alter_table('restricciones') as batch:
+        batch.create_check_constraint(NOMBRE, CONDICION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    existentes = sa.inspect(op.get_bind()).get_check_constraints('restricciones')
+    if any(c.get('name') == NOMBRE for c in existentes):
+        with op.batch_alter_table('restricciones') as batch:
+            batch.drop_constraint(NOMBRE, type_='check')
@@ -0,0 +1,67 @@
+"""
+Flujo de aprobación de exámenes: borrador -> pendiente_aprobacion -> aprobado | rechazado.
+
+Cada acción mueve un conjunto de exámenes con un solo UPDATE ... WHERE
+status IN (estados de origen): la validación de la transición la hace la base
+de datos y los exámenes que no están en un estado válido simplemente no se
+tocan. No se cargan objetos del ORM.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+BORRADOR = 'borrador'
+PENDIENTE = 'pendiente_aprobacion'
+APROBADO = 'aprobado'
+RECHAZADO = 'rechazado'
+
+
+@dataclass(frozen=True)
+class Transicion:
+    origenes: Tuple[str, ...]
+    destino: str
+
+
+TRANSICIONES: Dict[str, Transicion] = {
+    # Un examen rechazado se corrige y se vuelve a enviar
+    'enviar': Transicion((BORRADOR, RECHAZADO), PENDIENTE),
+    'aprobar': Transicion((PENDIENTE,), APROBADO),
+    'rechazar': Transicion((PENDIENTE,), RECHAZADO),
+}
+
+
+def mover(db: Session, accion: str, condiciones, comentarios: str = None) -> List[int]:
+    """
+    Aplica la transición a los exámenes que cumplen `condiciones` y regresa los
+    IDs que cambiaron. No hace commit.
+    """
+    transicion = TRANSICIONES[accion]
+    hoy = date.today()
+    valores = {models.Examen.status: transicion.destino}
+    if accion == 'enviar':
+        valores[models.Examen.fecha_envio] = hoy
+        valores[models.Examen.comentarios_rechazo] = None
+    elif accion == 'aprobar':
+        valores[models.Examen.fecha_aprobacion] = hoy
+    elif accion == 'rechazar':
+        valores[models.Examen.comentarios_rechazo] = comentarios
+
+    origen = models.Examen.status.in_(transicion.origenes)
+    if BORRADOR in transicion.origenes:
+        # Exámenes creados antes de que existiera la columna
+        origen = or_(origen, models.Examen.status.is_(None))
+
+    sentencia = (
+        update(models.Examen)
+        .where(*condiciones, origen)
+        .values(valores)
+        .returning(models.Examen.id)
+        # El estado no cambia la ocupación de aulas ni profesores
+        .execution_options(synchronize_session=False, disponibilidad=False)
+    )
+    return sorted(db.execute(sentencia).scalars())
@@ -0,0 +1,295 @@
+"""
+Bitácora de cambios (tabla `auditoria`) con escritura diferida en lotes.
+
+Los eventos de la sesión capturan cada cambio al hacer flush: filas nuevas,
+columnas modificadas (antes y después) y filas borradas. Las escrituras
+masivas (insert()/update()/delete() y query.delete()) también se registran
+por fila, con las filas antes y después que entrega app/masivas.py. Las
+entradas se guardan en la sesión y pasan a la cola hasta que la transacción
+se confirma; si se revierte, se descartan.
+
+Una tarea en segundo plano vacía la cola cada AUDITORIA_INTERVALO segundos con
+INSERTs de AUDITORIA_LOTE filas. La cola tiene un máximo (AUDITORIA_COLA): si
+se llena, el hilo que agrega escribe él mismo lo pendiente en lugar de perder
+entradas. Al apagar la aplicación (y al salir de los scripts) se vacía la
+cola.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+import anyio
+from sqlalchemy import event, insert, inspect
+
+from . import masivas, metricas, models
+from .auth import cache_tokens, decode_access_token
+from .database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+AUDITORIA_COLA = int(os.getenv("AUDITORIA_COLA", "10000"))
+AUDITORIA_LOTE = int(os.getenv("AUDITORIA_LOTE", "500"))
+AUDITORIA_INTERVALO = float(os.getenv("AUDITORIA_INTERVALO", "1.0"))
+
+# Tablas que no se auditan: la propia bitácora y los tokens de versión
+EXCLUIDOS = (models.Auditoria, models.VersionDatos)
+# Columnas que se registran como cambiadas pero sin su valor
+OCULTAS = {'hashed_password'}
+
+usuario_actual: ContextVar[Optional[int]] = ContextVar("usuario_auditoria", default=None)
+
+
+@dataclass
+class Entrada:
+    accion: str
+    tabla_afectada: str
+    registro_id: Optional[int] = None
+    datos_anteriores: Optional[dict] = None
+    datos_nuevos: Optional[dict] = None
+    usuario_id: Optional[int] = field(default_factory=usuario_actual.get)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    def fila(self) -> dict:
+        datos = self.datos_nuevos or self.datos_anteriores or {}
+        es_examen = self.tabla_afectada == models.Examen.__tablename__
+        return {
+            "accion": self.accion,
+            "tabla_afectada": self.tabla_afectada,
+            "registro_id": self.registro_id,
+            "usuario_id": self.usuario_id,
+            "examen_id": self.registro_id if es_examen else datos.get("examen_id"),
+            "grupo_id": datos.get("grupo_id"),
+            "aula_id": datos.get("aula_id"),
+            "tipo_examen_id": datos.get("tipo_examen_id"),
+            "datos_anteriores": _json(self.datos_anteriores),
+            "datos_nuevos": _json(self.datos_nuevos),
+            "created_at": self.created_at,
+        }
+
+
+def _json(datos):
+    if datos is None:
+        return None
+    return json.dumps(datos, default=str, ensure_ascii=False)
+
+
+def _valor(columna: str, valor):
+    return '***' if columna in OCULTAS and valor is not None else valor
+
+
+class ColaAuditoria:
+    def __init__(self, maximo: int = AUDITORIA_COLA, lote: int = AUDITORIA_LOTE):
+        self.maximo = maximo
+        self.lote = lote
+        self._pendientes: deque = deque()
+        self._lock = threading.Lock()
+        # Serializa las escrituras para no intercalar lotes de dos hilos
+        self._escritura = threading.Lock()
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    def agregar(self, entradas: List[Entrada]):
+        desborde = None
+        with self._lock:
+            if len(self._pendientes) + len(entradas) > self.maximo:
+                desborde = list(self._pendientes) + list(entradas)
+                self._pendientes.clear()
+            else:
+                self._pendientes.extend(entradas)
+        if desborde is not None:
+            logger.warning("Cola de auditoría llena; se escriben %d entradas en la petición", len(desborde))
+            self._escribir(desborde)
+
+    def _tomar(self) -> List[Entrada]:
+        with self._lock:
+            n = min(self.lote, len(self._pendientes))
+            return [self._pendientes.popleft() for _ in range(n)]
+
+    def vaciar(self) -> int:
+        """Escribe todo lo pendiente en lotes; regresa cuántas entradas escribió."""
+        escritas = 0
+        while True:
+            lote = self._tomar()
+            if not lote:
+                return escritas
+            if not self._escribir(lote):
+                return escritas
+            escritas += len(lote)
+
+    def _escribir(self, entradas: List[Entrada]) -> bool:
+        try:
+            with self._escritura:
+                for i in range(0, len(entradas), self.lote):
+                    with engine.begin() as conn:
+                        conn.execute(insert(models.Auditoria), [e.fila() for e in entradas[i:i + self.lote]])
+            return True
+        except Exception:
+            logger.exception("No se pudieron escribir %d entradas de auditoría", len(entradas))
+            # Se regresan al frente para el siguiente intento, sin pasar del máximo
+            with self._lock:
+                cupo = self.maximo - len(self._pendientes)
+                if cupo < len(entradas):
+                    logger.error("Se descartan %d entradas de auditoría", len(entradas) - max(cupo, 0))
+                self._pendientes.extendleft(reversed(entradas[:max(cupo, 0)]))
+            return False
+
+
+cola = ColaAuditoria()
+atexit.register(cola.vaciar)
+
+
+@metricas.recolector
+def _metricas_cola():
+    yield 'auditoria_queue_length', 'gauge', 'Entradas de auditoría en espera de escribirse', {}, len(cola)
+
+
+_tarea: Optional[asyncio.Task] = None
+
+
+async def _ciclo(intervalo: float):
+    while True:
+        await asyncio.sleep(intervalo)
+        if len(cola):
+            await anyio.to_thread.run_sync(cola.vaciar)
+
+
+def iniciar(intervalo: float = AUDITORIA_INTERVALO):
+    """Arranca la tarea que vacía la cola; se llama desde el lifespan."""
+    global _tarea
+    if _tarea is None:
+        _tarea = asyncio.get_running_loop().create_task(_ciclo(intervalo))
+
+
+async def detener():
+    """Detiene la tarea y escribe lo que quede en la cola."""
+    global _tarea
+    if _tarea is not None:
+        _tarea.cancel()
+        try:
+            await _tarea
+        except asyncio.CancelledError:
+            pass
+        _tarea = None
+    await anyio.to_thread.run_sync(cola.vaciar)
+
+
+def usuario_de_token(token: str) -> Optional[int]:
+    """ID del usuario del token: de la caché de tokens o del claim uid, sin ir a la base de datos."""
+    encontrado = cache_tokens.get(token)
+    if encontrado is not None:
+        return encontrado[1].id
+    claims = decode_access_token(token)
+    return claims.get("uid") if claims else None
+
+
+async def middleware_auditoria(request, call_next):
+    """Guarda quién hace la petición para las entradas de auditoría que genere."""
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        return await call_next(request)
+    autorizacion = request.headers.get("authorization", "")
+    usuario_id = None
+    if autorizacion.lower().startswith("bearer "):
+        usuario_id = usuario_de_token(autorizacion[7:])
+    token = usuario_actual.set(usuario_id)
+    try:
+        return await call_next(request)
+    finally:
+        usuario_actual.reset(token)
+
+
+# ---- Captura de cambios ----
+
+def _pendientes(session) -> List[Entrada]:
+    return session.info.setdefault('auditoria', [])
+
+
+def _columnas(obj):
+    mapper = inspect(obj).mapper
+    return [(attr.key, attr.columns[0].name) for attr in mapper.column_attrs]
+
+
+def _identidad(obj) -> Optional[int]:
+    llave = inspect(obj).mapper.primary_key_from_instance(obj)
+    return llave[0] if len(llave) == 1 else None
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capturar_flush(session, flush_context):
+    entradas = _pendientes(session)
+    for obj in session.new:
+        if isinstance(obj, EXCLUIDOS):
+            continue
+        nuevos = {col: _valor(col, getattr(obj, key)) for key, col in _columnas(obj)}
+        entradas.append(Entrada('crear', obj.__tablename__, _identidad(obj), None, nuevos))
+
+    for obj in session.dirty:
+        if isinstance(obj, EXCLUIDOS):
+            continue
+        estado = inspect(obj)
+        antes, despues = {}, {}
+        for key, col in _columnas(obj):
+            historial = estado.attrs[key].history
+            if not historial.has_changes():
+                continue
+            antes[col] = _valor(col, historial.deleted[0] if historial.deleted else None)
+            despues[col] = _valor(col, historial.added[0] if historial.added else None)
+        if despues:
+            # Las columnas que identifican al registro van siempre, aunque no cambien
+            for col in ('grupo_id', 'aula_id'):
+                if col not in despues and hasattr(obj, col):
+                    despues[col] = getattr(obj, col)
+            entradas.append(Entrada('modificar', obj.__tablename__, _identidad(obj), antes, despues))
+
+    for obj in session.deleted:
+        if isinstance(obj, EXCLUIDOS):
+            continue
+        anteriores = {col: _valor(col, getattr(obj, key)) for key, col in _columnas(obj)}
+        entradas.append(Entrada('eliminar', obj.__tablename__, _identidad(obj), anteriores, None))
+
+
+@masivas.suscribir(excluir=EXCLUIDOS)
+def _capturar_masivo(session, modelo, accion, cambios):
+    tabla = modelo.__tablename__
+    entradas = _pendientes(session)
+    for antes, despues in cambios:
+        if antes is None:
+            datos = {col: _valor(col, v) for col, v in despues.items()}
+            entradas.append(Entrada('crear', tabla, datos.get('id'), None, datos))
+        elif despues is None:
+            datos = {col: _valor(col, v) for col, v in antes.items()}
+            entradas.append(Entrada('eliminar', tabla, antes.get('id'), datos, None))
+        else:
+            cambiadas = [col for col, v in despues.items() if antes.get(col) != v]
+            if not cambiadas:
+                continue
+            anteriores = {col: _valor(col, antes.get(col)) for col in cambiadas}
+            nuevos = {col: _valor(col, despues[col]) for col in cambiadas}
+            for col in ('grupo_id', 'aula_id'):
+                if col not in nuevos and col in despues:
+                    nuevos[col] = despues[col]
+            entradas.append(Entrada('modificar', tabla, despues.get('id'), anteriores, nuevos))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _encolar(session):
+    entradas = session.info.pop('auditoria', None)
+    if entradas:
+        try:
+            cola.agregar(entradas)
+        except Exception:
+            # El commit ya ocurrió; un problema con la bitácora no debe fallar la petición
+            logger.exception("No se pudieron encolar %d entradas de auditoría", len(entradas))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar(session):
+    session.info.pop('auditoria', None)
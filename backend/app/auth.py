@@ -1,16 +1,30 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from . import models
+from .database import SessionLocal
+
 # Configuración de seguridad
 SECRET_KEY = "hola"  # Cambiar en producción
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Caché de tokens verificados. Cada worker tiene la suya: las bajas hechas en
+# otro worker se notan a más tardar en AUTH_CACHE_TTL segundos.
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 300))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", 10000))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
@@ -40,3 +54,138 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
+
+
+@dataclass(frozen=True)
+class UsuarioActual:
+    """Datos del usuario necesarios para autorizar, sin la contraseña."""
+    id: int
+    username: str
+    role: str
+    email: Optional[str]
+    carrera: Optional[str]
+    is_active: bool
+
+    @classmethod
+    def de_modelo(cls, user: models.User) -> "UsuarioActual":
+        return cls(user.id, user.username, user.role, user.email, user.carrera, bool(user.is_active))
+
+
+class CacheTokens:
+    """
+    LRU acotada de tokens ya verificados -> (claims, usuario). Cada entrada
+    vence a los `ttl` segundos o cuando expira el token, lo que ocurra antes.
+    """
+
+    def __init__(self, maximo: int = AUTH_CACHE_MAX, ttl: float = AUTH_CACHE_TTL):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[str, Tuple[float, dict, UsuarioActual]]" = OrderedDict()
+        self._por_usuario: Dict[int, Set[str]] = defaultdict(set)
+
+    def get(self, token: str) -> Optional[Tuple[dict, UsuarioActual]]:
+        with self._lock:
+            entrada = self._entradas.get(token)
+            if entrada is None:
+                return None
+            vence, claims, usuario = entrada
+            if vence <= time.monotonic():
+                self._quitar(token)
+                return None
+            self._entradas.move_to_end(token)
+            return claims, usuario
+
+    def put(self, token: str, claims: dict, usuario: UsuarioActual):
+        vigencia = self.ttl
+        if "exp" in claims:
+            vigencia = min(vigencia, claims["exp"] - time.time())
+        if vigencia <= 0:
+            return
+        with self._lock:
+            self._quitar(token)
+            self._entradas[token] = (time.monotonic() + vigencia, claims, usuario)
+            self._por_usuario[usuario.id].add(token)
+            while len(self._entradas) > self.maximo:
+                self._quitar(next(iter(self._entradas)))
+
+    def invalidar_usuario(self, user_id: int):
+        """Olvida todos los tokens de un usuario (baja, desactivación o cambio de rol)."""
+        with self._lock:
+            for token in list(self._por_usuario.get(user_id, ())):
+                self._quitar(token)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_usuario.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _quitar(self, token: str):
+        entrada = self._entradas.pop(token, None)
+        if entrada is not None:
+            tokens = self._por_usuario.get(entrada[2].id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._por_usuario[entrada[2].id]
+
+
+cache_tokens = CacheTokens()
+
+
+def verificar_token(token: str) -> Optional[Tuple[dict, UsuarioActual]]:
+    """
+    Claims y usuario de un token válido de un usuario existente, o None.
+    En caché solo cuesta una búsqueda en un diccionario; si no, decodifica el
+    JWT y busca al usuario en la base de datos. Los usuarios inactivos no se
+    guardan en caché.
+    """
+    encontrado = cache_tokens.get(token)
+    if encontrado is not None:
+        return encontrado
+
+    claims = decode_access_token(token)
+    if claims is None or claims.get("sub") is None:
+        return None
+    with SessionLocal() as db:
+        user = db.execute(select(models.User).where(models.User.username == claims["sub"])).scalar()
+        if user is None:
+            return None
+        usuario = UsuarioActual.de_modelo(user)
+    if usuario.is_active:
+        cache_tokens.put(token, claims, usuario)
+    return claims, usuario
+
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> UsuarioActual:
+    """Dependencia: usuario activo dueño del token Bearer de la petición."""
+    verificado = verificar_token(token)
+    if verificado is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar las credenciales",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    usuario = verificado[1]
+    if not usuario.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuario inactivo")
+    return usuario
+
+
+# Roles que pueden tener los usuarios
+ROLES = ('administrador', 'servicios_escolares', 'jefe_carrera', 'secretaria')
+
+
+def requiere_rol(*roles: str):
+    """Dependencia: como get_current_user, pero solo para los roles indicados."""
+    desconocidos = set(roles) - set(ROLES)
+    if desconocidos:
+        raise ValueError(f"Roles desconocidos: {sorted(desconocidos)}")
+    def dependencia(usuario: UsuarioActual = Depends(get_current_user)) -> UsuarioActual:
+        if usuario.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes permiso para esta operación")
+        return usuario
+    return dependencia
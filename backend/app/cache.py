@@ -0,0 +1,97 @@
+"""
+Caché en proceso de respuestas ya serializadas, invalidada por versión de datos.
+
+Cada conjunto de datos (por ahora solo el catálogo de carreras) tiene una fila
+en `versiones_datos` con un token que cambia en cada escritura. La caché guarda
+los bytes JSON junto con el token con el que se construyeron; si el token en la
+base de datos es otro, se reconstruyen. El token también sirve como ETag.
+"""
+import threading
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+CATALOGO = 'catalogo'
+
+# Modelos cuyo cambio invalida el catálogo de /api/carreras
+MODELOS_CATALOGO = (
+    models.Carrera, models.Grupo, models.Horario,
+    models.Materia, models.Profesor, models.Aula,
+)
+
+
+def get_version(db: Session, nombre: str = CATALOGO) -> str:
+    """Regresa el token de versión actual, creándolo si no existe."""
+    version = db.execute(
+        select(models.VersionDatos.version).where(models.VersionDatos.nombre == nombre)
+    ).scalar()
+    if version is None:
+        version = bump_version(db, nombre)
+        db.commit()
+    return version
+
+
+def bump_version(db, nombre: str = CATALOGO) -> str:
+    """
+    Cambia el token de versión. Recibe una sesión o una conexión; el cambio
+    queda en la misma transacción que la escritura que lo provocó.
+    """
+    version = uuid.uuid4().hex
+    result = db.execute(
+        update(models.VersionDatos).where(models.VersionDatos.nombre == nombre).values(version=version)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(models.VersionDatos).values(nombre=nombre, version=version))
+    return version
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _marcar_cambios_catalogo(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, MODELOS_CATALOGO):
+            session.info['catalogo_modificado'] = True
+            return
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _invalidar_catalogo(session, flush_context):
+    if session.info.pop('catalogo_modificado', False):
+        bump_version(session.connection(), CATALOGO)
+
+
+class CacheVersionada:
+    """Guarda un único valor serializado por nombre, junto con su versión."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas: Dict[str, Tuple[str, bytes]] = {}
+
+    def get(self, nombre: str, version: str) -> Optional[bytes]:
+        entrada = self._entradas.get(nombre)
+        if entrada is not None and entrada[0] == version:
+            return entrada[1]
+        return None
+
+    def get_or_build(self, nombre: str, version: str, construir: Callable[[], bytes]) -> bytes:
+        contenido = self.get(nombre, version)
+        if contenido is not None:
+            return contenido
+        with self._lock:
+            # Otro hilo pudo haberlo construido mientras esperábamos
+            contenido = self.get(nombre, version)
+            if contenido is None:
+                contenido = construir()
+                self._entradas[nombre] = (version, contenido)
+        return contenido
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache = CacheVersionada()
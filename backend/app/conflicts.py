@@ -0,0 +1,260 @@
+"""
+Detección de traslapes entre exámenes y restricciones de disponibilidad.
+
+Cada examen ocupa varios recursos (su aula, su grupo, el profesor titular y el
+sinodal) y cada restricción bloquea uno solo. Se arma un índice por recurso con
+los intervalos ordenados por inicio y se recorre con una línea de barrido:
+los intervalos activos se guardan en un heap por hora de fin, así que encontrar
+todos los traslapes cuesta O(n log n + k) en lugar de comparar todos contra
+todos.
+"""
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+Recurso = Tuple[str, int]  # ('aula' | 'grupo' | 'profesor', id)
+
+
+@dataclass(frozen=True)
+class Intervalo:
+    tipo: str  # 'examen' | 'restriccion'
+    id: int
+    fecha: date
+    inicio: int  # minutos desde medianoche
+    fin: int
+    motivo: Optional[str] = None
+
+
+@dataclass
+class Conflicto:
+    recurso: str
+    recurso_id: int
+    fecha: date
+    a: Intervalo
+    b: Intervalo
+
+    def as_dict(self):
+        return {
+            "recurso": self.recurso,
+            "recurso_id": self.recurso_id,
+            "fecha": self.fecha,
+            "hora_inicio": _a_hora(max(self.a.inicio, self.b.inicio)),
+            "hora_fin": _a_hora(min(self.a.fin, self.b.fin)),
+            "a": {"tipo": self.a.tipo, "id": self.a.id, "motivo": self.a.motivo},
+            "b": {"tipo": self.b.tipo, "id": self.b.id, "motivo": self.b.motivo},
+        }
+
+
+def _minutos(t: Optional[time], defecto: int) -> int:
+    return defecto if t is None else t.hour * 60 + t.minute
+
+
+def _a_hora(minutos: int) -> time:
+    minutos = min(minutos, 24 * 60 - 1)
+    return time(minutos // 60, minutos % 60)
+
+
+class IndiceIntervalos:
+    """Intervalos agrupados por (recurso, fecha)."""
+
+    def __init__(self):
+        self._por_recurso: Dict[Tuple[Recurso, date], List[Intervalo]] = defaultdict(list)
+        # Restricciones sin fecha: se aplican a cada fecha en la que el recurso tenga exámenes
+        self._permanentes: Dict[Recurso, List[Intervalo]] = defaultdict(list)
+
+    def agregar_examen(self, examen_id, fecha, hora_inicio, hora_fin, recursos: Iterable[Recurso]):
+        if fecha is None or hora_inicio is None or hora_fin is None:
+            return
+        intervalo = Intervalo('examen', examen_id, fecha, _minutos(hora_inicio, 0), _minutos(hora_fin, 0))
+        # Un mismo profesor puede ser titular y sinodal; se cuenta una sola vez
+        for recurso in set(recursos):
+            if recurso[1] is not None:
+                self._por_recurso[(recurso, fecha)].append(intervalo)
+
+    def agregar_restriccion(self, restriccion_id, recurso: Recurso, fecha, hora_inicio, hora_fin, motivo=None):
+        intervalo = Intervalo(
+            'restriccion', restriccion_id, fecha,
+            _minutos(hora_inicio, 0), _minutos(hora_fin, 24 * 60), motivo,
+        )
+        if fecha is None:
+            self._permanentes[recurso].append(intervalo)
+        else:
+            self._por_recurso[(recurso, fecha)].append(intervalo)
+
+    def _grupos(self):
+        for (recurso, fecha), intervalos in self._por_recurso.items():
+            permanentes = self._permanentes.get(recurso)
+            if permanentes:
+                intervalos = intervalos + [
+                    Intervalo(p.tipo, p.id, fecha, p.inicio, p.fin, p.motivo) for p in permanentes
+                ]
+            yield recurso, fecha, intervalos
+
+    def conflictos(self, tipos_recurso: Optional[Sequence[str]] = None) -> List[Conflicto]:
+        """Todos los pares de intervalos que se traslapan en el mismo recurso."""
+        resultado = []
+        for recurso, fecha, intervalos in self._grupos():
+            if tipos_recurso and recurso[0] not in tipos_recurso:
+                continue
+            for a, b in barrido(intervalos):
+                resultado.append(Conflicto(recurso[0], recurso[1], fecha, a, b))
+        resultado.sort(key=lambda c: (c.fecha, c.recurso, c.recurso_id, c.a.inicio))
+        return resultado
+
+
+def barrido(intervalos: List[Intervalo]) -> Iterable[Tuple[Intervalo, Intervalo]]:
+    """Pares traslapados de una lista de intervalos (misma fecha y recurso)."""
+    activos: List[Tuple[int, int, Intervalo]] = []
+    for n, actual in enumerate(sorted(intervalos, key=lambda i: (i.inicio, i.fin))):
+        while activos and activos[0][0] <= actual.inicio:
+            heapq.heappop(activos)
+        for _, _, otro in activos:
+            # Dos restricciones traslapadas no son un conflicto
+            if otro.tipo == 'restriccion' and actual.tipo == 'restriccion':
+                continue
+            yield otro, actual
+        heapq.heappush(activos, (actual.fin, n, actual))
+
+
+def _consulta_examenes(condiciones=()):
+    return select(
+        models.Examen.id,
+        models.Examen.fecha,
+        models.Examen.hora_inicio,
+        models.Examen.hora_fin,
+        models.Examen.aula_id,
+        models.Examen.grupo_id,
+        models.Materia.profesor_id,
+        models.Examen.sinodal_id,
+    ).join(models.Materia, models.Examen.materia_id == models.Materia.id).where(*condiciones)
+
+
+def _recursos(aula_id, grupo_id, profesor_id, sinodal_id) -> List[Recurso]:
+    return [('aula', aula_id), ('grupo', grupo_id), ('profesor', profesor_id), ('profesor', sinodal_id)]
+
+
+def _agregar_restricciones(indice: IndiceIntervalos, filas):
+    for r_id, profesor_id, aula_id, grupo_id, fecha, inicio, fin, motivo in filas:
+        if profesor_id is not None:
+            recurso = ('profesor', profesor_id)
+        elif aula_id is not None:
+            recurso = ('aula', aula_id)
+        elif grupo_id is not None:
+            recurso = ('grupo', grupo_id)
+        else:
+            continue
+        indice.agregar_restriccion(r_id, recurso, fecha, inicio, fin, motivo)
+
+
+_COLUMNAS_RESTRICCION = (
+    models.Restriccion.id, models.Restriccion.profesor_id, models.Restriccion.aula_id,
+    models.Restriccion.grupo_id, models.Restriccion.fecha, models.Restriccion.hora_inicio,
+    models.Restriccion.hora_fin, models.Restriccion.motivo,
+)
+
+
+def construir_indice(db: Session, fecha_desde: Optional[date] = None, fecha_hasta: Optional[date] = None,
+                     condiciones_examen=()) -> IndiceIntervalos:
+    """Carga exámenes y restricciones del rango de fechas en un índice."""
+    indice = IndiceIntervalos()
+    condiciones = list(condiciones_examen)
+    if fecha_desde is not None:
+        condiciones.append(models.Examen.fecha >= fecha_desde)
+    if fecha_hasta is not None:
+        condiciones.append(models.Examen.fecha <= fecha_hasta)
+    for e_id, fecha, inicio, fin, aula_id, grupo_id, profesor_id, sinodal_id in db.execute(
+        _consulta_examenes(condiciones)
+    ):
+        indice.agregar_examen(e_id, fecha, inicio, fin, _recursos(aula_id, grupo_id, profesor_id, sinodal_id))
+
+    restricciones = select(*_COLUMNAS_RESTRICCION)
+    if fecha_desde is not None:
+        restricciones = restricciones.where(or_(models.Restriccion.fecha.is_(None), models.Restriccion.fecha >= fecha_desde))
+    if fecha_hasta is not None:
+        restricciones = restricciones.where(or_(models.Restriccion.fecha.is_(None), models.Restriccion.fecha <= fecha_hasta))
+    _agregar_restricciones(indice, db.execute(restricciones))
+    return indice
+
+
+def conflictos_de_examen(
+    db: Session,
+    fecha: date,
+    hora_inicio: time,
+    hora_fin: time,
+    aula_id: Optional[int] = None,
+    grupo_id: Optional[int] = None,
+    profesor_id: Optional[int] = None,
+    sinodal_id: Optional[int] = None,
+    examen_id: Optional[int] = None,
+) -> List[Conflicto]:
+    """
+    Conflictos que tendría un examen con esos datos. Solo se cargan los
+    exámenes y restricciones de la misma fecha que comparten algún recurso.
+    `examen_id` excluye al propio examen cuando se está modificando. En cada
+    conflicto `a` es el examen candidato.
+    """
+    recursos = [r for r in _recursos(aula_id, grupo_id, profesor_id, sinodal_id) if r[1] is not None]
+    profesores = [p for p in (profesor_id, sinodal_id) if p is not None]
+
+    comparte = []
+    if aula_id is not None:
+        comparte.append(models.Examen.aula_id == aula_id)
+    if grupo_id is not None:
+        comparte.append(models.Examen.grupo_id == grupo_id)
+    if profesores:
+        comparte.append(models.Materia.profesor_id.in_(profesores))
+        comparte.append(models.Examen.sinodal_id.in_(profesores))
+
+    indice = IndiceIntervalos()
+    candidato_id = examen_id if examen_id is not None else 0
+    indice.agregar_examen(candidato_id, fecha, hora_inicio, hora_fin, recursos)
+    if comparte:
+        condiciones = [models.Examen.fecha == fecha, or_(*comparte)]
+        if examen_id is not None:
+            condiciones.append(models.Examen.id != examen_id)
+        for e_id, f, inicio, fin, a_id, g_id, p_id, s_id in db.execute(_consulta_examenes(condiciones)):
+            # Solo interesan los recursos que comparte con el candidato
+            propios = [r for r in _recursos(a_id, g_id, p_id, s_id) if r in recursos]
+            indice.agregar_examen(e_id, f, inicio, fin, propios)
+
+    filtro_recurso = []
+    if aula_id is not None:
+        filtro_recurso.append(models.Restriccion.aula_id == aula_id)
+    if grupo_id is not None:
+        filtro_recurso.append(models.Restriccion.grupo_id == grupo_id)
+    if profesores:
+        filtro_recurso.append(models.Restriccion.profesor_id.in_(profesores))
+    if filtro_recurso:
+        _agregar_restricciones(indice, db.execute(
+            select(*_COLUMNAS_RESTRICCION).where(
+                or_(models.Restriccion.fecha.is_(None), models.Restriccion.fecha == fecha),
+                or_(*filtro_recurso),
+            )
+        ))
+
+    resultado = []
+    for c in indice.conflictos():
+        if c.b.tipo == 'examen' and c.b.id == candidato_id:
+            c.a, c.b = c.b, c.a
+        if c.a.tipo == 'examen' and c.a.id == candidato_id:
+            resultado.append(c)
+    return resultado
+
+
+def describir(conflictos: List[Conflicto]) -> str:
+    """Texto para el usuario; `b` es el examen o restricción con que choca."""
+    partes = []
+    for c in conflictos:
+        if c.b.tipo == 'restriccion':
+            detalle = f"restricción {c.b.id}" + (f" ({c.b.motivo})" if c.b.motivo else "")
+        else:
+            detalle = f"examen {c.b.id}"
+        partes.append(f"{c.recurso} {c.recurso_id} ocupado por {detalle}")
+    return "; ".join(partes)
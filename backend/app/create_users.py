@@ -4,9 +4,9 @@ import os
 # Agregar el directorio 'backend' a sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import SessionLocal, engine
-from app.models import Base, User
-from app.auth import get_password_hash
+from app.database import SessionLocal
+from app.migraciones import actualizar
+from app.usuarios import provisionar, resumen
 
 def create_initial_users():
     """
@@ -15,8 +15,8 @@ def create_initial_users():
     - jefe de carrera
     - secretaria
     """
-    # Crear todas las tablas
-    Base.metadata.create_all(bind=engine)
+    # Crear o actualizar el esquema
+    actualizar()
     
     db = SessionLocal()
     
@@ -43,33 +43,22 @@ def create_initial_users():
             }
         ]
         
-        usuarios_creados = 0
-        usuarios_existentes = 0
-        
-        for user_data in usuarios_iniciales:
-            # Verificar si el usuario ya existe
-            existing_user = db.query(User).filter(User.username == user_data["username"]).first()
-            
-            if existing_user:
+        # Misma validación y alta que POST /api/users/lote
+        resultados = provisionar(db, usuarios_iniciales)
+        db.commit()
+        conteo = resumen(resultados)
+        usuarios_creados, usuarios_existentes = conteo["creado"], conteo["existente"]
+
+        for user_data, resultado in zip(usuarios_iniciales, resultados):
+            if resultado.estado == "existente":
                 print(f"✓ Usuario '{user_data['username']}' ya existe")
-                usuarios_existentes += 1
+            elif resultado.estado == "error":
+                print(f"✗ Usuario '{user_data['username']}': {resultado.detalle}")
             else:
-                # Crear nuevo usuario
-                new_user = User(
-                    username=user_data["username"],
-                    hashed_password=get_password_hash(user_data["password"]),
-                    role=user_data["role"],
-                    email=user_data["email"],
-                    is_active=1
-                )
-                db.add(new_user)
                 print(f"✓ Usuario '{user_data['username']}' creado exitosamente")
                 print(f"  - Contraseña: {user_data['password']}")
                 print(f"  - Rol: {user_data['role']}")
                 print(f"  - Email: {user_data['email']}")
-                usuarios_creados += 1
-        
-        db.commit()
         
         print("\n" + "="*60)
         print(f"Resumen:")
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from typing import Union
+import anyio
 import os
 
+from .instrumentation import AsyncQueuePoolMedido, QueuePoolMedido
+
 # Obtener la URL de la base de datos desde la variable de entorno
 # Si no existe, usar SQLite como fallback
 SQLALCHEMY_DATABASE_URL = os.getenv(
@@ -9,15 +15,78 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
     "sqlite:///./horarios.db"
 )
 
-# Configuración del engine según el tipo de base de datos
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, 
-        connect_args={"check_same_thread": False}
+
+def _entero(nombre: str, defecto: int) -> int:
+    return int(os.getenv(nombre, defecto))
+
+
+# Pool de conexiones (también para SQLite en archivo)
+POOL_SIZE = _entero("DB_POOL_SIZE", 5)
+MAX_OVERFLOW = _entero("DB_MAX_OVERFLOW", 10)
+POOL_TIMEOUT = _entero("DB_POOL_TIMEOUT", 30)  # segundos esperando una conexión libre
+POOL_RECYCLE = _entero("DB_POOL_RECYCLE", 1800)  # segundos; -1 para no reciclar
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# SQLite: WAL permite lecturas mientras se escribe y busy_timeout espera el
+# lock de escritura en lugar de fallar con "database is locked"
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_CACHE_KB = _entero("SQLITE_CACHE_KB", 64 * 1024)
+SQLITE_MMAP_BYTES = _entero("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = _entero("SQLITE_BUSY_TIMEOUT_MS", 15000)
+
+
+def _es_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _es_sqlite_en_memoria(url: str) -> bool:
+    return _es_sqlite(url) and (":memory:" in url or url.split("://", 1)[1] in ("", "/"))
+
+
+def opciones_engine(url: str, asincrono: bool = False) -> dict:
+    """Argumentos de create_engine / create_async_engine según la URL."""
+    opciones = {}
+    if _es_sqlite(url):
+        opciones["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+        if _es_sqlite_en_memoria(url):
+            # Una base en memoria existe solo dentro de su conexión
+            return opciones
+    opciones.update(
+        poolclass=AsyncQueuePoolMedido if asincrono else QueuePoolMedido,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
     )
-else:
-    # Para PostgreSQL no necesitamos check_same_thread
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    return opciones
+
+
+def _pragmas_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def configurar_engine(engine, url: str):
+    """Registra los PRAGMA de SQLite en cada conexión nueva del engine."""
+    if _es_sqlite(url) and not _es_sqlite_en_memoria(url):
+        event.listen(engine, "connect", _pragmas_sqlite)
+    return engine
+
+
+engine = configurar_engine(
+    create_engine(SQLALCHEMY_DATABASE_URL, **opciones_engine(SQLALCHEMY_DATABASE_URL)),
+    SQLALCHEMY_DATABASE_URL,
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -27,3 +96,67 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Modo asíncrono (DB_ASYNC=1): los endpoints de lectura usan un AsyncEngine
+# (asyncpg para PostgreSQL, aiosqlite para SQLite) en lugar de ocupar un hilo
+# del threadpool durante toda la consulta. ASYNC_DATABASE_URL permite indicar
+# la URL; si no, se deriva de DATABASE_URL cambiando el driver.
+USAR_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+DRIVERS_ASYNC = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def url_async(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql+psycopg2://... -> postgresql+asyncpg://..."""
+    esquema, resto = url.split("://", 1)
+    dialecto = esquema.split("+", 1)[0]
+    if dialecto not in DRIVERS_ASYNC:
+        raise ValueError(f"No hay driver asíncrono configurado para '{dialecto}'")
+    return f"{DRIVERS_ASYNC[dialecto]}://{resto}"
+
+
+async_engine = None
+AsyncSessionLocal = None
+if USAR_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or url_async(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **opciones_engine(ASYNC_DATABASE_URL, asincrono=True))
+    configurar_engine(async_engine.sync_engine, ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+SesionLectura = Union[Session, AsyncSession]
+
+# Las sesiones síncronas se cierran con su propio limitador, como hace FastAPI
+# con las dependencias con yield: si el cierre esperara un hilo del threadpool
+# y todos estuvieran esperando una conexión del pool, nadie la liberaría.
+_limitador_cierre = anyio.CapacityLimiter(1)
+
+
+async def get_db_lectura():
+    """Sesión para endpoints de lectura: AsyncSession con DB_ASYNC=1, Session si no."""
+    if USAR_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await anyio.to_thread.run_sync(db.close, limiter=_limitador_cierre)
+
+
+async def ejecutar_lectura(db: SesionLectura, funcion, *args, **kwargs):
+    """
+    Ejecuta `funcion(session, *args, **kwargs)`, escrita con la API síncrona,
+    sin bloquear el event loop: con AsyncSession corre dentro de `run_sync`
+    (la E/S se espera con el driver asíncrono); con Session, en el threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(funcion, *args, **kwargs)
+    return await run_in_threadpool(funcion, db, *args, **kwargs)
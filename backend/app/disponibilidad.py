@@ -0,0 +1,454 @@
+"""
+Matriz de disponibilidad de aulas y profesores.
+
+El día se divide en 48 slots de 30 minutos y la ocupación de cada recurso en
+una fecha se guarda como un entero cuyos bits son esos slots. Saber si un
+aula o profesor está libre en un rango es un AND contra la máscara del rango,
+así que /api/disponibilidad responde sin consultar exámenes.
+
+La ocupación tiene tres capas:
+  - clases: los horarios semanales (aula de la clase y profesor titular),
+    por día de la semana;
+  - restricciones sin fecha (aplican todos los días);
+  - por fecha: exámenes (aula, titular y sinodal) y restricciones con fecha.
+    Las fechas se cargan de la base de datos la primera vez que se consultan
+    y se guardan las DISPONIBILIDAD_FECHAS usadas más recientemente.
+
+Los exámenes creados, modificados o borrados con la sesión se aplican a la
+matriz al hacer commit. Cada escritura de exámenes o restricciones incrementa
+el contador `disponibilidad` de `versiones_datos` después del commit, en una
+transacción propia y corta, para que la fila del contador no quede bloqueada
+mientras dura la transacción de la escritura. Si el contador en la base de
+datos no es el que la matriz conoce (escribió otro worker, o hubo un borrado
+masivo) o cambió el catálogo, la matriz se reconstruye.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, cast, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import cache, models
+from .database import SessionLocal, engine
+from .scheduler import DIAS_SEMANA
+
+logger = logging.getLogger(__name__)
+
+DISPONIBILIDAD = 'disponibilidad'
+# Fechas con ocupación cargada por matriz; cualquier cliente puede pedir fechas nuevas
+DISPONIBILIDAD_FECHAS = int(os.getenv("DISPONIBILIDAD_FECHAS", "366"))
+MINUTOS_SLOT = 30
+SLOTS_POR_DIA = 24 * 60 // MINUTOS_SLOT
+
+Recurso = Tuple[str, int]  # ('aula' | 'profesor', id)
+
+
+def mascara(hora_inicio: Optional[time], hora_fin: Optional[time]) -> int:
+    """Bits de los slots que toca el rango [hora_inicio, hora_fin); sin horas es el día completo."""
+    inicio = 0 if hora_inicio is None else hora_inicio.hour * 60 + hora_inicio.minute
+    fin = 24 * 60 if hora_fin is None else hora_fin.hour * 60 + hora_fin.minute
+    if hora_fin is not None and hora_fin.second:
+        fin += 1
+    primero = inicio // MINUTOS_SLOT
+    ultimo = min(-(-fin // MINUTOS_SLOT), SLOTS_POR_DIA)
+    if ultimo <= primero:
+        return 0
+    return ((1 << (ultimo - primero)) - 1) << primero
+
+
+def _recursos_examen(aula_id, profesor_id, sinodal_id) -> Tuple[Recurso, ...]:
+    recursos = {('aula', aula_id), ('profesor', profesor_id), ('profesor', sinodal_id)}
+    return tuple(r for r in recursos if r[1] is not None)
+
+
+def _recurso_restriccion(profesor_id, aula_id) -> Optional[Recurso]:
+    if profesor_id is not None:
+        return ('profesor', profesor_id)
+    if aula_id is not None:
+        return ('aula', aula_id)
+    return None  # Las de grupo no afectan a aulas ni sinodales
+
+
+@dataclass
+class _Fecha:
+    """Ocupación de una fecha: cada recurso guarda sus fuentes y el OR de ellas."""
+    fuentes: Dict[Recurso, Dict[Tuple[str, int], int]] = field(default_factory=dict)
+    ocupado: Dict[Recurso, int] = field(default_factory=dict)
+
+    def poner(self, recurso: Recurso, clave: Tuple[str, int], bits: int):
+        fuentes = self.fuentes.setdefault(recurso, {})
+        fuentes[clave] = bits
+        self.ocupado[recurso] = self.ocupado.get(recurso, 0) | bits
+
+    def quitar(self, recurso: Recurso, clave: Tuple[str, int]):
+        fuentes = self.fuentes.get(recurso)
+        if not fuentes or fuentes.pop(clave, None) is None:
+            return
+        total = 0
+        for bits in fuentes.values():
+            total |= bits
+        if total:
+            self.ocupado[recurso] = total
+        else:
+            self.ocupado.pop(recurso, None)
+            self.fuentes.pop(recurso, None)
+
+
+class MatrizDisponibilidad:
+    """Estado construido a partir de una versión del catálogo y del contador."""
+
+    def __init__(self, db: Session, version_catalogo: str, contador: int):
+        self.version_catalogo = version_catalogo
+        self.contador = contador
+        self._lock = threading.Lock()
+
+        # Aulas de menor a mayor capacidad: la primera que sirve es la más ajustada
+        self.aulas = [
+            {"id": a_id, "nombre": nombre, "capacidad": capacidad, "tipo": tipo}
+            for a_id, nombre, capacidad, tipo in db.execute(
+                select(models.Aula.id, models.Aula.nombre, models.Aula.capacidad, models.Aula.tipo)
+            )
+        ]
+        self.aulas.sort(key=lambda a: (a["capacidad"] is None, a["capacidad"] or 0, a["id"]))
+        self.profesores = [
+            {"id": p_id, "nombre": nombre, "email": email}
+            for p_id, nombre, email in db.execute(
+                select(models.Profesor.id, models.Profesor.nombre, models.Profesor.email).order_by(models.Profesor.nombre)
+            )
+        ]
+
+        # Clases: día de la semana -> recurso -> bits
+        self.clases: List[Dict[Recurso, int]] = [{} for _ in range(7)]
+        for dia, inicio, fin, aula_id, profesor_id in db.execute(
+            select(
+                models.Horario.dia_semana, models.Horario.hora_inicio, models.Horario.hora_fin,
+                models.Horario.aula_id, models.Materia.profesor_id,
+            ).join(models.Materia, models.Horario.materia_id == models.Materia.id)
+        ):
+            d = DIAS_SEMANA.get((dia or '').upper())
+            if d is None or inicio is None or fin is None:
+                continue
+            bits = mascara(inicio, fin)
+            for recurso in (('aula', aula_id), ('profesor', profesor_id)):
+                if recurso[1] is not None:
+                    self.clases[d][recurso] = self.clases[d].get(recurso, 0) | bits
+
+        self.permanentes: Dict[Recurso, int] = {}
+        for profesor_id, aula_id, inicio, fin in db.execute(
+            select(
+                models.Restriccion.profesor_id, models.Restriccion.aula_id,
+                models.Restriccion.hora_inicio, models.Restriccion.hora_fin,
+            ).where(models.Restriccion.fecha.is_(None))
+        ):
+            recurso = _recurso_restriccion(profesor_id, aula_id)
+            if recurso is not None:
+                self.permanentes[recurso] = self.permanentes.get(recurso, 0) | mascara(inicio, fin)
+
+        self._fechas: "OrderedDict[date, _Fecha]" = OrderedDict()
+        # examen_id -> (fecha, recursos) de lo que está en la matriz
+        self._examenes: Dict[int, Tuple[date, Tuple[Recurso, ...]]] = {}
+
+    def _fecha(self, db: Session, fecha: date) -> _Fecha:
+        with self._lock:
+            ocupacion = self._fechas.get(fecha)
+            if ocupacion is not None:
+                self._fechas.move_to_end(fecha)
+                return ocupacion
+        # Las consultas van fuera del lock: en modo asíncrono esperar a la base
+        # de datos con el lock tomado bloquearía el event loop
+        contador = self.contador
+        examenes = db.execute(
+            select(
+                models.Examen.id, models.Examen.hora_inicio, models.Examen.hora_fin,
+                models.Examen.aula_id, models.Materia.profesor_id, models.Examen.sinodal_id,
+            ).outerjoin(models.Materia, models.Examen.materia_id == models.Materia.id)
+            .where(models.Examen.fecha == fecha)
+        ).all()
+        restricciones = db.execute(
+            select(
+                models.Restriccion.id, models.Restriccion.profesor_id, models.Restriccion.aula_id,
+                models.Restriccion.hora_inicio, models.Restriccion.hora_fin,
+            ).where(models.Restriccion.fecha == fecha)
+        ).all()
+
+        with self._lock:
+            if fecha in self._fechas:
+                return self._fechas[fecha]
+            ocupacion = _Fecha()
+            # Si se aplicaron cambios mientras se consultaba, lo leído puede estar
+            # atrasado: sirve para esta petición pero no se guarda
+            guardar = self.contador == contador
+            for e_id, inicio, fin, aula_id, profesor_id, sinodal_id in examenes:
+                bits = mascara(inicio, fin) if inicio is not None and fin is not None else 0
+                recursos = _recursos_examen(aula_id, profesor_id, sinodal_id) if bits else ()
+                for recurso in recursos:
+                    ocupacion.poner(recurso, ('examen', e_id), bits)
+                if guardar and recursos:
+                    self._examenes[e_id] = (fecha, recursos)
+            for r_id, profesor_id, aula_id, inicio, fin in restricciones:
+                recurso = _recurso_restriccion(profesor_id, aula_id)
+                if recurso is not None:
+                    ocupacion.poner(recurso, ('restriccion', r_id), mascara(inicio, fin))
+            if guardar:
+                self._fechas[fecha] = ocupacion
+                while len(self._fechas) > DISPONIBILIDAD_FECHAS:
+                    self._olvidar_fecha(next(iter(self._fechas)))
+        return ocupacion
+
+    def _olvidar_fecha(self, fecha: date):
+        """Saca la fecha menos usada; se vuelve a cargar si se consulta. Se llama con el lock tomado."""
+        ocupacion = self._fechas.pop(fecha)
+        for fuentes in ocupacion.fuentes.values():
+            for tipo, fuente_id in fuentes:
+                if tipo == 'examen':
+                    self._examenes.pop(fuente_id, None)
+
+    def _poner_examen(self, ocupacion: _Fecha, e_id, fecha, inicio, fin, aula_id, profesor_id, sinodal_id):
+        if inicio is None or fin is None:
+            return
+        recursos = _recursos_examen(aula_id, profesor_id, sinodal_id)
+        bits = mascara(inicio, fin)
+        for recurso in recursos:
+            ocupacion.poner(recurso, ('examen', e_id), bits)
+        self._examenes[e_id] = (fecha, recursos)
+
+    def _quitar_examen(self, e_id: int):
+        anterior = self._examenes.pop(e_id, None)
+        if anterior is None:
+            return
+        fecha, recursos = anterior
+        ocupacion = self._fechas.get(fecha)
+        if ocupacion is not None:
+            for recurso in recursos:
+                ocupacion.quitar(recurso, ('examen', e_id))
+
+    def aplicar(self, cambios: List[tuple], antes: int, despues: int) -> bool:
+        """
+        Aplica los exámenes escritos en una transacción ya confirmada. Regresa
+        False si la matriz no estaba en la versión `antes` (hubo escrituras que
+        no conoce) y no se puede actualizar.
+        """
+        with self._lock:
+            if self.contador != antes:
+                return False
+            for cambio in cambios:
+                e_id = cambio[1]
+                self._quitar_examen(e_id)
+                if cambio[0] == 'poner':
+                    _, _, fecha, inicio, fin, aula_id, profesor_id, sinodal_id = cambio
+                    # Las fechas que no se han consultado se cargarán completas después
+                    ocupacion = self._fechas.get(fecha)
+                    if ocupacion is not None:
+                        self._poner_examen(ocupacion, e_id, fecha, inicio, fin, aula_id, profesor_id, sinodal_id)
+            self.contador = despues
+            return True
+
+    def libres(
+        self,
+        db: Session,
+        fecha: date,
+        hora_inicio: time,
+        hora_fin: time,
+        capacidad: Optional[int] = None,
+        tipo_aula: Optional[str] = None,
+        excluir_profesor_id: Optional[int] = None,
+        incluir_clases: bool = True,
+    ):
+        """Aulas y profesores sin ocupación en ningún slot del rango."""
+        rango = mascara(hora_inicio, hora_fin)
+        ocupacion = self._fecha(db, fecha).ocupado
+        clases = self.clases[fecha.weekday()] if incluir_clases else {}
+        permanentes = self.permanentes
+
+        def libre(recurso):
+            return not ((ocupacion.get(recurso, 0) | permanentes.get(recurso, 0) | clases.get(recurso, 0)) & rango)
+
+        aulas = [
+            a for a in self.aulas
+            if (capacidad is None or (a["capacidad"] or 0) >= capacidad)
+            and (tipo_aula is None or a["tipo"] == tipo_aula)
+            and libre(('aula', a["id"]))
+        ]
+        sinodales = [
+            p for p in self.profesores
+            if p["id"] != excluir_profesor_id and libre(('profesor', p["id"]))
+        ]
+        return aulas, sinodales
+
+    def ocupacion_profesores(
+        self, db: Session, fecha: date, incluir_clases: bool = True, excluir_examenes=frozenset()
+    ) -> Dict[int, int]:
+        """Bits ocupados de cada profesor en la fecha, sin contar los exámenes de `excluir_examenes`."""
+        ocupacion = self._fecha(db, fecha)
+        clases = self.clases[fecha.weekday()] if incluir_clases else {}
+        resultado = {}
+        with self._lock:
+            for p in self.profesores:
+                recurso = ('profesor', p["id"])
+                if excluir_examenes and recurso in ocupacion.fuentes:
+                    bits = 0
+                    for (tipo, fuente_id), b in ocupacion.fuentes[recurso].items():
+                        if tipo != 'examen' or fuente_id not in excluir_examenes:
+                            bits |= b
+                else:
+                    bits = ocupacion.ocupado.get(recurso, 0)
+                resultado[p["id"]] = bits | self.permanentes.get(recurso, 0) | clases.get(recurso, 0)
+        return resultado
+
+
+_matriz: Optional[MatrizDisponibilidad] = None
+_lock_construccion = threading.Lock()
+
+
+def _versiones(db: Session) -> Tuple[str, int]:
+    versiones = dict(db.execute(
+        select(models.VersionDatos.nombre, models.VersionDatos.version)
+        .where(models.VersionDatos.nombre.in_([cache.CATALOGO, DISPONIBILIDAD]))
+    ).all())
+    catalogo = versiones.get(cache.CATALOGO) or cache.get_version(db, cache.CATALOGO)
+    contador = versiones.get(DISPONIBILIDAD)
+    if contador is None:
+        db.execute(insert(models.VersionDatos).values(nombre=DISPONIBILIDAD, version='0'))
+        db.commit()
+        contador = '0'
+    return catalogo, int(contador)
+
+
+def _vigente(actual: Optional[MatrizDisponibilidad], catalogo: str, contador: int) -> bool:
+    # Una matriz construida con un contador más nuevo que el leído también sirve
+    return actual is not None and actual.version_catalogo == catalogo and actual.contador >= contador
+
+
+def _en_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def matriz(db: Session) -> MatrizDisponibilidad:
+    """La matriz vigente; se reconstruye si la base de datos cambió por fuera."""
+    global _matriz
+    catalogo, contador = _versiones(db)
+    actual = _matriz
+    if _vigente(actual, catalogo, contador):
+        return actual
+    # Una sola petición reconstruye; las demás esperan el lock y usan su
+    # resultado. Con AsyncSession esto corre en el hilo del event loop, donde
+    # esperar el lock lo bloquearía: si está tomado, la petición construye
+    # una matriz sólo para ella.
+    if not _lock_construccion.acquire(blocking=not _en_event_loop()):
+        return MatrizDisponibilidad(db, catalogo, contador)
+    try:
+        actual = _matriz
+        if _vigente(actual, catalogo, contador):
+            return actual
+        _matriz = MatrizDisponibilidad(db, catalogo, contador)
+        return _matriz
+    finally:
+        _lock_construccion.release()
+
+
+def consultar(db: Session, fecha: date, hora_inicio: time, hora_fin: time, **filtros):
+    return matriz(db).libres(db, fecha, hora_inicio, hora_fin, **filtros)
+
+
+def invalidar():
+    global _matriz
+    _matriz = None
+
+
+# ---- Seguimiento de escrituras ----
+
+def _incrementar() -> int:
+    """Incrementa el contador en una transacción propia y regresa el nuevo valor."""
+    fila = models.VersionDatos.nombre == DISPONIBILIDAD
+    with engine.begin() as conn:
+        nuevo = conn.execute(
+            update(models.VersionDatos).where(fila)
+            .values(version=cast(cast(models.VersionDatos.version, Integer) + 1, String))
+            .returning(models.VersionDatos.version)
+        ).scalar()
+        if nuevo is None:
+            conn.execute(insert(models.VersionDatos).values(nombre=DISPONIBILIDAD, version='1'))
+            nuevo = '1'
+    return int(nuevo)
+
+
+def _registrar(session, cambios: List[tuple], reconstruir: bool = False):
+    pendiente = session.info.setdefault(DISPONIBILIDAD, {'cambios': [], 'reconstruir': False})
+    pendiente['cambios'].extend(cambios)
+    pendiente['reconstruir'] |= reconstruir
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _examenes_escritos(session, flush_context):
+    examenes, borrados, restricciones = [], [], False
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, models.Examen):
+            examenes.append(obj)
+        elif isinstance(obj, models.Restriccion):
+            restricciones = True
+    for obj in session.deleted:
+        if isinstance(obj, models.Examen):
+            borrados.append(('quitar', obj.id))
+        elif isinstance(obj, models.Restriccion):
+            restricciones = True
+    if not (examenes or borrados or restricciones):
+        return
+
+    materias = {e.materia_id for e in examenes if e.materia_id is not None}
+    titulares = dict(session.connection().execute(
+        select(models.Materia.id, models.Materia.profesor_id).where(models.Materia.id.in_(materias))
+    ).all()) if materias else {}
+    cambios = [
+        ('poner', e.id, e.fecha, e.hora_inicio, e.hora_fin, e.aula_id, titulares.get(e.materia_id), e.sinodal_id)
+        for e in examenes
+    ]
+    _registrar(session, cambios + borrados, reconstruir=restricciones)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _escritura_masiva(orm_execute_state):
+    # insert()/update()/delete() y query.delete() no pasan por el flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    # Escrituras que no tocan fechas, horas, aulas ni profesores se marcan con
+    # execution_options(disponibilidad=False)
+    if not orm_execute_state.execution_options.get('disponibilidad', True):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (models.Examen, models.Restriccion):
+        _registrar(orm_execute_state.session, [], reconstruir=True)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _aplicar_cambios(session):
+    pendiente = session.info.pop(DISPONIBILIDAD, None)
+    if pendiente is None:
+        return
+    try:
+        nuevo = _incrementar()
+    except Exception:
+        # El commit ya ocurrió; la matriz de este worker se reconstruye al consultar
+        logger.exception("No se pudo incrementar el contador de disponibilidad")
+        invalidar()
+        return
+    actual = _matriz
+    if actual is None:
+        return
+    if pendiente['reconstruir'] or not actual.aplicar(pendiente['cambios'], nuevo - 1, nuevo):
+        # Se perdió la secuencia (otro worker escribió en medio): se reconstruye al consultar
+        invalidar()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_cambios(session):
+    session.info.pop(DISPONIBILIDAD, None)
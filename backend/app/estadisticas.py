@@ -0,0 +1,338 @@
+"""
+Resúmenes de carga por profesor y de uso por aula (/api/estadisticas).
+
+Las tablas `carga_profesores` y `uso_aulas` guardan, por recurso y carrera,
+cuántos bloques de clase semanales y cuántos exámenes tiene cada uno y sus
+minutos. Se mantienen en la misma transacción que la escritura, sumando o
+restando sólo la aportación de las filas que cambian:
+
+  - los horarios y exámenes creados, modificados o borrados con la sesión, al
+    hacer flush;
+  - las escrituras masivas (insert()/update()/delete()), con las filas antes y
+    después que entrega app/masivas.py;
+  - al cambiar el titular o la carrera de una materia (o borrarla), los
+    horarios y exámenes de esa materia pasan de un resumen a otro.
+
+Los incrementos se aplican con INSERT ... ON CONFLICT DO UPDATE, en orden de
+llave, para que dos transacciones que tocan el mismo recurso no choquen.
+recalcular() reconstruye todo; es para cargas iniciales, no para cada
+escritura.
+
+La carga de clase es el titular de la materia del horario; la de examen es el
+sinodal. Los exámenes cuentan sin importar su estado.
+"""
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import masivas, models
+from .database import SessionLocal
+
+# Columnas que cambian la aportación de un horario o examen
+COLUMNAS_HORARIO = ('materia_id', 'aula_id', 'hora_inicio', 'hora_fin')
+COLUMNAS_EXAMEN = ('materia_id', 'aula_id', 'sinodal_id', 'hora_inicio', 'hora_fin')
+# Columnas de la materia que cambian a qué resumen van sus horarios y exámenes
+COLUMNAS_MATERIA = ('profesor_id', 'carrera_id')
+
+# (modelo del resumen, id del recurso, carrera) -> {columna: incremento}
+Cambios = Dict[Tuple[type, int, int], Dict[str, int]]
+# materia_id -> (profesor titular, carrera)
+Materias = Dict[int, Tuple[Optional[int], Optional[int]]]
+
+
+def minutos(hora_inicio, hora_fin) -> int:
+    if hora_inicio is None or hora_fin is None:
+        return 0
+    return max(0, (hora_fin.hour * 60 + hora_fin.minute) - (hora_inicio.hour * 60 + hora_inicio.minute))
+
+
+def _sumar(cambios: Cambios, modelo, recurso_id, carrera_id, signo, **valores):
+    if recurso_id is None:
+        return
+    fila = cambios.setdefault((modelo, recurso_id, carrera_id or 0), defaultdict(int))
+    for columna, valor in valores.items():
+        fila[columna] += signo * valor
+
+
+def _aporte_horario(cambios, valores, materias, signo, veces=1):
+    profesor_id, carrera_id = materias.get(valores['materia_id'], (None, None))
+    duracion = minutos(valores['hora_inicio'], valores['hora_fin'])
+    _sumar(cambios, models.CargaProfesor, profesor_id, carrera_id, signo,
+           clases=veces, minutos_clase=veces * duracion)
+    _sumar(cambios, models.UsoAula, valores['aula_id'], carrera_id, signo,
+           clases=veces, minutos_clase=veces * duracion)
+
+
+def _aporte_examen(cambios, valores, materias, signo, veces=1):
+    _, carrera_id = materias.get(valores['materia_id'], (None, None))
+    duracion = minutos(valores['hora_inicio'], valores['hora_fin'])
+    _sumar(cambios, models.CargaProfesor, valores['sinodal_id'], carrera_id, signo,
+           examenes_sinodal=veces, minutos_sinodal=veces * duracion)
+    _sumar(cambios, models.UsoAula, valores['aula_id'], carrera_id, signo,
+           examenes=veces, minutos_examen=veces * duracion)
+
+
+def _materias(conn, materia_ids) -> Materias:
+    materia_ids = {m for m in materia_ids if m is not None}
+    if not materia_ids:
+        return {}
+    return {
+        m_id: (p_id, c_id) for m_id, p_id, c_id in conn.execute(
+            select(models.Materia.id, models.Materia.profesor_id, models.Materia.carrera_id)
+            .where(models.Materia.id.in_(materia_ids))
+        )
+    }
+
+
+def _upsert(conn, modelo):
+    """INSERT ... ON CONFLICT (llave) DO UPDATE que suma los incrementos."""
+    dialecto = conn.dialect.name
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insertar
+    elif dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insertar
+    else:
+        return None
+    tabla = modelo.__table__
+    sentencia = insertar(tabla)
+    return sentencia.on_conflict_do_update(
+        index_elements=list(tabla.primary_key.columns),
+        set_={c.name: c + sentencia.excluded[c.name] for c in tabla.columns if not c.primary_key},
+    )
+
+
+def aplicar(conn, cambios: Cambios):
+    """
+    Suma los incrementos a los resúmenes; crea las filas que falten y borra
+    las que quedan en cero, como si se hubiera recalculado.
+    """
+    filas = defaultdict(list)
+    restadas = defaultdict(list)  # llaves que pueden haber quedado en cero
+    # En orden de llave para que las transacciones tomen los locks en el mismo orden
+    for (modelo, recurso_id, carrera_id), valores in sorted(
+        cambios.items(), key=lambda c: (c[0][0].__tablename__, c[0][1], c[0][2])
+    ):
+        valores = {c: v for c, v in valores.items() if v}
+        if not valores:
+            continue
+        llave = [c.name for c in modelo.__table__.primary_key.columns]
+        fila = {c.name: 0 for c in modelo.__table__.columns}
+        fila.update({llave[0]: recurso_id, llave[1]: carrera_id}, **valores)
+        filas[modelo].append(fila)
+        if any(v < 0 for v in valores.values()):
+            restadas[modelo].append((recurso_id, carrera_id))
+
+    for modelo, lote in filas.items():
+        sentencia = _upsert(conn, modelo)
+        if sentencia is not None:
+            conn.execute(sentencia, lote)
+            continue
+        llave = list(modelo.__table__.primary_key.columns)
+        for fila in lote:
+            condicion = (llave[0] == fila[llave[0].name], llave[1] == fila[llave[1].name])
+            incrementos = {c: getattr(modelo, c) + v for c, v in fila.items() if c not in (llave[0].name, llave[1].name)}
+            if conn.execute(update(modelo).where(*condicion).values(incrementos)).rowcount == 0:
+                conn.execute(insert(modelo).values(fila))
+
+    for modelo, llaves in restadas.items():
+        tabla = modelo.__table__
+        llave = tuple_(*tabla.primary_key.columns)
+        en_cero = [c == 0 for c in tabla.columns if not c.primary_key]
+        for i in range(0, len(llaves), masivas.LOTE_IDS):
+            conn.execute(delete(modelo).where(llave.in_(llaves[i:i + masivas.LOTE_IDS]), *en_cero))
+
+
+def _sumar_existentes(conn, cambios: Cambios, materias: Materias, signo: int, materia_ids=None):
+    """Aportación de los horarios y exámenes guardados (de `materia_ids` o todos)."""
+    # Se agrupa por horas para no traer una fila por horario o examen
+    columnas = (models.Horario.materia_id, models.Horario.aula_id, models.Horario.hora_inicio, models.Horario.hora_fin)
+    consulta = select(*columnas, func.count()).group_by(*columnas)
+    if materia_ids is not None:
+        consulta = consulta.where(models.Horario.materia_id.in_(materia_ids))
+    for materia_id, aula_id, inicio, fin, veces in conn.execute(consulta):
+        valores = {'materia_id': materia_id, 'aula_id': aula_id, 'hora_inicio': inicio, 'hora_fin': fin}
+        _aporte_horario(cambios, valores, materias, signo, veces)
+
+    columnas = (models.Examen.materia_id, models.Examen.aula_id, models.Examen.sinodal_id,
+                models.Examen.hora_inicio, models.Examen.hora_fin)
+    consulta = select(*columnas, func.count()).group_by(*columnas)
+    if materia_ids is not None:
+        consulta = consulta.where(models.Examen.materia_id.in_(materia_ids))
+    for materia_id, aula_id, sinodal_id, inicio, fin, veces in conn.execute(consulta):
+        valores = {'materia_id': materia_id, 'aula_id': aula_id, 'sinodal_id': sinodal_id,
+                   'hora_inicio': inicio, 'hora_fin': fin}
+        _aporte_examen(cambios, valores, materias, signo, veces)
+
+
+def _cambio_de_materias(conn, antes: Materias, despues: Materias):
+    """Pasa los horarios y exámenes de las materias del titular/carrera anterior al nuevo."""
+    materia_ids = [m for m in antes if antes[m] != despues.get(m, (None, None))]
+    if not materia_ids:
+        return
+    cambios: Cambios = {}
+    _sumar_existentes(conn, cambios, antes, -1, materia_ids)
+    _sumar_existentes(conn, cambios, despues, 1, materia_ids)
+    aplicar(conn, cambios)
+
+
+def recalcular(db):
+    """
+    Reconstruye los dos resúmenes desde horarios y exámenes. Recibe una sesión
+    o una conexión; queda en la misma transacción. Borra y vuelve a llenar las
+    tablas, así que no debe correr junto con otras escrituras.
+    """
+    conn = db.connection() if isinstance(db, Session) else db
+    materias = {m_id: (p_id, c_id) for m_id, p_id, c_id in conn.execute(
+        select(models.Materia.id, models.Materia.profesor_id, models.Materia.carrera_id)
+    )}
+    cambios: Cambios = {}
+    _sumar_existentes(conn, cambios, materias, 1)
+
+    for modelo in (models.CargaProfesor, models.UsoAula):
+        conn.execute(delete(modelo))
+        llave = [c.name for c in modelo.__table__.primary_key.columns]
+        filas = []
+        for (m, recurso_id, carrera_id), valores in cambios.items():
+            if m is modelo:
+                fila = {c.name: 0 for c in modelo.__table__.columns}
+                fila.update({llave[0]: recurso_id, llave[1]: carrera_id}, **valores)
+                filas.append(fila)
+        if filas:
+            conn.execute(insert(modelo), filas)
+
+
+def consultar(db: Session, carrera_id: Optional[int] = None) -> dict:
+    """Carga por profesor y uso por aula, sumando las carreras (o sólo una)."""
+    def resumen(modelo, catalogo, llave, columnas):
+        recurso_id = getattr(modelo, llave)
+        query = (
+            select(recurso_id, catalogo.nombre, *(func.sum(getattr(modelo, c)) for c in columnas))
+            .join(catalogo, catalogo.id == recurso_id)
+            .group_by(recurso_id, catalogo.nombre)
+        )
+        if carrera_id is not None:
+            query = query.where(modelo.carrera_id == carrera_id)
+        return db.execute(query).all()
+
+    profesores = []
+    for p_id, nombre, clases, min_clase, examenes, min_sinodal in resumen(
+        models.CargaProfesor, models.Profesor, 'profesor_id',
+        ('clases', 'minutos_clase', 'examenes_sinodal', 'minutos_sinodal'),
+    ):
+        if clases or examenes:
+            profesores.append({
+                "profesor_id": p_id, "nombre": nombre,
+                "clases": clases, "horas_clase": round(min_clase / 60, 2),
+                "examenes_sinodal": examenes, "horas_sinodal": round(min_sinodal / 60, 2),
+            })
+    aulas = []
+    for a_id, nombre, clases, min_clase, examenes, min_examen in resumen(
+        models.UsoAula, models.Aula, 'aula_id',
+        ('clases', 'minutos_clase', 'examenes', 'minutos_examen'),
+    ):
+        if clases or examenes:
+            aulas.append({
+                "aula_id": a_id, "nombre": nombre,
+                "clases": clases, "horas_clase": round(min_clase / 60, 2),
+                "examenes": examenes, "horas_examen": round(min_examen / 60, 2),
+            })
+    profesores.sort(key=lambda p: (-(p["horas_clase"] + p["horas_sinodal"]), p["profesor_id"]))
+    aulas.sort(key=lambda a: (-(a["horas_clase"] + a["horas_examen"]), a["aula_id"]))
+    return {"carrera_id": carrera_id, "profesores": profesores, "aulas": aulas}
+
+
+# ---- Mantenimiento incremental ----
+
+def _anteriores(obj, columnas) -> dict:
+    """Valores de las columnas antes del flush."""
+    estado = inspect(obj)
+    valores = {}
+    for c in columnas:
+        historial = estado.attrs[c].history
+        valores[c] = historial.deleted[0] if historial.deleted else getattr(obj, c)
+    return valores
+
+
+def _cambio(obj, columnas) -> bool:
+    estado = inspect(obj)
+    return any(estado.attrs[c].history.has_changes() for c in columnas)
+
+
+def _aportes(conn, quitar, poner):
+    """Aplica las aportaciones (aporte, valores) que se quitan y se ponen."""
+    if not (quitar or poner):
+        return
+    materias = _materias(conn, (v['materia_id'] for _, v in (*quitar, *poner)))
+    cambios: Cambios = {}
+    for aporte, valores in quitar:
+        aporte(cambios, valores, materias, -1)
+    for aporte, valores in poner:
+        aporte(cambios, valores, materias, 1)
+    aplicar(conn, cambios)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _actualizar_resumenes(session, flush_context):
+    quitar, poner = [], []  # (aporte, valores)
+    materias_antes, materias_despues = {}, {}
+    for obj in session.new:
+        if isinstance(obj, models.Horario):
+            poner.append((_aporte_horario, {c: getattr(obj, c) for c in COLUMNAS_HORARIO}))
+        elif isinstance(obj, models.Examen):
+            poner.append((_aporte_examen, {c: getattr(obj, c) for c in COLUMNAS_EXAMEN}))
+    for obj in session.dirty:
+        if isinstance(obj, models.Horario):
+            aporte, columnas = _aporte_horario, COLUMNAS_HORARIO
+        elif isinstance(obj, models.Examen):
+            aporte, columnas = _aporte_examen, COLUMNAS_EXAMEN
+        else:
+            if isinstance(obj, models.Materia) and _cambio(obj, COLUMNAS_MATERIA):
+                anteriores = _anteriores(obj, COLUMNAS_MATERIA)
+                materias_antes[obj.id] = (anteriores['profesor_id'], anteriores['carrera_id'])
+                materias_despues[obj.id] = (obj.profesor_id, obj.carrera_id)
+            continue
+        if _cambio(obj, columnas):
+            quitar.append((aporte, _anteriores(obj, columnas)))
+            poner.append((aporte, {c: getattr(obj, c) for c in columnas}))
+    for obj in session.deleted:
+        if isinstance(obj, models.Horario):
+            quitar.append((_aporte_horario, _anteriores(obj, COLUMNAS_HORARIO)))
+        elif isinstance(obj, models.Examen):
+            quitar.append((_aporte_examen, _anteriores(obj, COLUMNAS_EXAMEN)))
+        elif isinstance(obj, models.Materia):
+            anteriores = _anteriores(obj, COLUMNAS_MATERIA)
+            materias_antes[obj.id] = (anteriores['profesor_id'], anteriores['carrera_id'])
+    if not (quitar or poner or materias_antes):
+        return
+
+    conn = session.connection()
+    _aportes(conn, quitar, poner)
+    _cambio_de_materias(conn, materias_antes, materias_despues)
+
+
+@masivas.suscribir(models.Horario, models.Examen, models.Materia)
+def _escritura_masiva(session, modelo, accion, cambios):
+    conn = session.connection()
+    if modelo is models.Materia:
+        antes = {a['id']: (a['profesor_id'], a['carrera_id']) for a, _ in cambios if a is not None}
+        despues = {d['id']: (d['profesor_id'], d['carrera_id']) for _, d in cambios if d is not None and 'id' in d}
+        _cambio_de_materias(conn, antes, despues)
+        return
+
+    if modelo is models.Horario:
+        aporte, columnas = _aporte_horario, COLUMNAS_HORARIO
+    else:
+        aporte, columnas = _aporte_examen, COLUMNAS_EXAMEN
+    quitar, poner = [], []
+    for antes, despues in cambios:
+        antes = antes and {c: antes.get(c) for c in columnas}
+        despues = despues and {c: despues.get(c) for c in columnas}
+        if antes == despues:
+            continue
+        if antes:
+            quitar.append((aporte, antes))
+        if despues:
+            poner.append((aporte, despues))
+    _aportes(conn, quitar, poner)
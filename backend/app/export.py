@@ -0,0 +1,170 @@
+"""
+Exportación en streaming del calendario de exámenes (NDJSON, CSV e iCalendar).
+
+Las filas se leen con `yield_per` (cursor del lado del servidor en PostgreSQL)
+como tuplas planas, sin construir objetos ORM ni la lista completa, y se emiten
+en bloques conforme se leen; la memoria no depende del número de exámenes.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from . import models
+from .database import SessionLocal
+
+FILAS_POR_BLOQUE = 1000
+
+COLUMNAS = [
+    "id", "fecha", "hora_inicio", "hora_fin", "tipo", "status",
+    "carrera", "grupo", "materia", "profesor", "sinodal", "aula",
+]
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "ics": "text/calendar; charset=utf-8",
+}
+
+
+def consulta_exportacion(condiciones: Iterable = ()):
+    titular = aliased(models.Profesor)
+    sinodal = aliased(models.Profesor)
+    stmt = (
+        select(
+            models.Examen.id,
+            models.Examen.fecha,
+            models.Examen.hora_inicio,
+            models.Examen.hora_fin,
+            models.Examen.tipo,
+            models.Examen.status,
+            models.Carrera.nombre,
+            models.Grupo.nombre_grupo,
+            models.Materia.nombre,
+            titular.nombre,
+            sinodal.nombre,
+            models.Aula.nombre,
+        )
+        .select_from(models.Examen)
+        .join(models.Materia, models.Examen.materia_id == models.Materia.id)
+        .outerjoin(models.Carrera, models.Materia.carrera_id == models.Carrera.id)
+        .outerjoin(models.Grupo, models.Examen.grupo_id == models.Grupo.id)
+        .outerjoin(titular, models.Materia.profesor_id == titular.id)
+        .outerjoin(sinodal, models.Examen.sinodal_id == sinodal.id)
+        .outerjoin(models.Aula, models.Examen.aula_id == models.Aula.id)
+        .order_by(models.Examen.fecha, models.Examen.hora_inicio, models.Examen.id)
+    )
+    for condicion in condiciones:
+        stmt = stmt.where(condicion)
+    return stmt
+
+
+def _bloques_de_filas(condiciones) -> Iterator[List[tuple]]:
+    """Lee la consulta en bloques con su propia sesión (la del request ya se cerró)."""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            consulta_exportacion(condiciones).execution_options(yield_per=FILAS_POR_BLOQUE)
+        )
+        for bloque in result.partitions():
+            yield bloque
+    finally:
+        db.close()
+
+
+def _valor(v):
+    if v is None:
+        return None
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    return v
+
+
+def exportar_ndjson(condiciones=()) -> Iterator[bytes]:
+    for bloque in _bloques_de_filas(condiciones):
+        yield "".join(
+            json.dumps(dict(zip(COLUMNAS, map(_valor, fila))), ensure_ascii=False) + "\n"
+            for fila in bloque
+        ).encode("utf-8")
+
+
+def exportar_csv(condiciones=()) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS)
+    for bloque in _bloques_de_filas(condiciones):
+        writer.writerows([_valor(v) for v in fila] for fila in bloque)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ics_texto(valor) -> str:
+    texto = str(valor or "")
+    return (
+        texto.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _ics_plegar(linea: str) -> str:
+    """Pliega líneas de más de 75 octetos como pide RFC 5545."""
+    datos = linea.encode("utf-8")
+    if len(datos) <= 75:
+        return linea + "\r\n"
+    partes = []
+    actual = ""
+    limite = 75
+    for caracter in linea:
+        if len((actual + caracter).encode("utf-8")) > limite:
+            partes.append(actual)
+            actual = ""
+            limite = 74  # la continuación empieza con un espacio
+        actual += caracter
+    partes.append(actual)
+    return "\r\n ".join(partes) + "\r\n"
+
+
+def _ics_evento(fila, sello: str) -> str:
+    (id_, fecha, inicio, fin, tipo, status, carrera, grupo, materia, profesor, sinodal, aula) = fila
+    inicio_dt = datetime.combine(fecha, inicio).strftime("%Y%m%dT%H%M%S")
+    fin_dt = datetime.combine(fecha, fin).strftime("%Y%m%dT%H%M%S")
+    resumen = f"{tipo or 'Examen'} {materia or ''} - Grupo {grupo or ''}"
+    descripcion = f"Carrera: {carrera or ''}\nProfesor: {profesor or ''}\nSinodal: {sinodal or ''}\nEstado: {status or ''}"
+    lineas = [
+        "BEGIN:VEVENT",
+        f"UID:examen-{id_}@horarios",
+        f"DTSTAMP:{sello}",
+        f"DTSTART:{inicio_dt}",
+        f"DTEND:{fin_dt}",
+        f"SUMMARY:{_ics_texto(resumen)}",
+        f"LOCATION:{_ics_texto(aula)}",
+        f"DESCRIPTION:{_ics_texto(descripcion)}",
+        "END:VEVENT",
+    ]
+    return "".join(_ics_plegar(l) for l in lineas)
+
+
+def exportar_ics(condiciones=()) -> Iterator[bytes]:
+    sello = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    yield (
+        "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Horarios//Calendario de examenes//ES\r\n"
+        "CALSCALE:GREGORIAN\r\n"
+    ).encode("utf-8")
+    for bloque in _bloques_de_filas(condiciones):
+        yield "".join(
+            _ics_evento(fila, sello) for fila in bloque if fila[1] and fila[2] and fila[3]
+        ).encode("utf-8")
+    yield b"END:VCALENDAR\r\n"
+
+
+EXPORTADORES = {
+    "ndjson": exportar_ndjson,
+    "csv": exportar_csv,
+    "ics": exportar_ics,
+}
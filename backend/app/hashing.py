@@ -0,0 +1,98 @@
+"""
+Hashing y verificación de contraseñas (bcrypt) en un pool acotado.
+
+bcrypt libera el GIL mientras calcula, así que un pool de hilos aprovecha
+todos los núcleos sin bloquear el event loop ni el threadpool de FastAPI.
+El pool acepta a lo más BCRYPT_WORKERS tareas en ejecución más BCRYPT_COLA en
+espera; si está lleno se rechaza de inmediato con `PoolSaturado` (la
+aplicación responde 429) en lugar de acumular peticiones que de todos modos
+llegarían tarde.
+
+Para crear muchos usuarios a la vez está `hash_lote`: usa los mismos hilos
+con a lo más BCRYPT_WORKERS contraseñas en curso y espera lugar en lugar de
+rechazar, así que los inicios de sesión conservan los BCRYPT_COLA lugares de
+espera.
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, List
+
+from .auth import pwd_context
+
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 1))
+BCRYPT_COLA = int(os.getenv("BCRYPT_COLA", 4 * BCRYPT_WORKERS))
+
+
+class PoolSaturado(Exception):
+    """No hay lugar en el pool de bcrypt; el cliente debe reintentar."""
+
+
+class PoolHashing:
+    def __init__(self, workers: int = BCRYPT_WORKERS, cola: int = BCRYPT_COLA):
+        self.workers = workers
+        self.capacidad = workers + cola
+        self._cupo = threading.BoundedSemaphore(self.capacidad)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Se crea al primer uso para no levantar hilos al importar
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def enviar(self, funcion, *args) -> Future:
+        if not self._cupo.acquire(blocking=False):
+            raise PoolSaturado()
+        return self._enviar_con_cupo(funcion, *args)
+
+    def _enviar_con_cupo(self, funcion, *args) -> Future:
+        try:
+            futuro = self._get_executor().submit(funcion, *args)
+        except BaseException:
+            self._cupo.release()
+            raise
+        futuro.add_done_callback(lambda _: self._cupo.release())
+        return futuro
+
+    async def verificar(self, password: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(self.enviar(pwd_context.verify, password, hashed))
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self.enviar(pwd_context.hash, password))
+
+    def hash_sync(self, password: str) -> str:
+        """Para endpoints síncronos: espera en el hilo actual, con el mismo límite."""
+        return self.enviar(pwd_context.hash, password).result()
+
+    def hash_lote(self, passwords: Iterable[str]) -> List[str]:
+        """Hashes de varias contraseñas en el mismo orden, con a lo más `workers` en curso."""
+        hashes: List[str] = []
+        en_curso: deque = deque()
+        for password in passwords:
+            if len(en_curso) >= self.workers:
+                hashes.append(en_curso.popleft().result())
+            # Espera lugar en el pool en vez de fallar a la mitad del lote
+            self._cupo.acquire()
+            en_curso.append(self._enviar_con_cupo(pwd_context.hash, password))
+        hashes.extend(futuro.result() for futuro in en_curso)
+        return hashes
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+pool = PoolHashing()
+
+
+def hash_lote(passwords: Iterable[str]) -> List[str]:
+    """Hashes de varias contraseñas en paralelo, en el mismo orden, en el pool compartido."""
+    return pool.hash_lote(passwords)
@@ -0,0 +1,191 @@
+"""
+Parser en streaming de archivos de horarios (formato de horarios.txt).
+
+Lee línea por línea con una máquina de estados y expresiones precompiladas y
+emite registros tipados conforme avanza, sin cargar el archivo completo. Solo
+se guarda en memoria la sección del grupo actual (para resolver las materias
+de la tabla contra la lista "Materias y Profesores", que viene después).
+
+Uso:
+    for registro in parsear_rutas(["horarios/", "otro_campus/*.txt"]):
+        ...
+
+Los errores no detienen el análisis: se emiten como `ErrorParseo` con el
+archivo y el número de línea.
+"""
+import glob
+import os
+import re
+from datetime import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+CARRERA_RE = re.compile(r'^###\s+Horarios de\s+(.+?)(?:\s\(\d{4}\))?\s*$')
+GRUPO_RE = re.compile(r'^####\s+(.+?)\s*$')
+SEPARADOR_RE = re.compile(r'^\s*-{3,}\s*\|')
+RANGO_RE = re.compile(r'^(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})$')
+AULA_RE = re.compile(r'Aula:\s*(.+)$')
+MATERIA_PROFESOR_RE = re.compile(r'^-\s*([^:]+):([^:]*)')
+MARCADOR_MATERIAS = '**Materias y Profesores:**'
+
+# Celdas que no son clases
+CELDAS_IGNORADAS = ('BIBLIOTECA', 'ACTIVIDADES', 'TUTORÍA')
+
+
+class CarreraRegistro(NamedTuple):
+    nombre: str
+
+
+class GrupoRegistro(NamedTuple):
+    carrera: str
+    grupo: str
+
+
+class MateriaRegistro(NamedTuple):
+    carrera: str
+    materia: str
+    profesor: str
+
+
+class HorarioRegistro(NamedTuple):
+    carrera: str
+    grupo: str
+    dia_semana: str
+    hora_inicio: time
+    hora_fin: time
+    materia: str
+    aula: Optional[str]
+
+
+class ErrorParseo(NamedTuple):
+    archivo: str
+    linea: int
+    mensaje: str
+
+    def __str__(self):
+        return f"{self.archivo}:{self.linea}: {self.mensaje}"
+
+
+Registro = Union[CarreraRegistro, GrupoRegistro, MateriaRegistro, HorarioRegistro, ErrorParseo]
+
+
+def _hora(h: str, m: str) -> time:
+    return time(int(h), int(m))
+
+
+def parsear_lineas(lineas: Iterable[str], archivo: str = '<texto>') -> Iterator[Registro]:
+    """Analiza un flujo de líneas y emite los registros encontrados."""
+    carrera: Optional[str] = None
+    grupo: Optional[str] = None
+    materias_carrera: Set[str] = set()
+    celdas_grupo: List[Tuple[str, time, time, str, Optional[str]]] = []
+    encabezado: List[str] = []
+    anterior = ''
+    en_tabla = False
+    en_materias = False
+
+    def cerrar_grupo():
+        # Solo se emiten horarios de materias reconocidas en la carrera
+        for dia, inicio, fin, materia, aula in celdas_grupo:
+            if materia in materias_carrera:
+                yield HorarioRegistro(carrera, grupo, dia, inicio, fin, materia, aula)
+        celdas_grupo.clear()
+
+    for numero, linea in enumerate(lineas, 1):
+        linea = linea.rstrip('\r\n')
+        limpia = linea.strip()
+
+        m = CARRERA_RE.match(limpia)
+        if m:
+            yield from cerrar_grupo()
+            carrera = m.group(1).strip()
+            grupo = None
+            materias_carrera = set()
+            en_tabla = en_materias = False
+            yield CarreraRegistro(carrera)
+            anterior = linea
+            continue
+
+        m = GRUPO_RE.match(limpia)
+        if m:
+            yield from cerrar_grupo()
+            en_tabla = en_materias = False
+            if carrera is None:
+                yield ErrorParseo(archivo, numero, "Grupo fuera de una sección de carrera")
+                grupo = None
+            else:
+                grupo = m.group(1).replace('Grupo ', '').strip()
+                yield GrupoRegistro(carrera, grupo)
+            anterior = linea
+            continue
+
+        if grupo is None:
+            anterior = linea
+            continue
+
+        if SEPARADOR_RE.match(limpia):
+            encabezado = [h.strip() for h in anterior.split('|')]
+            en_tabla = True
+            en_materias = False
+        elif limpia == MARCADOR_MATERIAS:
+            en_tabla = False
+            en_materias = True
+        elif en_tabla and '|' in linea:
+            celdas = [c.strip() for c in linea.split('|')]
+            rango = RANGO_RE.match(celdas[0])
+            if not rango:
+                yield ErrorParseo(archivo, numero, f"Rango de horas inválido: '{celdas[0]}'")
+                anterior = linea
+                continue
+            inicio = _hora(rango.group(1), rango.group(2))
+            fin = _hora(rango.group(3), rango.group(4))
+            for i, celda in enumerate(celdas[1:], 1):
+                if not celda or any(marca in celda for marca in CELDAS_IGNORADAS):
+                    continue
+                if i >= len(encabezado) or not encabezado[i]:
+                    yield ErrorParseo(archivo, numero, f"La columna {i} no tiene día en el encabezado")
+                    continue
+                dia = encabezado[i]
+                # Corrige el día de la semana si es Domingo para que sea Lunes
+                if dia == "Domingo":
+                    dia = "Lunes"
+                aula = AULA_RE.search(celda)
+                materia = (celda[:aula.start()].strip() if aula else celda).replace(' / INGLÉS', '')
+                celdas_grupo.append((dia, inicio, fin, materia, aula.group(1).strip() if aula else None))
+        elif en_tabla and limpia:
+            en_tabla = False
+        elif en_materias and limpia.startswith('-'):
+            m = MATERIA_PROFESOR_RE.match(limpia)
+            if not m or not m.group(2).strip():
+                yield ErrorParseo(archivo, numero, f"Se esperaba 'MATERIA: PROFESOR': '{limpia}'")
+            else:
+                materia = m.group(1).strip()
+                materias_carrera.add(materia)
+                yield MateriaRegistro(carrera, materia, m.group(2).strip())
+        anterior = linea
+
+    yield from cerrar_grupo()
+
+
+def expandir_rutas(rutas: Union[str, Iterable[str]]) -> List[str]:
+    """Acepta archivos, directorios (todos sus .txt) o patrones glob."""
+    if isinstance(rutas, str):
+        rutas = [rutas]
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos.extend(sorted(glob.glob(os.path.join(ruta, '*.txt'))))
+        elif any(c in ruta for c in '*?['):
+            archivos.extend(sorted(glob.glob(ruta)))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+
+def parsear_rutas(rutas: Union[str, Iterable[str]]) -> Iterator[Registro]:
+    """Analiza uno o varios archivos de horarios, uno tras otro."""
+    for archivo in expandir_rutas(rutas):
+        try:
+            with open(archivo, 'r', encoding='utf-8') as f:
+                yield from parsear_lineas(f, archivo)
+        except OSError as e:
+            yield ErrorParseo(archivo, 0, f"No se pudo leer el archivo: {e}")
@@ -0,0 +1,52 @@
+import sys
+import os
+import argparse
+
+# Agregar el directorio 'backend' a sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import SessionLocal
+from app.migraciones import actualizar
+from app.usuarios import leer_archivo, provisionar, resumen
+
+
+def importar(rutas, actualizar_existentes=False):
+    """
+    Da de alta los usuarios de uno o varios archivos CSV/JSON en una sola
+    transacción e imprime el resultado de cada fila.
+    """
+    actualizar()
+
+    filas = []
+    for ruta in rutas:
+        filas.extend(leer_archivo(ruta))
+
+    db = SessionLocal()
+    try:
+        resultados = provisionar(db, filas, actualizar_existentes)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    for r in resultados:
+        detalle = f" ({r.detalle})" if r.detalle else ""
+        print(f"  fila {r.fila:>5}  {r.estado:<11} {r.username or '-'}{detalle}")
+
+    conteo = resumen(resultados)
+    print(f"\n✅ {conteo['creado']} creados, {conteo['actualizado']} actualizados, "
+          f"{conteo['existente']} ya existían, {conteo['error']} con error")
+    return conteo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa usuarios desde archivos CSV o JSON")
+    parser.add_argument("archivos", nargs="+", help="CSV con encabezado username,password,role,email,carrera o JSON")
+    parser.add_argument("--actualizar", action="store_true",
+                        help="Actualizar role, email y carrera de los usuarios que ya existen")
+    args = parser.parse_args()
+
+    conteo = importar(args.archivos, args.actualizar)
+    sys.exit(1 if conteo['error'] else 0)
@@ -0,0 +1,170 @@
+"""
+Conteo de consultas SQL y tiempos por petición.
+
+Los eventos del engine acumulan en un `EstadisticasSQL` guardado en una
+ContextVar; el middleware crea uno por petición y lo reporta en encabezados.
+`contar_consultas()` permite medir lo mismo fuera de una petición (scripts,
+pruebas): `with contar_consultas() as stats: ...; stats.consultas`.
+
+Los pools de database.py (`QueuePoolMedido`) miden además cuánto tarda cada
+checkout en obtener una conexión; se acumula por petición y en
+`ESTADISTICAS_POOL` para todo el proceso.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import metricas
+from .models import Base
+
+
+@dataclass
+class EstadisticasSQL:
+    consultas: int = 0
+    tiempo_sql: float = 0.0  # segundos
+    objetos_cargados: int = 0  # instancias ORM construidas a partir de filas
+    espera_pool: float = 0.0  # segundos esperando conexiones del pool
+
+
+_stats_actual: ContextVar[Optional[EstadisticasSQL]] = ContextVar("stats_sql", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if _stats_actual.get() is not None:
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats_actual.get()
+    if stats is None:
+        return
+    inicio = conn.info.get("inicio_consulta")
+    if inicio:
+        stats.tiempo_sql += time.perf_counter() - inicio.pop()
+    stats.consultas += 1
+
+
+@event.listens_for(Base, "load", propagate=True)
+def _al_cargar(target, context):
+    stats = _stats_actual.get()
+    if stats is not None:
+        stats.objetos_cargados += 1
+
+
+@dataclass
+class EstadisticasPool:
+    """Acumulados del proceso para todos los pools medidos."""
+    checkouts: int = 0
+    esperas: int = 0  # checkouts que tardaron más de UMBRAL_ESPERA
+    tiempo_espera: float = 0.0  # segundos
+    espera_max: float = 0.0
+    agotado: int = 0  # checkouts que fallaron por timeout del pool
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    UMBRAL_ESPERA = 0.001
+
+    def registrar(self, espera: float, agotado: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.tiempo_espera += espera
+            self.espera_max = max(self.espera_max, espera)
+            if espera > self.UMBRAL_ESPERA:
+                self.esperas += 1
+            if agotado:
+                self.agotado += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "esperas": self.esperas,
+                "tiempo_espera_ms": round(self.tiempo_espera * 1000, 3),
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "agotado": self.agotado,
+            }
+
+
+ESTADISTICAS_POOL = EstadisticasPool()
+
+
+class _MedirCheckout:
+    """Mide el tiempo de `_do_get`: esperar una conexión libre o abrir una nueva."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        agotado = False
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            agotado = True
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            ESTADISTICAS_POOL.registrar(espera, agotado)
+            stats = _stats_actual.get()
+            if stats is not None:
+                stats.espera_pool += espera
+
+
+class QueuePoolMedido(_MedirCheckout, QueuePool):
+    pass
+
+
+class AsyncQueuePoolMedido(_MedirCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def estado_pool(engine) -> dict:
+    """Ocupación actual del pool de un engine."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"tipo": type(pool).__name__}
+    return {
+        "tipo": type(pool).__name__,
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+
+@contextmanager
+def contar_consultas():
+    stats = EstadisticasSQL()
+    token = _stats_actual.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats_actual.reset(token)
+
+
+async def middleware_sql(request, call_next):
+    """
+    Agrega X-SQL-Queries, X-SQL-Time-ms, X-ORM-Objects, X-DB-Pool-Wait-ms y
+    X-Response-Time-ms a cada respuesta, y alimenta los histogramas de /metrics
+    por ruta (la plantilla, p. ej. /api/users/{user_id}) y código de estado.
+    """
+    inicio = time.perf_counter()
+    with contar_consultas() as stats:
+        response = await call_next(request)
+    duracion = time.perf_counter() - inicio
+    ruta = getattr(request.scope.get("route"), "path", "sin_ruta")
+    metricas.PETICIONES.observar(duracion, request.method, ruta, response.status_code)
+    metricas.CONSULTAS_POR_PETICION.observar(stats.consultas, ruta)
+    metricas.TIEMPO_SQL_POR_PETICION.observar(stats.tiempo_sql, ruta)
+    response.headers["X-SQL-Queries"] = str(stats.consultas)
+    response.headers["X-SQL-Time-ms"] = f"{stats.tiempo_sql * 1000:.2f}"
+    response.headers["X-ORM-Objects"] = str(stats.objetos_cargados)
+    response.headers["X-DB-Pool-Wait-ms"] = f"{stats.espera_pool * 1000:.2f}"
+    response.headers["X-Response-Time-ms"] = f"{duracion * 1000:.2f}"
+    return response
@@ -0,0 +1,58 @@
+"""
+Estrategias de carga de relaciones por endpoint.
+
+Encadenar `joinedload` a través de colecciones (Carrera.grupos -> Grupo.horarios)
+multiplica las filas del resultado y obliga a SQLAlchemy a deduplicar en Python.
+`ruta()` arma la cadena de opciones eligiendo `selectinload` para colecciones
+(una consulta extra con IN por nivel) y `joinedload` para relaciones
+muchos-a-uno (un LEFT JOIN que no multiplica filas).
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from . import models
+
+
+def _estrategia(atributo, padre=None):
+    cargador = selectinload if atributo.property.uselist else joinedload
+    if padre is None:
+        return cargador(atributo)
+    return getattr(padre, cargador.__name__)(atributo)
+
+
+def ruta(*atributos):
+    """Opción de carga para una ruta de relaciones, p. ej. ruta(Examen.materia, Materia.profesor)."""
+    opcion = None
+    for atributo in atributos:
+        opcion = _estrategia(atributo, opcion)
+    return opcion
+
+
+def carreras():
+    """Árbol Carrera -> Grupo -> Horario -> Materia/Aula para /api/carreras."""
+    return [
+        ruta(models.Carrera.grupos, models.Grupo.horarios, models.Horario.materia, models.Materia.profesor),
+        ruta(models.Carrera.grupos, models.Grupo.horarios, models.Horario.aula),
+    ]
+
+
+def materias():
+    return [
+        ruta(models.Materia.profesor),
+        ruta(models.Materia.carrera),
+    ]
+
+
+def examen(ligero: bool = False):
+    """Relaciones de un examen; la vista completa incluye los horarios del grupo."""
+    opciones = [
+        ruta(models.Examen.materia, models.Materia.profesor),
+        ruta(models.Examen.materia, models.Materia.carrera),
+        ruta(models.Examen.aula),
+        ruta(models.Examen.grupo),
+    ]
+    if not ligero:
+        opciones += [
+            ruta(models.Examen.grupo, models.Grupo.horarios, models.Horario.materia, models.Materia.profesor),
+            ruta(models.Examen.grupo, models.Grupo.horarios, models.Horario.aula),
+        ]
+    return opciones
@@ -0,0 +1,57 @@
+"""
+Configuración de logging de la aplicación (loggers `app.*`).
+
+El nivel se controla con LOG_LEVEL (INFO por defecto) y el formato con
+LOG_FORMATO: `texto` o `json` (una línea JSON por evento, con los campos
+pasados en `extra={"datos": {...}}`). Los mensajes por debajo del nivel no se
+formatean; para ciclos de depuración conviene además revisar
+`logger.isEnabledFor(logging.DEBUG)` antes de armar los datos.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMATO = os.getenv("LOG_FORMATO", "texto")
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        datos = getattr(record, "datos", None)
+        if datos:
+            evento.update(datos)
+        if record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(evento, default=str, ensure_ascii=False)
+
+
+class FormatoTexto(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        texto = super().format(record)
+        datos = getattr(record, "datos", None)
+        if datos:
+            texto += " " + " ".join(f"{k}={v}" for k, v in datos.items())
+        return texto
+
+
+def configurar(nivel: str = LOG_LEVEL, formato: str = LOG_FORMATO):
+    logger = logging.getLogger("app")
+    if getattr(logger, "_configurado", False):
+        return
+    handler = logging.StreamHandler()
+    if formato == "json":
+        handler.setFormatter(FormatoJSON())
+    else:
+        handler.setFormatter(FormatoTexto("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(nivel)
+    # Los mensajes no suben al logger raíz (uvicorn tiene el suyo)
+    logger.propagate = False
+    logger._configurado = True
@@ -1,109 +1,47 @@
-from fastapi import Depends, FastAPI, HTTPException, status
+import logging
+import time as reloj
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session, joinedload, contains_eager
-from typing import List
-from datetime import date, timedelta, datetime
-
-from . import models, schemas
-from .database import SessionLocal, engine
+from starlette.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional, Union
+from datetime import date, time, timedelta, datetime
+
+from . import aprobacion, auditoria, cache, conflicts, disponibilidad, estadisticas, export, hashing, loaders, logs, metricas, migraciones, models, reparacion, schemas, scheduler, sinodales, usuarios
+from .instrumentation import ESTADISTICAS_POOL, estado_pool, middleware_sql
+from .database import SesionLectura, SessionLocal, async_engine, engine, ejecutar_lectura, get_db_lectura
 from .auth import (
-    verify_password, 
-    get_password_hash, 
     create_access_token, 
-    decode_access_token,
+    cache_tokens,
+    get_current_user,
+    requiere_rol,
+    UsuarioActual,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
-models.Base.metadata.create_all(bind=engine)
+logs.configurar()
+logger = logging.getLogger(__name__)
 
-# Función para agregar columnas faltantes a la base de datos
-def init_database():
-    """Inicializa la base de datos agregando columnas faltantes si es necesario"""
-    from sqlalchemy import inspect, text
-    db = SessionLocal()
-    try:
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
-        
-        print(f"[INIT DB] Tablas encontradas: {tables}")
-        
-        # Verificar si la tabla examenes existe
-        if 'examenes' in tables:
-            columns = [col['name'] for col in inspector.get_columns('examenes')]
-            print(f"[INIT DB] Columnas en 'examenes': {columns}")
-
-            # Columnas a agregar
-            columns_to_add = {
-                'sinodal_id': "INTEGER",
-                'status': "VARCHAR(50) DEFAULT 'borrador'",
-                'comentarios_rechazo': "TEXT",
-                'fecha_envio': "DATE",
-                'fecha_aprobacion': "DATE"
-            }
 
-            for col_name, col_type in columns_to_add.items():
-                if col_name not in columns:
-                    print(f"[INIT DB] Agregando columna {col_name} a la tabla examenes...")
-                    try:
-                        db.execute(text(f"ALTER TABLE examenes ADD COLUMN {col_name} {col_type}"))
-                        db.commit()
-                        print(f"[INIT DB] ✓ Columna {col_name} agregada exitosamente")
-                    except Exception as e:
-                        print(f"[INIT DB] ERROR al agregar {col_name}: {e}")
-                        db.rollback()
-                else:
-                    print(f"[INIT DB] ✓ La columna {col_name} ya existe")
-        else:
-            print("[INIT DB] ADVERTENCIA: La tabla 'examenes' no existe aún")
-        
-        # Verificar si la tabla users existe y agregar columna carrera
-        if 'users' in tables:
-            user_columns = [col['name'] for col in inspector.get_columns('users')]
-            print(f"[INIT DB] Columnas en 'users': {user_columns}")
-            
-            if 'carrera' not in user_columns:
-                print("[INIT DB] Agregando columna carrera a la tabla users...")
-                try:
-                    db.execute(text("ALTER TABLE users ADD COLUMN carrera VARCHAR"))
-                    db.commit()
-                    print("[INIT DB] ✓ Columna carrera agregada exitosamente")
-                    
-                    # Actualizar usuarios jefe_carrera existentes
-                    carrera_map = {
-                        'jefe_informatica': 'Licenciatura en Informática',
-                        'jefe_enfermeria': 'Licenciatura en Enfermería',
-                        'jefe_contaduria': 'Licenciatura en Contaduría',
-                    }
-                    
-                    from app.models import User
-                    jefe_users = db.query(User).filter(User.role == 'jefe_carrera').all()
-                    for user in jefe_users:
-                        if user.username in carrera_map:
-                            user.carrera = carrera_map[user.username]
-                            print(f"[INIT DB] Actualizado {user.username} -> {user.carrera}")
-                    db.commit()
-                except Exception as e:
-                    print(f"[INIT DB] ERROR al agregar carrera: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    db.rollback()
-            else:
-                print("[INIT DB] ✓ La columna carrera ya existe")
-    except Exception as e:
-        print(f"[INIT DB] ERROR al inicializar base de datos: {e}")
-        import traceback
-        traceback.print_exc()
-        db.rollback()
-    finally:
-        db.close()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Una sola consulta a alembic_version; el esquema lo administra Alembic
+    migraciones.verificar_esquema()
+    auditoria.iniciar()
+    yield
+    await auditoria.detener()
+    hashing.pool.shutdown()
+    scheduler.cerrar_pool()
 
-# Inicializar base de datos al iniciar la aplicación
-print("[INIT] Inicializando base de datos...")
-init_database()
-print("[INIT] Inicialización de base de datos completada")
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "*"  
@@ -118,6 +56,17 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+app.middleware("http")(middleware_sql)
+app.middleware("http")(auditoria.middleware_auditoria)
+
+@app.exception_handler(hashing.PoolSaturado)
+async def pool_hashing_saturado(request: Request, exc: hashing.PoolSaturado):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Demasiadas solicitudes de autenticación, intenta de nuevo en un momento"},
+        headers={"Retry-After": "1"},
+    )
+
 def get_db():
     db = SessionLocal()
     try:
@@ -177,7 +126,7 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
             )
     
     # Crear nuevo usuario
-    hashed_password = get_password_hash(user.password)
+    hashed_password = hashing.pool.hash_sync(user.password)
     db_user = models.User(
         username=user.username,
         hashed_password=hashed_password,
@@ -194,12 +143,15 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @app.post("/api/auth/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: SesionLectura = Depends(get_db_lectura)):
     """Iniciar sesión y obtener token JWT"""
     # Buscar usuario
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
+    user = await ejecutar_lectura(
+        db, lambda s: s.query(models.User).filter(models.User.username == form_data.username).first()
+    )
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # bcrypt corre en el pool acotado; si está lleno se responde 429
+    if not user or not await hashing.pool.verificar(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos",
@@ -214,7 +166,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     
     # Crear token de acceso
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    token_data = {"sub": user.username, "role": user.role}
+    token_data = {"sub": user.username, "uid": user.id, "role": user.role}
     if user.carrera:
         token_data["carrera"] = user.carrera
     access_token = create_access_token(
@@ -233,42 +185,14 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @app.get("/api/auth/me", response_model=schemas.User)
-def get_current_user(token: str = Depends(lambda: None), db: Session = Depends(get_db)):
-    """Obtener información del usuario actual (requiere token)"""
-    # Este endpoint se puede mejorar con un dependency para extraer el token del header
-    # Por ahora es un placeholder básico
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="No se pudo validar las credenciales",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    if not token:
-        raise credentials_exception
-    
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
-    
-    # Convertir is_active a booleano
-    user.is_active = bool(user.is_active)
-    return user
+def read_current_user(usuario: UsuarioActual = Depends(get_current_user)):
+    """Obtener información del usuario actual (requiere token Bearer)"""
+    return usuario
 
 # ==================== ENDPOINTS DE HORARIOS ====================
 
 def get_carreras_logic(db: Session):
-    carreras = db.query(models.Carrera).options(
-        joinedload(models.Carrera.grupos).joinedload(models.Grupo.horarios).joinedload(models.Horario.materia).joinedload(models.Materia.profesor),
-        joinedload(models.Carrera.grupos).joinedload(models.Grupo.horarios).joinedload(models.Horario.aula)
-    ).all()
+    carreras = db.query(models.Carrera).options(*loaders.carreras()).all()
 
     for carrera in carreras:
         for grupo in carrera.grupos:
@@ -276,88 +200,98 @@ def get_carreras_logic(db: Session):
                 horario.materia.carrera_nombre = carrera.nombre
     return carreras
 
+_carreras_adapter = TypeAdapter(List[schemas.Carrera])
+
+def catalogo_carreras(db: Session, etag_cliente: Optional[str] = None):
+    """
+    Regresa (etag, contenido JSON) del catálogo; contenido es None si el
+    cliente ya tiene esa versión.
+    """
+    version = cache.get_version(db, cache.CATALOGO)
+    etag = f'"{version}"'
+    if etag_cliente == etag:
+        return etag, None
+
+    contenido = cache.cache.get(cache.CATALOGO, version)
+    if contenido is None:
+        # Las consultas se hacen fuera del lock de la caché: en modo asíncrono
+        # esperar a la base de datos con el lock tomado bloquearía el event loop
+        carreras = _carreras_adapter.validate_python(get_carreras_logic(db), from_attributes=True)
+        contenido = cache.cache.get_or_build(
+            cache.CATALOGO, version, lambda: _carreras_adapter.dump_json(carreras)
+        )
+    return etag, contenido
+
 @app.get("/api/carreras", response_model=List[schemas.Carrera])
-def get_carreras(db: Session = Depends(get_db)):
-    return get_carreras_logic(db)
+async def get_carreras(request: Request, db: SesionLectura = Depends(get_db_lectura)):
+    """
+    Catálogo completo de carreras. La respuesta serializada se guarda en caché
+    hasta que cambia la versión del catálogo; el cliente puede revalidar con
+    If-None-Match y recibir 304.
+    """
+    etag, contenido = await ejecutar_lectura(db, catalogo_carreras, request.headers.get("if-none-match"))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if contenido is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=contenido, media_type="application/json", headers=headers)
 
 @app.post("/api/generar-examenes", response_model=List[schemas.Examen])
-def generar_examenes(carrera_id: int, grupo_id: int, db: Session = Depends(get_db)):
+def generar_examenes(carrera_id: int, grupo_id: Optional[int] = None, dias: int = Query(5, ge=1, le=60), db: Session = Depends(get_db)):
 
     carrera = db.query(models.Carrera).filter(models.Carrera.id == carrera_id).first()
     if not carrera:
         raise HTTPException(status_code=404, detail=f"Carrera con ID {carrera_id} no encontrada.")
-    grupo = db.query(models.Grupo).filter(models.Grupo.id == grupo_id).first()
-    if not grupo:
-        raise HTTPException(status_code=404, detail=f"Grupo con ID {grupo_id} no encontrado.")
-
-
-    materia_ids_in_carrera = db.query(models.Materia.id).filter(models.Materia.carrera_id == carrera_id).all()
-    materia_ids_in_carrera = [m_id for m_id, in materia_ids_in_carrera] 
-
-    if materia_ids_in_carrera:
-        db.query(models.Examen).filter(
-            models.Examen.materia_id.in_(materia_ids_in_carrera)
-        ).delete(synchronize_session=False)
-        db.commit() 
-
-    horarios_query = db.query(models.Horario).options(
-        joinedload(models.Horario.materia).joinedload(models.Materia.carrera)
-    ).filter(
-        models.Horario.grupo_id == grupo_id,
-        models.Horario.materia.has(models.Materia.carrera_id == carrera_id)
+    # grupo_id vacío o 0 significa todos los grupos de la carrera
+    grupo_ids = None
+    if grupo_id:
+        grupo = db.query(models.Grupo).filter(models.Grupo.id == grupo_id).first()
+        if not grupo:
+            raise HTTPException(status_code=404, detail=f"Grupo con ID {grupo_id} no encontrado.")
+        grupo_ids = [grupo_id]
+
+    problema = scheduler.cargar_problema(
+        db, [carrera_id], grupo_ids, fecha_inicio=get_next_monday(date.today()), dias=dias
     )
-    horarios_filtrados = horarios_query.all()
-
-    if not horarios_filtrados:
+    if not problema.examenes:
         raise HTTPException(status_code=404, detail=f"No se encontraron horarios para la Carrera ID {carrera_id} y Grupo ID {grupo_id} para generar exámenes.")
 
-    examenes_a_crear = []
-    today = date.today()
-  
-    start_date_for_exams = get_next_monday(today)
-    
-    
-    occupied_slots_per_day = {} 
-
-    for horario in horarios_filtrados:
-        if not horario.materia or not horario.aula_id:
-            continue
-
-        day_of_week = horario.dia_semana.upper()
-        time_slot = horario.hora_inicio.strftime('%H:%M')
-
-        if day_of_week not in occupied_slots_per_day:
-            occupied_slots_per_day[day_of_week] = {}
-        
-       
-        if time_slot in occupied_slots_per_day[day_of_week]:
-            continue 
- 
-        occupied_slots_per_day[day_of_week][time_slot] = True
-
-
-        calculated_exam_date = get_next_weekday(start_date_for_exams, day_of_week)
-        
-        nuevo_examen = models.Examen(
-            fecha=calculated_exam_date,
-            hora_inicio=horario.hora_inicio,
-            hora_fin=horario.hora_fin,
-            tipo='PARCIAL', # Default type
-            materia_id=horario.materia_id,
-            aula_id=horario.aula_id,
-            grupo_id=horario.grupo_id # Assign grupo_id from horario
-        )
-        examenes_a_crear.append(nuevo_examen)
-    
-    if not examenes_a_crear:
+    inicio = reloj.perf_counter()
+    solucion = scheduler.resolver(problema)
+    metricas.observar_calendarizacion("carrera", solucion, reloj.perf_counter() - inicio)
+    if not solucion.asignaciones:
         raise HTTPException(status_code=404, detail="No se pudieron crear nuevos exámenes a partir de los horarios filtrados.")
 
-    print("\n--- DEBUG: Exams to be created ---")
-    for exam in examenes_a_crear:
-        print(f"DEBUG: Exam Date: {exam.fecha}, Start Time: {exam.hora_inicio}, Type: {exam.tipo}, Materia ID: {exam.materia_id}")
-    print("----------------------------------\n")
+    examenes_a_crear = [
+        models.Examen(
+            fecha=a.fecha,
+            hora_inicio=a.hora_inicio,
+            hora_fin=a.hora_fin,
+            tipo=a.examen.tipo,
+            materia_id=a.examen.materia_id,
+            aula_id=a.aula_id,
+            grupo_id=a.examen.grupo_id
+        )
+        for a in solucion.asignaciones
+    ]
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for exam in examenes_a_crear:
+            logger.debug("Examen a crear", extra={"datos": {
+                "fecha": exam.fecha, "hora_inicio": exam.hora_inicio, "tipo": exam.tipo,
+                "materia_id": exam.materia_id, "grupo_id": exam.grupo_id, "aula_id": exam.aula_id,
+            }})
+    if solucion.sin_asignar:
+        logger.info("Exámenes sin slot disponible", extra={"datos": {
+            "carrera_id": carrera_id, "grupo_id": grupo_id, "sin_asignar": len(solucion.sin_asignar),
+        }})
 
     try:
+        # Solo se reemplazan los exámenes de los grupos que se regeneraron
+        materia_ids_in_carrera = db.query(models.Materia.id).filter(models.Materia.carrera_id == carrera_id)
+        borrar = db.query(models.Examen).filter(models.Examen.materia_id.in_(materia_ids_in_carrera.scalar_subquery()))
+        if grupo_ids:
+            borrar = borrar.filter(models.Examen.grupo_id.in_(grupo_ids))
+        borrar.delete(synchronize_session=False)
         db.add_all(examenes_a_crear)
         db.commit()
     except Exception as e:
@@ -367,81 +301,221 @@ def generar_examenes(carrera_id: int, grupo_id: int, db: Session = Depends(get_d
 
     return get_examenes_logic(db)
 
-def get_examenes_logic(db: Session):
+@app.post("/api/generar-examenes/lote", response_model=schemas.GeneracionLoteResultado)
+def generar_examenes_lote(
+    lote: schemas.GeneracionLote,
+    db: Session = Depends(get_db),
+    _: UsuarioActual = Depends(requiere_rol("servicios_escolares", "administrador")),
+):
+    """Generar los exámenes de varias carreras (o de todas) en una sola petición"""
+    if lote.carreras == "all":
+        carrera_ids = [c_id for c_id, in db.query(models.Carrera.id)]
+    else:
+        carrera_ids = list(set(lote.carreras))
+        encontradas = {c_id for c_id, in db.query(models.Carrera.id).filter(models.Carrera.id.in_(carrera_ids))}
+        faltantes = sorted(set(carrera_ids) - encontradas)
+        if faltantes:
+            raise HTTPException(status_code=404, detail=f"Carreras no encontradas: {faltantes}")
+
+    problema = scheduler.cargar_problema(
+        db, carrera_ids, fecha_inicio=get_next_monday(date.today()), dias=lote.dias
+    )
+    if not problema.examenes:
+        raise HTTPException(status_code=404, detail="No se encontraron horarios para generar exámenes.")
+
+    inicio = reloj.perf_counter()
+    solucion, partes = scheduler.resolver_en_paralelo(problema)
+    metricas.observar_calendarizacion("lote", solucion, reloj.perf_counter() - inicio)
+
+    filas = [
+        {
+            "fecha": a.fecha,
+            "hora_inicio": a.hora_inicio,
+            "hora_fin": a.hora_fin,
+            "tipo": a.examen.tipo,
+            "materia_id": a.examen.materia_id,
+            "aula_id": a.aula_id,
+            "grupo_id": a.examen.grupo_id,
+            "status": "borrador",
+        }
+        for a in solucion.asignaciones
+    ]
     try:
-        # Consulta con join para obtener todas las relaciones
-        examenes = db.query(models.Examen).join(models.Examen.materia).join(models.Materia.carrera).options(
-            contains_eager(models.Examen.materia).joinedload(models.Materia.profesor),
-            contains_eager(models.Examen.materia).joinedload(models.Materia.carrera),
-            joinedload(models.Examen.aula),
-            joinedload(models.Examen.grupo)
-        ).all()
+        materia_ids = db.query(models.Materia.id).filter(models.Materia.carrera_id.in_(carrera_ids))
+        db.query(models.Examen).filter(
+            models.Examen.materia_id.in_(materia_ids.scalar_subquery())
+        ).delete(synchronize_session=False)
+        if filas:
+            db.execute(insert(models.Examen), filas)
+        db.commit()
     except Exception as e:
-        # Si el join falla, intentar sin join de carrera
-        import traceback
-        print(f"Error en join, intentando sin join de carrera: {e}")
-        print(traceback.format_exc())
-        try:
-            examenes = db.query(models.Examen).options(
-                joinedload(models.Examen.materia).joinedload(models.Materia.profesor),
-                joinedload(models.Examen.materia).joinedload(models.Materia.carrera),
-                joinedload(models.Examen.aula),
-                joinedload(models.Examen.grupo)
-            ).all()
-        except Exception as e2:
-            print(f"Error en consulta con joinedload: {e2}")
-            import traceback
-            print(traceback.format_exc())
-            raise HTTPException(status_code=500, detail=f"Error al obtener exámenes: {str(e2)}")
-    
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error al guardar exámenes: {e}")
+
+    return {
+        "creados": len(filas),
+        "subproblemas": partes,
+        "costo": solucion.costo,
+        "sin_asignar": [
+            {"materia_id": ex.materia_id, "grupo_id": ex.grupo_id} for ex in solucion.sin_asignar
+        ],
+    }
+
+def filtros_examenes(
+    carrera_id: Optional[int] = None,
+    grupo_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    status: Optional[str] = None,
+    sinodal_id: Optional[int] = None,
+):
+    """Condiciones SQL para los filtros de exámenes"""
+    condiciones = []
+    if carrera_id is not None:
+        condiciones.append(models.Examen.materia_id.in_(
+            select(models.Materia.id).where(models.Materia.carrera_id == carrera_id)
+        ))
+    if grupo_id is not None:
+        condiciones.append(models.Examen.grupo_id == grupo_id)
+    if fecha_desde is not None:
+        condiciones.append(models.Examen.fecha >= fecha_desde)
+    if fecha_hasta is not None:
+        condiciones.append(models.Examen.fecha <= fecha_hasta)
+    if status is not None:
+        condiciones.append(models.Examen.status == status)
+    if sinodal_id is not None:
+        condiciones.append(models.Examen.sinodal_id == sinodal_id)
+    return condiciones
+
+def get_examenes_logic(
+    db: Session,
+    carrera_id: Optional[int] = None,
+    grupo_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    status: Optional[str] = None,
+    sinodal_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None,
+    ligero: bool = False,
+):
+    """
+    Consulta de exámenes con filtros y paginación por llave (id > cursor)
+    resueltos en SQL.
+    """
+    query = db.query(models.Examen).options(*loaders.examen(ligero)).filter(
+        *filtros_examenes(carrera_id, grupo_id, fecha_desde, fecha_hasta, status, sinodal_id)
+    )
+    if cursor is not None:
+        query = query.filter(models.Examen.id > cursor)
+
+    query = query.order_by(models.Examen.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    examenes = query.all()
     for ex in examenes:
-        if ex.materia:
-            if ex.materia.carrera:
-                ex.materia.carrera_nombre = ex.materia.carrera.nombre
-            elif hasattr(ex.materia, 'carrera_id') and ex.materia.carrera_id:
-                carrera = db.query(models.Carrera).filter(models.Carrera.id == ex.materia.carrera_id).first()
-                if carrera:
-                    ex.materia.carrera_nombre = carrera.nombre
-        if ex.grupo:
-            ex.grupo_id = ex.grupo.id
-        # Asegurar que sinodal_id esté definido
-        if not hasattr(ex, 'sinodal_id'):
-            ex.sinodal_id = None
-            
+        if ex.materia and ex.materia.carrera:
+            ex.materia.carrera_nombre = ex.materia.carrera.nombre
     return examenes
 
-@app.get("/api/examenes", response_model=List[schemas.Examen])
-def get_examenes(db: Session = Depends(get_db)):
+@app.get("/api/examenes", response_model=List[Union[schemas.Examen, schemas.ExamenLigero]])
+async def get_examenes(
+    response: Response,
+    carrera_id: Optional[int] = None,
+    grupo_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    status: Optional[str] = None,
+    sinodal_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    vista: Literal["completa", "ligera"] = "completa",
+    db: SesionLectura = Depends(get_db_lectura),
+):
+    """
+    Listar exámenes. Con `limit` se pagina por llave: la siguiente página se
+    pide con `cursor` igual al encabezado X-Next-Cursor. `vista=ligera` omite
+    los horarios anidados del grupo.
+    """
+    ligero = vista == "ligera"
+    schema = schemas.ExamenLigero if ligero else schemas.Examen
     try:
-        return get_examenes_logic(db)
+        examenes = await ejecutar_lectura(
+            db,
+            lambda s: [schema.model_validate(ex) for ex in get_examenes_logic(
+                s, carrera_id=carrera_id, grupo_id=grupo_id, fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta, status=status, sinodal_id=sinodal_id,
+                cursor=cursor, limit=limit, ligero=ligero,
+            )],
+        )
     except Exception as e:
-        # Si hay un error, probablemente es porque sinodal_id no existe en la BD
-        # Intentar sin cargar sinodal_id
-        import traceback
-        print(f"Error en get_examenes: {e}")
-        print(traceback.format_exc())
-        # Intentar consulta más simple
-        try:
-            examenes = db.query(models.Examen).join(models.Examen.materia).join(models.Materia.carrera).options(
-                contains_eager(models.Examen.materia).joinedload(models.Materia.profesor),
-                contains_eager(models.Examen.materia).joinedload(models.Materia.carrera),
-                joinedload(models.Examen.aula),
-                joinedload(models.Examen.grupo)
-            ).all()
-            
-            for ex in examenes:
-                if ex.materia and ex.materia.carrera:
-                    ex.materia.carrera_nombre = ex.materia.carrera.nombre
-                if ex.grupo:
-                    ex.grupo_id = ex.grupo.id
-                # Si sinodal_id no existe, establecerlo como None
-                if not hasattr(ex, 'sinodal_id'):
-                    ex.sinodal_id = None
-                    
-            return examenes
-        except Exception as e2:
-            print(f"Error secundario: {e2}")
-            raise HTTPException(status_code=500, detail=f"Error al obtener exámenes: {str(e2)}")
+        logger.exception("Error en get_examenes")
+        raise HTTPException(status_code=500, detail=f"Error al obtener exámenes: {str(e)}")
+
+    if limit is not None and len(examenes) == limit:
+        response.headers["X-Next-Cursor"] = str(examenes[-1].id)
+    return examenes
+
+@app.get("/api/examenes/exportar")
+def exportar_examenes(
+    formato: Literal["ndjson", "csv", "ics"] = "ndjson",
+    carrera_id: Optional[int] = None,
+    grupo_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    status: Optional[str] = None,
+    sinodal_id: Optional[int] = None,
+):
+    """Exportar el calendario de exámenes en streaming (NDJSON, CSV o iCalendar)"""
+    condiciones = filtros_examenes(carrera_id, grupo_id, fecha_desde, fecha_hasta, status, sinodal_id)
+    return StreamingResponse(
+        export.EXPORTADORES[formato](condiciones),
+        media_type=export.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="examenes.{formato}"'},
+    )
+
+@app.get("/api/conflictos", response_model=List[schemas.Conflicto])
+def get_conflictos(
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    carrera_id: Optional[int] = None,
+    recurso: Optional[List[Literal["aula", "profesor", "grupo"]]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Listar los traslapes entre exámenes (y con restricciones) por aula,
+    profesor (titular o sinodal) y grupo.
+    """
+    indice = conflicts.construir_indice(
+        db, fecha_desde, fecha_hasta, condiciones_examen=filtros_examenes(carrera_id=carrera_id)
+    )
+    return [c.as_dict() for c in indice.conflictos(recurso)]
+
+@app.get("/api/calidad", response_model=schemas.CalidadCalendario)
+async def get_calidad(
+    carrera_id: Optional[int] = None,
+    grupo_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    status: Optional[str] = None,
+    dias: Optional[int] = Query(None, ge=1),
+    db: SesionLectura = Depends(get_db_lectura),
+):
+    """
+    Métricas de calidad del calendario de exámenes filtrado: exámenes por
+    grupo por día, huecos, choques, ocupación de aulas y balance de sinodales.
+    `dias` es el número de días hábiles del periodo (por defecto, el rango de
+    fechas de los exámenes).
+    """
+    # NumPy se importa hasta la primera consulta para no alargar el arranque
+    from . import calidad
+
+    condiciones = filtros_examenes(
+        carrera_id=carrera_id, grupo_id=grupo_id, fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta, status=status,
+    )
+    return await ejecutar_lectura(db, lambda s: calidad.evaluar(calidad.cargar(s, condiciones), dias).as_dict())
 
 @app.get("/api/tipos_examen", response_model=List[schemas.TipoExamen])
 def get_tipos_examen(db: Session = Depends(get_db)):
@@ -455,22 +529,20 @@ def get_tipos_examen(db: Session = Depends(get_db)):
         tipos = db.query(models.TipoExamen).all()
     return tipos
 
-@app.get("/api/materias", response_model=List[schemas.Materia])
-def get_materias(carrera_id: int = None, db: Session = Depends(get_db)):
-    query = db.query(models.Materia).options(
-        joinedload(models.Materia.profesor),
-        joinedload(models.Materia.carrera)
-    )
+def get_materias_logic(db: Session, carrera_id: Optional[int] = None):
+    query = db.query(models.Materia).options(*loaders.materias())
     if carrera_id:
         query = query.filter(models.Materia.carrera_id == carrera_id)
     materias = query.all()
-    
- 
+
     for materia in materias:
         if materia.carrera:
             materia.carrera_nombre = materia.carrera.nombre
-    
-    return materias
+    return [schemas.Materia.model_validate(materia) for materia in materias]
+
+@app.get("/api/materias", response_model=List[schemas.Materia])
+async def get_materias(carrera_id: int = None, db: SesionLectura = Depends(get_db_lectura)):
+    return await ejecutar_lectura(db, get_materias_logic, carrera_id)
 
 @app.post("/api/examenes", response_model=schemas.Examen)
 def create_examen(examen: schemas.ExamenCreate, db: Session = Depends(get_db)):
@@ -479,6 +551,20 @@ def create_examen(examen: schemas.ExamenCreate, db: Session = Depends(get_db)):
     if not tipo_obj:
         raise HTTPException(status_code=404, detail="Tipo de examen no encontrado")
     
+    # Rechazar el examen si choca con otro examen o una restricción
+    materia = db.query(models.Materia).filter(models.Materia.id == examen.materia_id).first()
+    if not materia:
+        raise HTTPException(status_code=404, detail="Materia no encontrada")
+    choques = conflicts.conflictos_de_examen(
+        db, examen.fecha, examen.hora_inicio, examen.hora_fin,
+        aula_id=examen.aula_id, grupo_id=examen.grupo_id, profesor_id=materia.profesor_id,
+    )
+    if choques:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El examen tiene conflictos: {conflicts.describir(choques)}"
+        )
+
     # Crear el examen
     # Nota: models.Examen usa 'tipo' como string, así que usamos el nombre
     db_examen = models.Examen(
@@ -496,10 +582,7 @@ def create_examen(examen: schemas.ExamenCreate, db: Session = Depends(get_db)):
     
     # Cargar relaciones para la respuesta
     examen_result = db.query(models.Examen).options(
-        joinedload(models.Examen.materia).joinedload(models.Materia.profesor),
-        joinedload(models.Examen.materia).joinedload(models.Materia.carrera),
-        joinedload(models.Examen.aula),
-        joinedload(models.Examen.grupo)
+        *loaders.examen()
     ).filter(models.Examen.id == db_examen.id).first()
     
     # Agregar carrera_nombre
@@ -510,10 +593,67 @@ def create_examen(examen: schemas.ExamenCreate, db: Session = Depends(get_db)):
     
     return examen_result
 
+# ==================== ENDPOINTS DE APROBACIÓN ====================
+
+def condiciones_seleccion(seleccion: schemas.SeleccionExamenes, usuario: UsuarioActual):
+    """Condiciones SQL de los exámenes seleccionados; un jefe de carrera solo ve los de su carrera"""
+    if not (seleccion.examen_ids or seleccion.carrera_id is not None or seleccion.grupo_id is not None):
+        raise HTTPException(status_code=400, detail="Indica los exámenes por ID, carrera o grupo")
+    condiciones = filtros_examenes(seleccion.carrera_id, seleccion.grupo_id)
+    if seleccion.examen_ids:
+        condiciones.append(models.Examen.id.in_(seleccion.examen_ids))
+    if usuario.role == "jefe_carrera":
+        condiciones.append(models.Examen.materia_id.in_(
+            select(models.Materia.id)
+            .join(models.Carrera, models.Materia.carrera_id == models.Carrera.id)
+            .where(models.Carrera.nombre == usuario.carrera)
+        ))
+    return condiciones
+
+def transicion_examenes(db: Session, accion: str, seleccion: schemas.SeleccionExamenes, usuario: UsuarioActual,
+                        comentarios: Optional[str] = None):
+    ids = aprobacion.mover(db, accion, condiciones_seleccion(seleccion, usuario), comentarios)
+    db.commit()
+    return {
+        "status": aprobacion.TRANSICIONES[accion].destino,
+        "actualizados": len(ids),
+        "examen_ids": ids,
+        "omitidos": sorted(set(seleccion.examen_ids or ()) - set(ids)),
+    }
+
+@app.post("/api/examenes/enviar", response_model=schemas.TransicionExamenesResultado)
+def enviar_examenes(
+    seleccion: schemas.SeleccionExamenes,
+    db: Session = Depends(get_db),
+    usuario: UsuarioActual = Depends(requiere_rol("jefe_carrera", "servicios_escolares", "administrador")),
+):
+    """Enviar a aprobación los exámenes en borrador o rechazados"""
+    return transicion_examenes(db, "enviar", seleccion, usuario)
+
+@app.post("/api/examenes/aprobar", response_model=schemas.TransicionExamenesResultado)
+def aprobar_examenes(
+    seleccion: schemas.SeleccionExamenes,
+    db: Session = Depends(get_db),
+    usuario: UsuarioActual = Depends(requiere_rol("servicios_escolares", "administrador")),
+):
+    """Aprobar los exámenes pendientes de aprobación"""
+    return transicion_examenes(db, "aprobar", seleccion, usuario)
+
+@app.post("/api/examenes/rechazar", response_model=schemas.TransicionExamenesResultado)
+def rechazar_examenes(
+    rechazo: schemas.RechazoExamenes,
+    db: Session = Depends(get_db),
+    usuario: UsuarioActual = Depends(requiere_rol("servicios_escolares", "administrador")),
+):
+    """Rechazar los exámenes pendientes de aprobación con un comentario"""
+    if not rechazo.comentarios.strip():
+        raise HTTPException(status_code=400, detail="Indica el motivo del rechazo")
+    return transicion_examenes(db, "rechazar", rechazo, usuario, rechazo.comentarios.strip())
+
 # ==================== ENDPOINTS DE GESTIÓN DE USUARIOS ====================
 
 @app.get("/api/users", response_model=List[schemas.User])
-def get_users(db: Session = Depends(get_db)):
+def get_users(db: Session = Depends(get_db), _: UsuarioActual = Depends(requiere_rol("administrador"))):
     """Obtener lista de todos los usuarios"""
     users = db.query(models.User).all()
     # Convertir is_active a booleano para cada usuario
@@ -522,7 +662,11 @@ def get_users(db: Session = Depends(get_db)):
     return users
 
 @app.delete("/api/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
+def delete_user(
+    user_id: int,
+    db: Session = Depends(get_db),
+    _: UsuarioActual = Depends(requiere_rol("administrador")),
+):
     """Eliminar un usuario por ID"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -530,19 +674,126 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     
     db.delete(user)
     db.commit()
+    cache_tokens.invalidar_usuario(user_id)
     return {"message": "Usuario eliminado exitosamente"}
 
+@app.post("/api/users/lote", response_model=schemas.ProvisionUsuarios)
+async def provisionar_usuarios(
+    request: Request,
+    actualizar_existentes: bool = False,
+    db: Session = Depends(get_db),
+    _: UsuarioActual = Depends(requiere_rol("administrador", "servicios_escolares")),
+):
+    """
+    Alta masiva de usuarios. El cuerpo es CSV (Content-Type text/csv, con
+    encabezado username,password,role,email,carrera) o JSON (lista de
+    usuarios o {"usuarios": [...]}). Todo se guarda en una sola transacción y
+    se regresa el resultado de cada fila.
+    """
+    cuerpo = await request.body()
+    try:
+        if "csv" in request.headers.get("content-type", ""):
+            filas = usuarios.leer_csv(cuerpo.decode("utf-8-sig"))
+        else:
+            filas = usuarios.leer_json(cuerpo)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el archivo: {e}")
+
+    def guardar():
+        resultados = usuarios.provisionar(db, filas, actualizar_existentes)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Otro proceso dio de alta alguno de estos usuarios al mismo tiempo
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Algunos usuarios se registraron mientras se procesaba el lote; reintenta")
+        for r in resultados:
+            if r.estado == "actualizado":
+                cache_tokens.invalidar_usuario(r.id)
+        return resultados
+
+    resultados = await run_in_threadpool(guardar)
+    conteo = usuarios.resumen(resultados)
+    return {
+        "creados": conteo["creado"],
+        "actualizados": conteo["actualizado"],
+        "existentes": conteo["existente"],
+        "errores": conteo["error"],
+        "filas": [r.as_dict() for r in resultados],
+    }
+
+@app.patch("/api/users/{user_id}", response_model=schemas.User)
+def update_user(
+    user_id: int,
+    cambios: schemas.UserUpdate,
+    db: Session = Depends(get_db),
+    _: UsuarioActual = Depends(requiere_rol("administrador")),
+):
+    """Actualizar rol, carrera, email o estado (activo/inactivo) de un usuario"""
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    datos = cambios.model_dump(exclude_unset=True)
+    if "is_active" in datos:
+        datos["is_active"] = int(datos["is_active"])
+    for campo, valor in datos.items():
+        setattr(user, campo, valor)
+    db.commit()
+    db.refresh(user)
+    # Los tokens ya emitidos deben volver a validarse contra la base de datos
+    cache_tokens.invalidar_usuario(user_id)
+
+    user.is_active = bool(user.is_active)
+    return user
+
 # ==================== ENDPOINTS DE AULAS, ACADEMIAS Y PROFESORES ====================
 
 @app.get("/api/aulas", response_model=List[schemas.Aula])
-def get_aulas(db: Session = Depends(get_db)):
+async def get_aulas(db: SesionLectura = Depends(get_db_lectura)):
     """Obtener lista de todas las aulas"""
-    return db.query(models.Aula).all()
+    return await ejecutar_lectura(db, lambda s: s.query(models.Aula).all())
 
 @app.get("/api/profesores", response_model=List[schemas.Profesor])
-def get_profesores(db: Session = Depends(get_db)):
+async def get_profesores(db: SesionLectura = Depends(get_db_lectura)):
     """Obtener lista de todos los profesores"""
-    return db.query(models.Profesor).all()
+    return await ejecutar_lectura(db, lambda s: s.query(models.Profesor).all())
+
+@app.get("/api/disponibilidad", response_model=schemas.Disponibilidad)
+async def get_disponibilidad(
+    fecha: date,
+    hora_inicio: time,
+    hora_fin: time,
+    capacidad: Optional[int] = None,
+    tipo_aula: Optional[str] = None,
+    excluir_profesor_id: Optional[int] = None,
+    incluir_clases: bool = True,
+    db: SesionLectura = Depends(get_db_lectura),
+):
+    """
+    Aulas (con al menos `capacidad` lugares) y profesores libres en ese rango.
+    Con incluir_clases=false no se toman en cuenta los horarios de clase, p. ej.
+    en semana de exámenes. `excluir_profesor_id` quita al titular de los
+    sinodales.
+    """
+    if hora_fin <= hora_inicio:
+        raise HTTPException(status_code=400, detail="La hora de fin debe ser posterior a la de inicio")
+    aulas, sinodales = await ejecutar_lectura(
+        db, lambda s: disponibilidad.consultar(
+            s, fecha, hora_inicio, hora_fin, capacidad=capacidad, tipo_aula=tipo_aula,
+            excluir_profesor_id=excluir_profesor_id, incluir_clases=incluir_clases,
+        )
+    )
+    return {"fecha": fecha, "hora_inicio": hora_inicio, "hora_fin": hora_fin, "aulas": aulas, "sinodales": sinodales}
+
+@app.get("/api/estadisticas", response_model=schemas.Estadisticas)
+async def get_estadisticas(carrera_id: Optional[int] = None, db: SesionLectura = Depends(get_db_lectura)):
+    """
+    Horas de clase y de sinodal por profesor y horas de uso por aula, de las
+    tablas de resumen (sin recorrer horarios ni exámenes). Con `carrera_id`
+    sólo cuenta las materias de esa carrera.
+    """
+    return await ejecutar_lectura(db, estadisticas.consultar, carrera_id)
 
 @app.get("/api/academias", response_model=List[schemas.Academia])
 def get_academias(db: Session = Depends(get_db)):
@@ -551,15 +802,15 @@ def get_academias(db: Session = Depends(get_db)):
         return db.query(models.Academia).all()
     except Exception as e:
         # Si la tabla no existe, retornar lista vacía
-        print(f"Error al obtener academias: {e}")
+        logger.warning("Error al obtener academias: %s", e)
         return []
 
 @app.put("/api/examenes/{examen_id}/sinodal")
 def assign_sinodal(examen_id: int, sinodal_data: dict, db: Session = Depends(get_db)):
     """Asignar un sinodal a un examen"""
     examen = db.query(models.Examen).options(
-        joinedload(models.Examen.materia).joinedload(models.Materia.profesor),
-        joinedload(models.Examen.materia).joinedload(models.Materia.carrera)
+        loaders.ruta(models.Examen.materia, models.Materia.profesor),
+        loaders.ruta(models.Examen.materia, models.Materia.carrera)
     ).filter(models.Examen.id == examen_id).first()
     if not examen:
         raise HTTPException(status_code=404, detail="Examen no encontrado")
@@ -575,42 +826,28 @@ def assign_sinodal(examen_id: int, sinodal_data: dict, db: Session = Depends(get
         # Verificar que no sea el profesor titular
         if examen.materia and examen.materia.profesor_id == sinodal_id:
             raise HTTPException(status_code=400, detail="El sinodal no puede ser el mismo profesor titular")
+
+        # Verificar que el sinodal no tenga otro examen o restricción a esa hora
+        choques = conflicts.conflictos_de_examen(
+            db, examen.fecha, examen.hora_inicio, examen.hora_fin,
+            sinodal_id=sinodal_id, examen_id=examen.id,
+        )
+        if choques:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"El sinodal tiene conflictos: {conflicts.describir(choques)}"
+            )
         
-        # Intentar asignar sinodal_id, si la columna no existe, agregarla
-        try:
-            examen.sinodal_id = sinodal_id
-        except AttributeError:
-            # Si la columna no existe, intentar agregarla
-            from sqlalchemy import inspect
-            inspector = inspect(engine)
-            columns = [col['name'] for col in inspector.get_columns('examenes')]
-            if 'sinodal_id' not in columns:
-                try:
-                    db.execute(text("ALTER TABLE examenes ADD COLUMN sinodal_id INTEGER"))
-                    db.commit()
-                    # Recargar el examen
-                    db.refresh(examen)
-                    examen.sinodal_id = sinodal_id
-                except Exception as e:
-                    raise HTTPException(status_code=500, detail=f"Error al agregar columna sinodal_id: {str(e)}")
-            else:
-                raise
+        examen.sinodal_id = sinodal_id
     else:
-        try:
-            examen.sinodal_id = None
-        except AttributeError:
-            # Si la columna no existe, no hacer nada
-            pass
-    
+        examen.sinodal_id = None
+
     db.commit()
     db.refresh(examen)
     
     # Cargar todas las relaciones para la respuesta
     examen_result = db.query(models.Examen).options(
-        joinedload(models.Examen.materia).joinedload(models.Materia.profesor),
-        joinedload(models.Examen.materia).joinedload(models.Materia.carrera),
-        joinedload(models.Examen.aula),
-        joinedload(models.Examen.grupo)
+        *loaders.examen()
     ).filter(models.Examen.id == examen_id).first()
     
     if examen_result and examen_result.materia and examen_result.materia.carrera:
@@ -618,4 +855,145 @@ def assign_sinodal(examen_id: int, sinodal_data: dict, db: Session = Depends(get
     if examen_result and examen_result.grupo:
         examen_result.grupo_id = examen_result.grupo.id
     
-    return {"message": "Sinodal asignado correctamente", "examen_id": examen_id, "sinodal_id": examen_result.sinodal_id if examen_result else None}
\ No newline at end of file
+    return {"message": "Sinodal asignado correctamente", "examen_id": examen_id, "sinodal_id": examen_result.sinodal_id if examen_result else None}
+
+@app.post("/api/sinodales/asignar", response_model=schemas.AsignacionSinodalesResultado)
+def asignar_sinodales(
+    peticion: schemas.AsignacionSinodales,
+    db: Session = Depends(get_db),
+    _: UsuarioActual = Depends(requiere_rol("servicios_escolares", "administrador")),
+):
+    """
+    Asigna sinodal a todos los exámenes seleccionados en una sola operación:
+    solo profesores libres a esa hora, repartiendo la carga y prefiriendo a los
+    de la misma carrera. Con guardar=false regresa la propuesta sin aplicarla.
+    """
+    condiciones = filtros_examenes(peticion.carrera_id, peticion.grupo_id, peticion.fecha_desde, peticion.fecha_hasta)
+    if peticion.examen_ids is not None:
+        condiciones.append(models.Examen.id.in_(peticion.examen_ids))
+    resultado, carga_previa = sinodales.cargar_y_asignar(
+        db, condiciones, solo_pendientes=peticion.solo_pendientes, incluir_clases=peticion.incluir_clases
+    )
+
+    if peticion.guardar and resultado.asignaciones:
+        db.execute(update(models.Examen), [
+            {"id": e_id, "sinodal_id": p_id} for e_id, p_id in resultado.asignaciones.items()
+        ])
+        db.commit()
+        metricas.SINODALES_ASIGNADOS.inc(len(resultado.asignaciones))
+
+    involucrados = {p for p, n in carga_previa.items() if n} | set(resultado.nuevos)
+    nombres = dict(db.query(models.Profesor.id, models.Profesor.nombre).filter(models.Profesor.id.in_(involucrados)))
+    carga = [
+        {"profesor_id": p, "nombre": nombres.get(p, ""), "previos": carga_previa.get(p, 0), "nuevos": resultado.nuevos.get(p, 0)}
+        for p in involucrados
+    ]
+    carga.sort(key=lambda c: (-(c["previos"] + c["nuevos"]), c["nombre"]))
+    return {
+        "asignados": len(resultado.asignaciones),
+        "sin_asignar": resultado.sin_asignar,
+        "costo": resultado.costo,
+        "asignaciones": [{"examen_id": e, "sinodal_id": p} for e, p in resultado.asignaciones.items()],
+        "carga": carga,
+    }
+
+
+@app.post("/api/examenes/reparar", response_model=schemas.ReparacionResultado)
+def reparar_examenes(
+    peticion: schemas.Reparacion,
+    db: Session = Depends(get_db),
+    _: UsuarioActual = Depends(requiere_rol("servicios_escolares", "administrador")),
+):
+    """
+    Quita los choques de los exámenes seleccionados (p. ej. después de que un
+    aula o profesor deja de estar disponible) moviendo el menor número posible
+    de exámenes de fecha, hora o aula, sin regenerar ni tocar sinodales. Las
+    restricciones nuevas se toman en cuenta y se guardan junto con los
+    cambios. Con guardar=false regresa la propuesta sin aplicarla.
+    """
+    restricciones = []
+    for r in peticion.restricciones:
+        if sum(v is not None for v in (r.profesor_id, r.aula_id, r.grupo_id)) != 1:
+            raise HTTPException(status_code=400, detail="Cada restricción debe indicar uno solo de profesor, aula o grupo")
+        if r.hora_inicio is not None and r.hora_fin is not None and r.hora_fin <= r.hora_inicio:
+            raise HTTPException(status_code=400, detail="La hora de fin debe ser posterior a la de inicio")
+        restricciones.append(models.Restriccion(**r.model_dump()))
+
+    condiciones = filtros_examenes(peticion.carrera_id, peticion.grupo_id, peticion.fecha_desde, peticion.fecha_hasta)
+    if peticion.examen_ids is not None:
+        condiciones.append(models.Examen.id.in_(peticion.examen_ids))
+    resultado = reparacion.cargar_y_reparar(
+        db, condiciones, restricciones, peticion.fecha_desde, peticion.fecha_hasta,
+        presupuesto=peticion.presupuesto_ms / 1000, semilla=peticion.semilla,
+    )
+
+    def hora(minutos):
+        return time(minutos // 60, minutos % 60)
+
+    if peticion.guardar:
+        db.add_all(restricciones)
+        if resultado.movimientos:
+            db.execute(update(models.Examen), [
+                {"id": m.examen_id, "fecha": m.despues[0], "hora_inicio": hora(m.despues[1]),
+                 "hora_fin": hora(m.despues[2]), "aula_id": m.despues[3]}
+                for m in resultado.movimientos
+            ])
+        db.commit()
+
+    logger.info("Reparación de exámenes", extra={"datos": {
+        "movidos": len(resultado.movimientos), "choques_iniciales": resultado.choques_iniciales,
+        "choques_finales": resultado.choques_finales, "iteraciones": resultado.iteraciones,
+    }})
+    return {
+        "examenes": resultado.examenes,
+        "choques_iniciales": resultado.choques_iniciales,
+        "choques_finales": resultado.choques_finales,
+        "costo_inicial": resultado.costo_inicial,
+        "costo_final": resultado.costo_final,
+        "sin_resolver": resultado.sin_resolver,
+        "iteraciones": resultado.iteraciones,
+        "aceptados": resultado.aceptados,
+        "tiempo_ms": round(resultado.segundos * 1000, 1),
+        "movimientos": [
+            {
+                "examen_id": m.examen_id,
+                "fecha_anterior": m.antes[0], "hora_inicio_anterior": hora(m.antes[1]),
+                "hora_fin_anterior": hora(m.antes[2]), "aula_id_anterior": m.antes[3],
+                "fecha": m.despues[0], "hora_inicio": hora(m.despues[1]),
+                "hora_fin": hora(m.despues[2]), "aula_id": m.despues[3],
+            }
+            for m in resultado.movimientos
+        ],
+    }
+
+
+# ==================== ENDPOINTS DE MÉTRICAS ====================
+
+@metricas.recolector
+def _metricas_pool():
+    pools = {"sync": engine}
+    if async_engine is not None:
+        pools["async"] = async_engine.sync_engine
+    for nombre, eng in pools.items():
+        estado = estado_pool(eng)
+        for campo in ("en_uso", "libres", "overflow"):
+            if campo in estado:
+                yield f"db_pool_{campo}", "gauge", f"Conexiones del pool ({campo})", {"pool": nombre}, estado[campo]
+    checkout = ESTADISTICAS_POOL.as_dict()
+    yield "db_pool_checkouts_total", "counter", "Conexiones tomadas del pool", {}, checkout["checkouts"]
+    yield "db_pool_waits_total", "counter", "Checkouts que tuvieron que esperar", {}, checkout["esperas"]
+    yield "db_pool_wait_seconds_total", "counter", "Tiempo total esperando conexiones", {}, checkout["tiempo_espera_ms"] / 1000
+    yield "db_pool_timeouts_total", "counter", "Checkouts que agotaron la espera", {}, checkout["agotado"]
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(content=metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/metricas/pool")
+def get_metricas_pool():
+    """Ocupación actual de los pools de conexiones y tiempos de checkout acumulados del proceso"""
+    pools = {"sync": estado_pool(engine)}
+    if async_engine is not None:
+        pools["async"] = estado_pool(async_engine.sync_engine)
+    return {"pools": pools, "checkout": ESTADISTICAS_POOL.as_dict()}
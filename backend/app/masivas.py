@@ -0,0 +1,119 @@
+"""
+Filas que toca una escritura masiva, antes y después de ejecutarla.
+
+insert()/update()/delete() y query.delete() no pasan por el flush, así que los
+listeners de after_flush no las ven. Este módulo intercepta la sentencia una
+sola vez (do_orm_execute) y avisa a los módulos suscritos con un par
+(antes, después) por fila:
+
+  - insert() con lista de filas: (None, fila) con los parámetros de cada una;
+  - update() por llave primaria (lista de filas con su id) y update()/delete()
+    con WHERE: las filas afectadas se leen antes de ejecutar (por sus IDs o con
+    el mismo WHERE) y, en los update(), otra vez después por sus IDs.
+
+Las filas son diccionarios columna -> valor de la tabla del modelo. Sólo se
+leen filas de los modelos que algún suscriptor pidió.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+
+from .database import SessionLocal
+
+Fila = Dict[str, object]
+Cambios = List[Tuple[Optional[Fila], Optional[Fila]]]
+
+# Tamaño de los IN (...) al leer filas por sus IDs
+LOTE_IDS = 500
+
+# (función, modelos o None para todos, modelos excluidos)
+_suscriptores: List[Tuple[Callable, Optional[tuple], tuple]] = []
+
+
+def suscribir(*modelos, excluir: tuple = ()):
+    """
+    Registra `funcion(session, modelo, accion, cambios)` para las escrituras
+    masivas de `modelos` (o de todos, menos `excluir`). `accion` es 'crear',
+    'modificar' o 'eliminar'. Se llama en la misma transacción, después de
+    ejecutar la sentencia.
+    """
+    def registrar(funcion):
+        _suscriptores.append((funcion, modelos or None, excluir))
+        return funcion
+    return registrar
+
+
+def _interesados(modelo) -> List[Callable]:
+    return [
+        funcion for funcion, modelos, excluir in _suscriptores
+        if (modelos is None or modelo in modelos) and modelo not in excluir
+    ]
+
+
+def _leer(conn, tabla, llave, condicion) -> Dict[object, Fila]:
+    consulta = select(tabla)
+    if condicion is not None:
+        consulta = consulta.where(condicion)
+    return {fila[llave.name]: dict(fila) for fila in conn.execute(consulta).mappings()}
+
+
+def _leer_ids(conn, tabla, llave, ids) -> Dict[object, Fila]:
+    filas: Dict[object, Fila] = {}
+    ids = list(ids)
+    for i in range(0, len(ids), LOTE_IDS):
+        filas.update(_leer(conn, tabla, llave, llave.in_(ids[i:i + LOTE_IDS])))
+    return filas
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _escritura_masiva(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return None
+    modelo = mapper.class_
+    funciones = _interesados(modelo)
+    if not funciones:
+        return None
+
+    session = orm_execute_state.session
+    parametros = orm_execute_state.parameters
+    if orm_execute_state.is_insert:
+        if isinstance(parametros, list):
+            filas = [dict(fila) for fila in parametros]
+        elif parametros:
+            filas = [dict(parametros)]
+        else:
+            filas = [dict(orm_execute_state.statement.compile().params)]
+        resultado = orm_execute_state.invoke_statement()
+        for funcion in funciones:
+            funcion(session, modelo, 'crear', [(None, fila) for fila in filas])
+        return resultado
+
+    tabla = mapper.local_table
+    if len(tabla.primary_key.columns) != 1:
+        return None
+    llave = list(tabla.primary_key.columns)[0]
+    conn = session.connection()
+    if isinstance(parametros, list):
+        # update() por llave primaria con una lista de filas
+        antes = _leer_ids(conn, tabla, llave, [fila[llave.key] for fila in parametros if llave.key in fila])
+    else:
+        antes = _leer(conn, tabla, llave, orm_execute_state.statement.whereclause)
+
+    resultado = orm_execute_state.invoke_statement()
+    if orm_execute_state.statement.returning_column_descriptions:
+        # Las filas de RETURNING se conservan antes de volver a consultar
+        resultado = resultado.freeze()()
+    if not antes:
+        return resultado
+
+    if orm_execute_state.is_update:
+        despues = _leer_ids(conn, tabla, llave, antes)
+        accion, cambios = 'modificar', [(fila, despues.get(id_)) for id_, fila in antes.items()]
+    else:
+        accion, cambios = 'eliminar', [(fila, None) for fila in antes.values()]
+    for funcion in funciones:
+        funcion(session, modelo, accion, cambios)
+    return resultado
@@ -0,0 +1,163 @@
+"""
+Métricas del proceso en formato de texto de Prometheus (GET /metrics).
+
+Contadores e histogramas mínimos, sin dependencias: cada serie es una tupla
+de valores de etiquetas y se actualiza bajo un lock. Los valores que ya se
+llevan en otro lado (pool de conexiones, cola de auditoría) se leen al momento
+de exponer con `recolector`.
+
+Las métricas son por proceso: con varios workers de uvicorn, Prometheus debe
+raspar cada uno o sumar por instancia.
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+BUCKETS_CALENDARIZACION = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+_registro: List["_Metrica"] = []
+_recolectores: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence, extra: str = '') -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+
+def _numero(valor: float) -> str:
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ''
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def _encabezado(self) -> List[str]:
+        return [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[tuple, float] = {}
+
+    def inc(self, cantidad: float = 1, *valores):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._valores.items())
+        return self._encabezado() + [
+            f'{self.nombre}{_etiquetas(self.etiquetas, v)} {_numero(total)}' for v, total in series
+        ]
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # valores de etiquetas -> [conteo por bucket (no acumulado) + +Inf, suma]
+        self._series: Dict[tuple, list] = {}
+
+    def observar(self, valor: float, *valores):
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = sorted((v, (list(s[0]), s[1])) for v, s in self._series.items())
+        lineas = self._encabezado()
+        for valores, (conteos, suma) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (math.inf,), conteos):
+                acumulado += conteo
+                le = 'le="' + _numero(limite) + '"'
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {acumulado}')
+        return lineas
+
+
+def recolector(funcion):
+    """
+    Registra una función que regresa (nombre, tipo, ayuda, etiquetas, valor)
+    para valores que se leen al momento de exponer.
+    """
+    _recolectores.append(funcion)
+    return funcion
+
+
+def exponer() -> str:
+    lineas = []
+    for metrica in _registro:
+        lineas.extend(metrica.exponer())
+    vistos = set()
+    for funcion in _recolectores:
+        for nombre, tipo, ayuda, etiquetas, valor in funcion():
+            if nombre not in vistos:
+                vistos.add(nombre)
+                lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+            lineas.append(f'{nombre}{_etiquetas(list(etiquetas), list(etiquetas.values()))} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+# ---- Métricas de la aplicación ----
+
+PETICIONES = Histograma(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP',
+    ('method', 'route', 'status'),
+)
+CONSULTAS_POR_PETICION = Histograma(
+    'db_queries_per_request', 'Consultas SQL ejecutadas por petición',
+    ('route',), BUCKETS_CONSULTAS,
+)
+TIEMPO_SQL_POR_PETICION = Histograma(
+    'db_query_seconds_per_request', 'Tiempo total en consultas SQL por petición',
+    ('route',),
+)
+CALENDARIZACION = Histograma(
+    'scheduler_duration_seconds', 'Tiempo de resolución del motor de calendarización',
+    ('modo',), BUCKETS_CALENDARIZACION,
+)
+EXAMENES_COLOCADOS = Contador(
+    'scheduler_exams_placed_total', 'Exámenes a los que el motor asignó fecha, hora y aula', ('modo',),
+)
+EXAMENES_SIN_ASIGNAR = Contador(
+    'scheduler_exams_unplaced_total', 'Exámenes que el motor no pudo colocar', ('modo',),
+)
+SINODALES_ASIGNADOS = Contador(
+    'sinodales_assigned_total', 'Sinodales asignados automáticamente',
+)
+
+
+def observar_calendarizacion(modo: str, solucion, segundos: float):
+    CALENDARIZACION.observar(segundos, modo)
+    EXAMENES_COLOCADOS.inc(len(solucion.asignaciones), modo)
+    EXAMENES_SIN_ASIGNAR.inc(len(solucion.sin_asignar), modo)
@@ -0,0 +1,110 @@
+"""
+Verificación del esquema al arrancar.
+
+El esquema lo administra Alembic (ver backend/alembic). Al arrancar, cada
+worker solo compara la revisión guardada en `alembic_version` (una consulta)
+contra la revisión head de los scripts de migración (que se lee del disco, sin
+base de datos). Si no coinciden el worker no arranca, salvo que
+MIGRAR_AL_INICIAR=1; en ese caso aplica las migraciones pendientes, en
+PostgreSQL bajo un advisory lock para que varios workers no ejecuten DDL al
+mismo tiempo.
+"""
+import glob
+import logging
+import os
+import re
+from functools import lru_cache
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'alembic.ini'))
+VERSIONES = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'alembic', 'versions'))
+
+_REVISION_RE = re.compile(r"^revision\b[^=]*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision\b[^=]*=\s*(.+)$", re.MULTILINE)
+
+# Llave arbitraria para pg_advisory_xact_lock
+LLAVE_LOCK_MIGRACIONES = 720_011
+
+
+class EsquemaDesactualizado(RuntimeError):
+    pass
+
+
+def _config():
+    from alembic.config import Config
+    return Config(ALEMBIC_INI)
+
+
+@lru_cache(maxsize=1)
+def revision_esperada() -> str:
+    """
+    Revisión head de los scripts de migración. Se obtiene leyendo los
+    identificadores de los archivos en lugar de importar Alembic, que agrega
+    cientos de milisegundos al arranque de cada worker.
+    """
+    revisiones, anteriores = set(), set()
+    for archivo in glob.glob(os.path.join(VERSIONES, '*.py')):
+        with open(archivo, encoding='utf-8') as f:
+            contenido = f.read()
+        revision = _REVISION_RE.search(contenido)
+        if revision is None:
+            continue
+        revisiones.add(revision.group(1))
+        down = _DOWN_REVISION_RE.search(contenido)
+        if down:
+            anteriores.update(re.findall(r"['\"]([^'\"]+)['\"]", down.group(1)))
+    heads = revisiones - anteriores
+    if len(heads) != 1:
+        raise EsquemaDesactualizado(f"Se esperaba una sola revisión head de Alembic, hay {sorted(heads)}")
+    return heads.pop()
+
+
+def revision_actual(conn):
+    """Revisión aplicada en la base de datos, o None si nunca se migró."""
+    try:
+        with conn.begin_nested():
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        # La tabla no existe: base de datos nueva o creada antes de Alembic
+        return None
+
+
+def actualizar(bind=None):
+    """Aplica las migraciones pendientes (equivale a `alembic upgrade head`)."""
+    from alembic import command
+
+    bind = bind or engine
+    config = _config()
+    with bind.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_xact_lock(:llave)"), {"llave": LLAVE_LOCK_MIGRACIONES})
+        config.attributes["connection"] = conn
+        command.upgrade(config, "head")
+
+
+def verificar_esquema(bind=None):
+    """
+    Comprueba que la base de datos esté en la revisión head. Con
+    MIGRAR_AL_INICIAR=1 aplica las migraciones pendientes en lugar de fallar.
+    """
+    bind = bind or engine
+    esperada = revision_esperada()
+    with bind.connect() as conn:
+        actual = revision_actual(conn)
+    if actual == esperada:
+        return
+
+    if os.getenv("MIGRAR_AL_INICIAR", "0") == "1":
+        logger.info("Migrando la base de datos de %s a %s", actual, esperada)
+        actualizar(bind)
+        return
+    raise EsquemaDesactualizado(
+        f"La base de datos está en la revisión {actual}, se esperaba {esperada}. "
+        "Ejecuta `alembic upgrade head` desde backend/ o arranca con MIGRAR_AL_INICIAR=1."
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Date, Time, ForeignKey
+from sqlalchemy import create_engine, CheckConstraint, Column, Integer, String, Text, Date, DateTime, Time, ForeignKey, Index
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -9,8 +9,8 @@ class Horario(Base):
     dia_semana = Column(String) # e.g., 'LUNES'
     hora_inicio = Column(Time)
     hora_fin = Column(Time)
-    grupo_id = Column(Integer, ForeignKey('grupos.id'))
-    materia_id = Column(Integer, ForeignKey('materias.id'))
+    grupo_id = Column(Integer, ForeignKey('grupos.id'), index=True)
+    materia_id = Column(Integer, ForeignKey('materias.id'), index=True)
     aula_id = Column(Integer, ForeignKey('aulas.id'))
 
     grupo = relationship("Grupo", back_populates="horarios")
@@ -57,8 +57,8 @@ class Materia(Base):
     __tablename__ = 'materias'
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String)
-    carrera_id = Column(Integer, ForeignKey('carreras.id'))
-    profesor_id = Column(Integer, ForeignKey('profesores.id'))
+    carrera_id = Column(Integer, ForeignKey('carreras.id'), index=True)
+    profesor_id = Column(Integer, ForeignKey('profesores.id'), index=True)
 
     # Relationships
     carrera = relationship("Carrera", back_populates="materias")
@@ -70,7 +70,7 @@ class Grupo(Base):
     __tablename__ = 'grupos'
     id = Column(Integer, primary_key=True, index=True)
     nombre_grupo = Column(String)
-    carrera_id = Column(Integer, ForeignKey('carreras.id'))
+    carrera_id = Column(Integer, ForeignKey('carreras.id'), index=True)
 
     # Relationships
     carrera = relationship("Carrera", back_populates="grupos")
@@ -85,18 +85,24 @@ class TipoExamen(Base):
 
 class Examen(Base):
     __tablename__ = 'examenes'
+    __table_args__ = (
+        # Búsquedas de choques por aula y listado por grupo en un rango de fechas
+        Index('ix_examenes_aula_fecha_hora', 'aula_id', 'fecha', 'hora_inicio'),
+        Index('ix_examenes_grupo_fecha', 'grupo_id', 'fecha'),
+        Index('ix_examenes_sinodal_fecha', 'sinodal_id', 'fecha'),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    fecha = Column(Date)
+    fecha = Column(Date, index=True)
     hora_inicio = Column(Time)
     hora_fin = Column(Time)
     tipo = Column(String) # e.g., 'PARCIAL', 'FINAL'
-    materia_id = Column(Integer, ForeignKey('materias.id'))
+    materia_id = Column(Integer, ForeignKey('materias.id'), index=True)
     aula_id = Column(Integer, ForeignKey('aulas.id'))
     grupo_id = Column(Integer, ForeignKey('grupos.id'))
     sinodal_id = Column(Integer, ForeignKey('profesores.id'), nullable=True) # Sinodal asignado
 
    
-    status = Column(String, default='borrador') # borrador, pendiente_aprobacion, aprobado, rechazado
+    status = Column(String, default='borrador', index=True) # borrador, pendiente_aprobacion, aprobado, rechazado
     comentarios_rechazo = Column(Text, nullable=True)
     fecha_envio = Column(Date, nullable=True)
     fecha_aprobacion = Column(Date, nullable=True)
@@ -105,6 +111,27 @@ class Examen(Base):
     aula = relationship("Aula", back_populates="examenes")
     grupo = relationship("Grupo", back_populates="examenes") # Add relationship to Grupo
 
+class Restriccion(Base):
+    """Ventana en la que un profesor, aula o grupo no está disponible"""
+    __tablename__ = 'restricciones'
+    __table_args__ = (
+        # Exactamente uno de profesor, aula o grupo, como en db/init/base.sql
+        CheckConstraint(
+            "(CASE WHEN profesor_id IS NOT NULL THEN 1 ELSE 0 END) + "
+            "(CASE WHEN aula_id IS NOT NULL THEN 1 ELSE 0 END) + "
+            "(CASE WHEN grupo_id IS NOT NULL THEN 1 ELSE 0 END) = 1",
+            name='ck_restricciones_un_recurso',
+        ),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    profesor_id = Column(Integer, ForeignKey('profesores.id', ondelete='CASCADE'), nullable=True)
+    aula_id = Column(Integer, ForeignKey('aulas.id', ondelete='CASCADE'), nullable=True)
+    grupo_id = Column(Integer, ForeignKey('grupos.id', ondelete='CASCADE'), nullable=True)
+    fecha = Column(Date, nullable=True)  # Sin fecha aplica todos los días
+    hora_inicio = Column(Time, nullable=True)  # Sin horas aplica todo el día
+    hora_fin = Column(Time, nullable=True)
+    motivo = Column(Text, nullable=True)
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, index=True)
@@ -114,3 +141,54 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=True)
     carrera = Column(String, nullable=True)  # Nombre de la carrera para jefe_carrera
     is_active = Column(Integer, default=1)  # 1 for active, 0 for inactive
+
+class VersionDatos(Base):
+    __tablename__ = 'versiones_datos'
+    nombre = Column(String, primary_key=True)  # e.g., 'catalogo'
+    version = Column(String, nullable=False)  # Token que cambia con cada escritura
+
+class Auditoria(Base):
+    """
+    Cambio registrado en otra tabla. Sin llaves foráneas: el registro debe
+    sobrevivir al borrado de lo que describe.
+    """
+    __tablename__ = 'auditoria'
+    __table_args__ = (
+        Index('ix_auditoria_tabla_registro', 'tabla_afectada', 'registro_id'),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    accion = Column(String(100), nullable=False)  # crear, modificar, eliminar
+    tabla_afectada = Column(String(50))
+    registro_id = Column(Integer, nullable=True)
+    usuario_id = Column(Integer, nullable=True)  # Quién hizo el cambio, si se conoce
+    examen_id = Column(Integer, nullable=True)
+    grupo_id = Column(Integer, nullable=True)
+    aula_id = Column(Integer, nullable=True)
+    tipo_examen_id = Column(Integer, nullable=True)
+    datos_anteriores = Column(Text, nullable=True)  # JSON
+    datos_nuevos = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, index=True)
+
+class CargaProfesor(Base):
+    """
+    Resumen de la carga de un profesor por carrera (carrera_id 0: materias sin
+    carrera). Se mantiene en app/estadisticas.py; sin llaves foráneas porque
+    es un dato derivado.
+    """
+    __tablename__ = 'carga_profesores'
+    profesor_id = Column(Integer, primary_key=True)
+    carrera_id = Column(Integer, primary_key=True)
+    clases = Column(Integer, nullable=False, default=0)  # Bloques semanales como titular
+    minutos_clase = Column(Integer, nullable=False, default=0)  # Por semana
+    examenes_sinodal = Column(Integer, nullable=False, default=0)
+    minutos_sinodal = Column(Integer, nullable=False, default=0)
+
+class UsoAula(Base):
+    """Resumen del uso de un aula por carrera, igual que CargaProfesor"""
+    __tablename__ = 'uso_aulas'
+    aula_id = Column(Integer, primary_key=True)
+    carrera_id = Column(Integer, primary_key=True)
+    clases = Column(Integer, nullable=False, default=0)
+    minutos_clase = Column(Integer, nullable=False, default=0)  # Por semana
+    examenes = Column(Integer, nullable=False, default=0)
+    minutos_examen = Column(Integer, nullable=False, default=0)
@@ -1,143 +1,219 @@
 import sys
 import os
-import re
-import datetime
+from collections import defaultdict
 
 # Agrega el directorio 'backend' a sys.path para que se encuentre el módulo 'app'
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.database import SessionLocal, engine
-from app.models import Base, Carrera, Profesor, Aula, Materia, Grupo, Horario
+from sqlalchemy import delete, insert, select, update
 
-def get_or_create(session, model, **kwargs):
+from app.database import SessionLocal
+from app.migraciones import actualizar
+from app.models import Carrera, Profesor, Aula, Materia, Grupo, Horario
+from app.cache import CATALOGO, bump_version
+from app.horarios_parser import (
+    CarreraRegistro, ErrorParseo, GrupoRegistro, HorarioRegistro, MateriaRegistro,
+    expandir_rutas, parsear_rutas,
+)
+
+
+def construir_catalogo(registros, errores=None):
     """
-    Revisa si un objeto existe en la base de datos. Si existe, lo devuelve.
-    Si no, crea uno nuevo y lo devuelve.
+    Agrupa los registros del parser en conjuntos de llaves naturales:
+    carreras, profesores, aulas, grupos (carrera, grupo), materias
+    (carrera, materia) -> profesor y horarios
+    (carrera, grupo, dia, inicio, fin, materia, aula).
+    Los errores de parseo se agregan a `errores` si se proporciona.
     """
-    instance = session.query(model).filter_by(**kwargs).first()
-    if instance:
-        return instance, False
+    catalogo = {
+        'carreras': set(),
+        'profesores': set(),
+        'aulas': set(),
+        'grupos': set(),
+        'materias': {},
+        'horarios': set(),
+    }
+    for registro in registros:
+        if isinstance(registro, HorarioRegistro):
+            if registro.aula:
+                catalogo['aulas'].add(registro.aula)
+            catalogo['horarios'].add(tuple(registro))
+        elif isinstance(registro, MateriaRegistro):
+            catalogo['profesores'].add(registro.profesor)
+            # Si la materia aparece en varios grupos se conserva el primer profesor
+            catalogo['materias'].setdefault((registro.carrera, registro.materia), registro.profesor)
+        elif isinstance(registro, GrupoRegistro):
+            catalogo['grupos'].add(tuple(registro))
+        elif isinstance(registro, CarreraRegistro):
+            catalogo['carreras'].add(registro.nombre)
+        elif isinstance(registro, ErrorParseo) and errores is not None:
+            errores.append(registro)
+    return catalogo
+
+
+def _insertar_con_llave_unica(db, model, filas, columna):
+    """INSERT ... ON CONFLICT DO NOTHING cuando el dialecto lo soporta."""
+    if not filas:
+        return
+    dialecto = db.get_bind().dialect.name
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
     else:
-        instance = model(**kwargs)
-        session.add(instance)
-        session.flush()
-        return instance, True
+        db.execute(insert(model), filas)
+        return
+    db.execute(dialect_insert(model).on_conflict_do_nothing(index_elements=[columna]), filas)
+
 
-def populate():
+def importar(db, catalogo):
     """
-    Analiza los datos crudos desde un archivo y puebla la base de datos.
+    Sincroniza el catálogo parseado con la base de datos sin borrar nada fuera
+    de él: inserta lo que falta, corrige el profesor de las materias y
+    reemplaza solo los horarios que cambiaron en los grupos del archivo.
+    Las búsquedas se resuelven con diccionarios cargados una vez por tabla.
+    Regresa un resumen con los cambios.
     """
-    # Construir la ruta al archivo de datos
-    try:
-        data_path = os.path.join(os.path.dirname(__file__), 'horarios.txt')
-        with open(data_path, 'r', encoding='utf-8') as f:
-            data = f.read()
-    except FileNotFoundError:
-        print(f"Error: No se encontró el archivo 'horarios.txt' en la ruta: {data_path}")
+    resumen = defaultdict(int)
+
+    # Carreras y aulas tienen nombre único: se insertan con ON CONFLICT
+    carreras = dict(db.execute(select(Carrera.nombre, Carrera.id)).all())
+    nuevas = [{'nombre': n} for n in sorted(catalogo['carreras']) if n not in carreras]
+    _insertar_con_llave_unica(db, Carrera, nuevas, 'nombre')
+    if nuevas:
+        carreras = dict(db.execute(select(Carrera.nombre, Carrera.id)).all())
+    resumen['carreras'] += len(nuevas)
+
+    aulas = dict(db.execute(select(Aula.nombre, Aula.id)).all())
+    nuevas = [{'nombre': n} for n in sorted(catalogo['aulas']) if n not in aulas]
+    _insertar_con_llave_unica(db, Aula, nuevas, 'nombre')
+    if nuevas:
+        aulas = dict(db.execute(select(Aula.nombre, Aula.id)).all())
+    resumen['aulas'] += len(nuevas)
+
+    # Profesores, grupos y materias se identifican por su llave natural
+    def mapa_profesores():
+        mapa = {}
+        for nombre, p_id in db.execute(select(Profesor.nombre, Profesor.id).order_by(Profesor.id)):
+            mapa.setdefault(nombre, p_id)
+        return mapa
+
+    profesores = mapa_profesores()
+    nuevas = [{'nombre': n} for n in sorted(catalogo['profesores']) if n not in profesores]
+    if nuevas:
+        db.execute(insert(Profesor), nuevas)
+        profesores = mapa_profesores()
+    resumen['profesores'] += len(nuevas)
+
+    def mapa_grupos():
+        mapa = {}
+        for c_id, nombre, g_id in db.execute(select(Grupo.carrera_id, Grupo.nombre_grupo, Grupo.id).order_by(Grupo.id)):
+            mapa.setdefault((c_id, nombre), g_id)
+        return mapa
+
+    grupos = mapa_grupos()
+    nuevas = [
+        {'carrera_id': carreras[c], 'nombre_grupo': g}
+        for c, g in sorted(catalogo['grupos'])
+        if (carreras[c], g) not in grupos
+    ]
+    if nuevas:
+        db.execute(insert(Grupo), nuevas)
+        grupos = mapa_grupos()
+    resumen['grupos'] += len(nuevas)
+
+    def mapa_materias():
+        mapa = {}
+        for c_id, nombre, m_id, p_id in db.execute(
+            select(Materia.carrera_id, Materia.nombre, Materia.id, Materia.profesor_id).order_by(Materia.id)
+        ):
+            mapa.setdefault((c_id, nombre), (m_id, p_id))
+        return mapa
+
+    materias = mapa_materias()
+    nuevas = []
+    cambios_profesor = []
+    for (c, m), prof in sorted(catalogo['materias'].items()):
+        llave = (carreras[c], m)
+        if llave not in materias:
+            nuevas.append({'carrera_id': llave[0], 'nombre': m, 'profesor_id': profesores[prof]})
+        elif materias[llave][1] != profesores[prof]:
+            cambios_profesor.append({'id': materias[llave][0], 'profesor_id': profesores[prof]})
+    if nuevas:
+        db.execute(insert(Materia), nuevas)
+        materias = mapa_materias()
+    if cambios_profesor:
+        db.execute(update(Materia), cambios_profesor)
+    resumen['materias'] += len(nuevas)
+    resumen['materias_actualizadas'] += len(cambios_profesor)
+
+    # Horarios: diferencia por grupo entre el archivo y la base de datos
+    deseados = set()
+    for c, g, dia, inicio, fin, m, aula in catalogo['horarios']:
+        deseados.add((
+            grupos[(carreras[c], g)], dia, inicio, fin,
+            materias[(carreras[c], m)][0], aulas[aula] if aula else None,
+        ))
+    grupo_ids = {grupos[(carreras[c], g)] for c, g in catalogo['grupos']}
+
+    existentes = {}
+    sobrantes = []
+    if grupo_ids:
+        for h_id, *llave in db.execute(
+            select(Horario.id, Horario.grupo_id, Horario.dia_semana, Horario.hora_inicio,
+                   Horario.hora_fin, Horario.materia_id, Horario.aula_id)
+            .where(Horario.grupo_id.in_(grupo_ids))
+            .order_by(Horario.id)
+        ):
+            llave = tuple(llave)
+            if llave in deseados and llave not in existentes:
+                existentes[llave] = h_id
+            else:
+                sobrantes.append(h_id)
+
+    nuevos = [
+        {'grupo_id': g_id, 'dia_semana': dia, 'hora_inicio': inicio, 'hora_fin': fin,
+         'materia_id': m_id, 'aula_id': a_id}
+        for g_id, dia, inicio, fin, m_id, a_id in sorted(deseados - existentes.keys(), key=str)
+    ]
+    if sobrantes:
+        db.execute(delete(Horario).where(Horario.id.in_(sobrantes)))
+    if nuevos:
+        db.execute(insert(Horario), nuevos)
+    resumen['horarios'] += len(nuevos)
+    resumen['horarios_eliminados'] += len(sobrantes)
+
+    if any(resumen.values()):
+        # Invalida el catálogo en caché de los servidores que estén corriendo
+        bump_version(db, CATALOGO)
+    return dict(resumen)
+
+
+def populate(rutas=None):
+    """
+    Analiza los archivos de horarios (por defecto horarios.txt; acepta archivos,
+    directorios o patrones glob) y sincroniza la base de datos.
+    Es idempotente: volver a importar los mismos archivos no cambia nada y no
+    toca usuarios ni exámenes.
+    """
+    if not rutas:
+        rutas = [os.path.join(os.path.dirname(__file__), 'horarios.txt')]
+    archivos = expandir_rutas(rutas)
+    faltantes = [a for a in archivos if not os.path.isfile(a)]
+    if not archivos or faltantes:
+        print(f"Error: No se encontraron los archivos de horarios: {faltantes or rutas}")
         return
 
-    # Reiniciar la base de datos
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    
-    db = SessionLocal()
+    actualizar()
 
-    materias_map = {}
-
-    carrera_blocks = data.strip().split('### Horarios de ')
-    for block in carrera_blocks:
-        if not block:
-            continue
-
-        lines = block.strip().split('\n')
-        carrera_name_full = lines[0].strip()
-        carrera_name_match = re.match(r'(.+?)(?:\s\(\d{4}\))?$', carrera_name_full)
-        carrera_name = carrera_name_match.group(1).strip() if carrera_name_match else carrera_name_full
-        
-        carrera_obj, _ = get_or_create(db, Carrera, nombre=carrera_name)
-
-        group_sections = re.split(r'####\s+', block)[1:]
-        for section in group_sections:
-            section_lines = section.strip().split('\n')
-            grupo_name = section_lines[0].replace('Grupo ', '').strip()
-            
-            grupo_obj, _ = get_or_create(db, Grupo, nombre_grupo=grupo_name, carrera_id=carrera_obj.id)
-
-            # Mapeo de materias y profesores
-            prof_map_section = {}
-            prof_marker = '**Materias y Profesores:**'
-            if prof_marker in section:
-                prof_data = section.split(prof_marker)[1]
-                for line in prof_data.strip().split('\n'):
-                    if not line.startswith('-'): continue
-                    parts = line[1:].strip().split(':')
-                    if len(parts) < 2: continue
-                    materia_name = parts[0].strip()
-                    prof_name = parts[1].strip()
-
-                    prof_obj, _ = get_or_create(db, Profesor, nombre=prof_name)
-                    
-                    materia_obj, is_created = get_or_create(db, Materia, nombre=materia_name, carrera_id=carrera_obj.id)
-                    if is_created or not materia_obj.profesor_id:
-                         materia_obj.profesor_id = prof_obj.id
-                    
-                    materias_map[materia_name] = materia_obj
-
-            # Análisis de la tabla de horarios
-            schedule_started = False
-            header = []
-            prev_line = ""
-            for line in section_lines:
-                if '---|' in line:
-                    schedule_started = True
-                    header = [h.strip() for h in prev_line.split('|')]
-                    continue
-                if schedule_started and '|' in line:
-                    cells = [c.strip() for c in line.split('|')]
-                    time_slot = cells[0]
-                    
-                    try:
-                        start_str, end_str = time_slot.split(' - ')
-                        start_time = datetime.datetime.strptime(start_str, '%H:%M').time()
-                        end_time = datetime.datetime.strptime(end_str, '%H:%M').time()
-                    except ValueError:
-                        continue
-
-                    for i, day_cell in enumerate(cells[1:], 1):
-                        if not day_cell or 'BIBLIOTECA' in day_cell or 'ACTIVIDADES' in day_cell or 'TUTORÍA' in day_cell:
-                            continue
-                        
-                        current_dia_semana = header[i]
-                        # Corrige el día de la semana si es Domingo para que sea Lunes
-                        if current_dia_semana == "Domingo":
-                            current_dia_semana = "Lunes"
-                        
-                        aula_match = re.search(r'Aula:\s*(.+)$', day_cell)
-                        aula_name = aula_match.group(1).strip() if aula_match else None
-                        materia_name_sched = (aula_match.string[:aula_match.start()].strip() if aula_match else day_cell).replace(' / INGLÉS', '')
-
-                        # Only create Horario if materia_name_sched is a recognized subject
-                        materia_obj_sched = materias_map.get(materia_name_sched)
-                        if not materia_obj_sched:
-                            # If it's not a recognized subject, skip creating a Horario for it
-                            continue
-
-                        aula_obj = None
-                        if aula_name:
-                            aula_obj, _ = get_or_create(db, Aula, nombre=aula_name)
-                        
-                        horario_obj = Horario(
-                            dia_semana=current_dia_semana,
-                            hora_inicio=start_time,
-                            hora_fin=end_time,
-                            grupo_id=grupo_obj.id,
-                            materia_id=materia_obj_sched.id,
-                            aula_id=aula_obj.id if aula_obj else None
-                        )
-                        db.add(horario_obj)
-                prev_line = line
+    db = SessionLocal()
+    errores = []
     try:
+        resumen = importar(db, construir_catalogo(parsear_rutas(archivos), errores))
         db.commit()
+        for error in errores:
+            print(f"Advertencia: {error}")
+        return resumen
     except Exception as e:
         db.rollback()
         print(f"Error durante la confirmación: {e}")
@@ -146,5 +222,8 @@ def populate():
 
 if __name__ == "__main__":
     print("Poblando la base de datos con los horarios detallados...")
-    populate()
-    print("Base de datos poblada exitosamente.")
+    resumen = populate(sys.argv[1:])
+    if resumen is not None:
+        for tabla, cantidad in sorted(resumen.items()):
+            print(f"  - {tabla}: {cantidad}")
+        print("Base de datos poblada exitosamente.")
@@ -0,0 +1,444 @@
+"""
+Reparación de un calendario de exámenes ya publicado.
+
+Cuando un aula o un profesor deja de estar disponible a mitad del periodo, se
+parte de los exámenes actuales y se buscan los cambios mínimos que quitan los
+choques, en lugar de regenerar la carrera completa (lo que borra ediciones
+manuales y sinodales).
+
+Es una búsqueda local con recocido simulado. Movimientos: cambiar de aula,
+cambiar de fecha/hora, ambos, o intercambiar fecha/hora con otro examen. El
+costo de cada movimiento se evalúa sólo sobre el examen que se mueve (delta)
+con un índice por (recurso, día):
+
+  - COSTO_CHOQUE por cada traslape con otro examen, con un examen que no se
+    repara o con una restricción (grupo, aula, titular o sinodal);
+  - los mismos costos suaves que el motor de calendarización (exámenes del
+    mismo grupo el mismo día o en días seguidos);
+  - COSTO_CAMBIO_HORARIO / COSTO_CAMBIO_AULA por cada examen que queda distinto
+    al original, para cambiar lo menos posible.
+
+La búsqueda corre hasta agotar el presupuesto de tiempo (o antes, si ya no
+hay choques y deja de mejorar) y se queda con la mejor solución vista. Al
+final se intenta regresar cada examen cambiado a su lugar original.
+"""
+import math
+import random
+import time as reloj
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, time, timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .scheduler import COSTO_DIA_CONSECUTIVO, COSTO_MISMO_DIA
+
+COSTO_CHOQUE = 1000
+COSTO_CAMBIO_HORARIO = 50
+COSTO_CAMBIO_AULA = 10
+# Temperatura inicial y final del recocido, en unidades de costo
+TEMPERATURA_INICIAL = 60.0
+TEMPERATURA_FINAL = 0.5
+# Sin choques, se detiene tras tantas iteraciones sin mejorar la mejor solución
+ITERACIONES_SIN_MEJORA = 20000
+JORNADA = (7 * 60, 21 * 60)
+
+Recurso = Tuple[str, int]  # ('aula' | 'grupo' | 'profesor', id)
+
+
+@dataclass
+class ExamenReparable:
+    id: int
+    fecha: date
+    inicio: int  # minutos desde medianoche
+    fin: int
+    aula_id: Optional[int] = None
+    grupo_id: Optional[int] = None
+    profesores: Tuple[int, ...] = ()  # titular y sinodal
+    capacidad: int = 0  # del aula original; el examen sólo se cambia a aulas igual de grandes
+
+
+@dataclass
+class Bloqueo:
+    """Intervalo fijo de un recurso: examen que no se repara o restricción (sin fecha aplica todos los días)."""
+    recurso: Recurso
+    fecha: Optional[date]
+    inicio: int
+    fin: int
+
+
+@dataclass
+class Movimiento:
+    examen_id: int
+    antes: Tuple[date, int, int, Optional[int]]  # fecha, inicio, fin, aula
+    despues: Tuple[date, int, int, Optional[int]]
+
+
+@dataclass
+class ResultadoReparacion:
+    movimientos: List[Movimiento]
+    costo_inicial: float
+    costo_final: float
+    choques_iniciales: int
+    choques_finales: int
+    sin_resolver: List[int]  # Exámenes que siguen con algún choque
+    iteraciones: int = 0
+    aceptados: Dict[str, int] = field(default_factory=dict)  # Movimientos aceptados por tipo
+    segundos: float = 0.0
+    examenes: int = 0  # Exámenes considerados
+
+
+def _minutos(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def _hora(minutos: int) -> time:
+    return time(minutos // 60, minutos % 60)
+
+
+class _Estado:
+    def __init__(self, examenes, bloqueos, fechas, inicios, aulas):
+        self.examenes = examenes
+        self.fechas = sorted(set(fechas) | {ex.fecha for ex in examenes})
+        self.indice_fecha = {f: i for i, f in enumerate(self.fechas)}
+        self.candidatas = [self.indice_fecha[f] for f in sorted(set(fechas))] or list(range(len(self.fechas)))
+        self.inicios = sorted(set(inicios))
+        self.aulas = sorted(aulas.items(), key=lambda a: (a[1], a[0]))  # (id, capacidad)
+        self._aulas_por_capacidad: Dict[int, List[int]] = {}
+
+        self.fijos_fecha: Dict[Tuple[Recurso, date], List[Tuple[int, int]]] = defaultdict(list)
+        self.fijos_siempre: Dict[Recurso, List[Tuple[int, int]]] = defaultdict(list)
+        for b in bloqueos:
+            if b.fecha is None:
+                self.fijos_siempre[b.recurso].append((b.inicio, b.fin))
+            else:
+                self.fijos_fecha[(b.recurso, b.fecha)].append((b.inicio, b.fin))
+
+        # Asignación actual por examen: día (índice en fechas), inicio, aula
+        self.dia = [self.indice_fecha[ex.fecha] for ex in examenes]
+        self.inicio = [ex.inicio for ex in examenes]
+        self.aula = [ex.aula_id for ex in examenes]
+        self.duracion = [ex.fin - ex.inicio for ex in examenes]
+        self.indice: Dict[Tuple[Recurso, int], Set[int]] = defaultdict(set)
+        for i in range(len(examenes)):
+            self._poner(i)
+
+    # ---- Índice ----
+
+    def _recursos(self, i) -> List[Recurso]:
+        ex = self.examenes[i]
+        recursos = [('profesor', p) for p in ex.profesores]
+        if ex.grupo_id is not None:
+            recursos.append(('grupo', ex.grupo_id))
+        if self.aula[i] is not None:
+            recursos.append(('aula', self.aula[i]))
+        return recursos
+
+    def _poner(self, i):
+        for r in self._recursos(i):
+            self.indice[(r, self.dia[i])].add(i)
+
+    def _quitar(self, i):
+        for r in self._recursos(i):
+            self.indice[(r, self.dia[i])].discard(i)
+
+    # ---- Costo ----
+
+    def choques(self, i) -> Tuple[int, int]:
+        """(choques con otros exámenes que se reparan, choques con bloqueos) del examen i."""
+        dia, inicio = self.dia[i], self.inicio[i]
+        fin = inicio + self.duracion[i]
+        fecha = self.fechas[dia]
+        pares = fijos = 0
+        for r in self._recursos(i):
+            for j in self.indice.get((r, dia), ()):
+                if j != i and self.inicio[j] < fin and inicio < self.inicio[j] + self.duracion[j]:
+                    pares += 1
+            for a, b in self.fijos_fecha.get((r, fecha), ()):
+                if a < fin and inicio < b:
+                    fijos += 1
+            for a, b in self.fijos_siempre.get(r, ()):
+                if a < fin and inicio < b:
+                    fijos += 1
+        return pares, fijos
+
+    def _suave(self, i) -> int:
+        grupo = self.examenes[i].grupo_id
+        if grupo is None:
+            return 0
+        dia = self.dia[i]
+        recurso = ('grupo', grupo)
+        mismo = len(self.indice.get((recurso, dia), ())) - 1
+        seguidos = len(self.indice.get((recurso, dia - 1), ())) + len(self.indice.get((recurso, dia + 1), ()))
+        return COSTO_MISMO_DIA * mismo + COSTO_DIA_CONSECUTIVO * seguidos
+
+    def _cambio(self, i) -> int:
+        ex = self.examenes[i]
+        costo = 0
+        if self.fechas[self.dia[i]] != ex.fecha or self.inicio[i] != ex.inicio:
+            costo += COSTO_CAMBIO_HORARIO
+        if self.aula[i] != ex.aula_id:
+            costo += COSTO_CAMBIO_AULA
+        return costo
+
+    def costo_local(self, i) -> int:
+        """Todo lo que depende de la posición del examen i (los pares se cuentan completos)."""
+        pares, fijos = self.choques(i)
+        return COSTO_CHOQUE * (pares + fijos) + self._suave(i) + self._cambio(i)
+
+    def costo_total(self) -> Tuple[float, int]:
+        """(costo, número de choques) de la asignación completa; cada par cuenta una vez."""
+        costo, choques = 0.0, 0
+        for i in range(len(self.examenes)):
+            pares, fijos = self.choques(i)
+            choques += pares / 2 + fijos
+            costo += COSTO_CHOQUE * (pares / 2 + fijos) + self._suave(i) / 2 + self._cambio(i)
+        return costo, int(choques)
+
+    # ---- Movimientos ----
+
+    def mover(self, i, dia, inicio, aula) -> int:
+        """Mueve el examen i y regresa el cambio en el costo total."""
+        antes = self.costo_local(i)
+        self._quitar(i)
+        self.dia[i], self.inicio[i], self.aula[i] = dia, inicio, aula
+        self._poner(i)
+        return self.costo_local(i) - antes
+
+    def aulas_para(self, i) -> List[int]:
+        capacidad = self.examenes[i].capacidad
+        if capacidad not in self._aulas_por_capacidad:
+            self._aulas_por_capacidad[capacidad] = [a for a, c in self.aulas if (c or 0) >= capacidad]
+        return self._aulas_por_capacidad[capacidad]
+
+    def inicios_para(self, i) -> List[int]:
+        return [h for h in self.inicios if h + self.duracion[i] <= JORNADA[1]] or [self.examenes[i].inicio]
+
+    def en_choque(self) -> List[int]:
+        return [i for i in range(len(self.examenes)) if any(self.choques(i))]
+
+
+def reparar(
+    examenes: Sequence[ExamenReparable],
+    bloqueos: Sequence[Bloqueo],
+    fechas: Sequence[date],
+    inicios: Sequence[int],
+    aulas: Dict[int, Optional[int]],
+    presupuesto: float = 2.0,
+    semilla: Optional[int] = None,
+) -> ResultadoReparacion:
+    """
+    Repara la asignación de `examenes` (fecha, hora y aula actuales) contra
+    los `bloqueos`. Los exámenes pueden moverse a cualquier fecha de `fechas`,
+    empezar en cualquier minuto de `inicios` y ocupar cualquier aula de
+    `aulas` (id -> capacidad) con capacidad suficiente. `presupuesto` en
+    segundos.
+    """
+    comienzo = reloj.perf_counter()
+    estado = _Estado(list(examenes), bloqueos, fechas, inicios, aulas)
+    costo, choques_iniciales = estado.costo_total()
+    costo_inicial = costo
+    n = len(estado.examenes)
+    if n == 0 or choques_iniciales == 0:
+        return ResultadoReparacion([], costo, costo, choques_iniciales, choques_iniciales, [],
+                                   segundos=reloj.perf_counter() - comienzo, examenes=n)
+
+    rnd = random.Random(semilla)
+    mejor_costo = costo
+    mejor = (list(estado.dia), list(estado.inicio), list(estado.aula))
+    conflictivos = estado.en_choque()
+    por_grupo: Dict[Optional[int], List[int]] = defaultdict(list)
+    for i, ex in enumerate(estado.examenes):
+        por_grupo[ex.grupo_id].append(i)
+
+    aceptados: Dict[str, int] = defaultdict(int)
+    iteracion = ultima_mejora = 0
+    temperatura = TEMPERATURA_INICIAL
+    while True:
+        iteracion += 1
+        if iteracion % 64 == 0:
+            avance = (reloj.perf_counter() - comienzo) / presupuesto
+            if avance >= 1:
+                break
+            temperatura = TEMPERATURA_INICIAL * (TEMPERATURA_FINAL / TEMPERATURA_INICIAL) ** avance
+            if iteracion % 512 == 0:
+                conflictivos = estado.en_choque()
+                if not conflictivos and iteracion - ultima_mejora > ITERACIONES_SIN_MEJORA:
+                    break
+
+        # La mayoría de las veces se mueve un examen con choques
+        i = rnd.choice(conflictivos) if conflictivos and rnd.random() < 0.8 else rnd.randrange(n)
+        anterior = (estado.dia[i], estado.inicio[i], estado.aula[i])
+        tipo = rnd.random()
+        j = None
+        if tipo < 0.3:
+            tipo = 'aula'
+            delta = estado.mover(i, anterior[0], anterior[1], rnd.choice(estado.aulas_para(i) or [anterior[2]]))
+        elif tipo < 0.7:
+            tipo = 'horario'
+            delta = estado.mover(i, rnd.choice(estado.candidatas), rnd.choice(estado.inicios_para(i)), anterior[2])
+        elif tipo < 0.85:
+            tipo = 'horario_aula'
+            delta = estado.mover(
+                i, rnd.choice(estado.candidatas), rnd.choice(estado.inicios_para(i)),
+                rnd.choice(estado.aulas_para(i) or [anterior[2]]),
+            )
+        else:
+            # Intercambio de fecha y hora, de preferencia con otro examen del mismo grupo
+            tipo = 'intercambio'
+            mismos = por_grupo[estado.examenes[i].grupo_id]
+            j = rnd.choice(mismos) if len(mismos) > 1 else rnd.randrange(n)
+            if j == i:
+                continue
+            anterior_j = (estado.dia[j], estado.inicio[j], estado.aula[j])
+            # Con duraciones distintas, alguno podría terminar después de la jornada
+            if anterior_j[1] + estado.duracion[i] > JORNADA[1] or anterior[1] + estado.duracion[j] > JORNADA[1]:
+                continue
+            delta = estado.mover(i, anterior_j[0], anterior_j[1], anterior[2])
+            delta += estado.mover(j, anterior[0], anterior[1], anterior_j[2])
+
+        if delta <= 0 or rnd.random() < math.exp(-delta / temperatura):
+            costo += delta
+            aceptados[tipo] += 1
+            if costo < mejor_costo - 1e-9:
+                mejor_costo, ultima_mejora = costo, iteracion
+                mejor = (list(estado.dia), list(estado.inicio), list(estado.aula))
+        else:
+            if j is not None:
+                estado.mover(j, *anterior_j)
+            estado.mover(i, *anterior)
+
+    # Se regresa a la mejor solución vista
+    for i in range(n):
+        if (estado.dia[i], estado.inicio[i], estado.aula[i]) != (mejor[0][i], mejor[1][i], mejor[2][i]):
+            estado.mover(i, mejor[0][i], mejor[1][i], mejor[2][i])
+
+    # Cada examen cambiado vuelve a su lugar original (o sólo a su horario o
+    # a su aula) si eso no empeora el costo
+    for i, ex in enumerate(estado.examenes):
+        original = (estado.indice_fecha[ex.fecha], ex.inicio, ex.aula_id)
+        actual = (estado.dia[i], estado.inicio[i], estado.aula[i])
+        if actual == original:
+            continue
+        for intento in (original, (original[0], original[1], actual[2]), (actual[0], actual[1], original[2])):
+            if intento == actual:
+                continue
+            if estado.mover(i, *intento) <= 0:
+                break
+            estado.mover(i, *actual)
+
+    costo_final, choques_finales = estado.costo_total()
+    movimientos = []
+    for i, ex in enumerate(estado.examenes):
+        fecha, inicio, aula = estado.fechas[estado.dia[i]], estado.inicio[i], estado.aula[i]
+        if (fecha, inicio, aula) != (ex.fecha, ex.inicio, ex.aula_id):
+            movimientos.append(Movimiento(
+                ex.id, (ex.fecha, ex.inicio, ex.fin, ex.aula_id),
+                (fecha, inicio, inicio + estado.duracion[i], aula),
+            ))
+    return ResultadoReparacion(
+        movimientos=movimientos,
+        costo_inicial=costo_inicial,
+        costo_final=costo_final,
+        choques_iniciales=choques_iniciales,
+        choques_finales=choques_finales,
+        sin_resolver=[estado.examenes[i].id for i in estado.en_choque()],
+        iteraciones=iteracion,
+        aceptados=dict(aceptados),
+        segundos=reloj.perf_counter() - comienzo,
+        examenes=n,
+    )
+
+
+def _dias_habiles(inicio: date, fin: date) -> List[date]:
+    dias = []
+    actual = inicio
+    while actual <= fin:
+        if actual.weekday() < 5:
+            dias.append(actual)
+        actual += timedelta(days=1)
+    return dias
+
+
+def cargar_y_reparar(
+    db: Session,
+    condiciones=(),
+    restricciones: Sequence[models.Restriccion] = (),
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    presupuesto: float = 2.0,
+    semilla: Optional[int] = None,
+) -> ResultadoReparacion:
+    """
+    Repara los exámenes que cumplen `condiciones`. Los demás exámenes del
+    periodo y las restricciones (las guardadas y las de `restricciones`, que
+    aún no se guardan) quedan fijos. Los exámenes se pueden mover a los días
+    hábiles entre `fecha_desde` y `fecha_hasta` (por defecto, los del rango
+    de fechas de los exámenes).
+    """
+    filas = db.execute(
+        select(
+            models.Examen.id, models.Examen.fecha, models.Examen.hora_inicio, models.Examen.hora_fin,
+            models.Examen.aula_id, models.Examen.grupo_id, models.Materia.profesor_id,
+            models.Examen.sinodal_id, models.Aula.capacidad,
+        )
+        .outerjoin(models.Materia, models.Examen.materia_id == models.Materia.id)
+        .outerjoin(models.Aula, models.Examen.aula_id == models.Aula.id)
+        .where(*condiciones).order_by(models.Examen.id)
+    ).all()
+    examenes = [
+        ExamenReparable(
+            e_id, fecha, _minutos(inicio), _minutos(fin), aula_id, grupo_id,
+            tuple({p for p in (titular_id, sinodal_id) if p is not None}), capacidad or 0,
+        )
+        for e_id, fecha, inicio, fin, aula_id, grupo_id, titular_id, sinodal_id, capacidad in filas
+        if fecha is not None and inicio is not None and fin is not None
+    ]
+    if not examenes:
+        return ResultadoReparacion([], 0, 0, 0, 0, [])
+
+    desde = fecha_desde or min(ex.fecha for ex in examenes)
+    hasta = fecha_hasta or max(ex.fecha for ex in examenes)
+    primera, ultima = min(desde, *(ex.fecha for ex in examenes)), max(hasta, *(ex.fecha for ex in examenes))
+
+    # Exámenes del periodo que no se reparan
+    ids = {ex.id for ex in examenes}
+    bloqueos = []
+    inicios = {ex.inicio for ex in examenes}
+    for e_id, fecha, inicio, fin, aula_id, grupo_id, titular_id, sinodal_id in db.execute(
+        select(
+            models.Examen.id, models.Examen.fecha, models.Examen.hora_inicio, models.Examen.hora_fin,
+            models.Examen.aula_id, models.Examen.grupo_id, models.Materia.profesor_id, models.Examen.sinodal_id,
+        )
+        .outerjoin(models.Materia, models.Examen.materia_id == models.Materia.id)
+        .where(models.Examen.fecha.between(primera, ultima))
+    ):
+        if e_id in ids or inicio is None or fin is None:
+            continue
+        inicios.add(_minutos(inicio))
+        recursos = {('aula', aula_id), ('grupo', grupo_id), ('profesor', titular_id), ('profesor', sinodal_id)}
+        bloqueos += [Bloqueo(r, fecha, _minutos(inicio), _minutos(fin)) for r in recursos if r[1] is not None]
+
+    guardadas = db.execute(
+        select(models.Restriccion).where(
+            or_(models.Restriccion.fecha.is_(None), models.Restriccion.fecha.between(primera, ultima))
+        )
+    ).scalars().all()
+    for r in (*guardadas, *restricciones):
+        if r.profesor_id is not None:
+            recurso = ('profesor', r.profesor_id)
+        elif r.aula_id is not None:
+            recurso = ('aula', r.aula_id)
+        elif r.grupo_id is not None:
+            recurso = ('grupo', r.grupo_id)
+        else:
+            continue
+        inicio = 0 if r.hora_inicio is None else _minutos(r.hora_inicio)
+        fin = 24 * 60 if r.hora_fin is None else _minutos(r.hora_fin)
+        bloqueos.append(Bloqueo(recurso, r.fecha, inicio, fin))
+
+    aulas = dict(db.execute(select(models.Aula.id, models.Aula.capacidad)).all())
+    return reparar(examenes, bloqueos, _dias_habiles(desde, hasta), sorted(inicios), aulas, presupuesto, semilla)
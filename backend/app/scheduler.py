@@ -0,0 +1,498 @@
+"""
+Motor de calendarización de exámenes.
+
+Modela el periodo de exámenes como un problema de coloreo de grafos: cada
+examen (materia + grupo) es un vértice, dos exámenes son adyacentes si
+comparten grupo o profesor, y los "colores" son los slots (día × bloque
+horario). Se resuelve con DSATUR: se coloca primero el examen con menos
+slots disponibles y, para cada uno, se elige el slot factible de menor
+costo suave y un aula libre con capacidad suficiente.
+
+Restricciones duras:
+  - un examen por aula por slot
+  - un grupo no puede tener dos exámenes en el mismo slot
+  - un profesor (titular o sinodal) no puede estar en dos exámenes a la vez
+  - la capacidad del aula debe cubrir al grupo; sin datos de inscripción se
+    toma la del aula en que el grupo toma la clase, así que un examen sólo se
+    cambia a un aula igual de grande o más
+
+Los bloques de clase pueden traslaparse (7-9 y 8-9, por ejemplo): al ocupar un
+slot se bloquean también los slots del mismo día cuyo bloque se traslapa.
+
+Restricciones suaves:
+  - separar los exámenes de un mismo grupo (evitar el mismo día y días seguidos)
+  - respetar la hora y el aula en que el grupo toma la clase
+"""
+import heapq
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, time, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+DIAS_SEMANA = {
+    'LUNES': 0, 'MARTES': 1, 'MIÉRCOLES': 2, 'MIERCOLES': 2, 'JUEVES': 3,
+    'VIERNES': 4, 'SÁBADO': 5, 'SABADO': 5, 'DOMINGO': 6
+}
+
+# Pesos de las restricciones suaves
+COSTO_MISMO_DIA = 10
+COSTO_DIA_CONSECUTIVO = 2
+COSTO_HORA_DISTINTA = 1
+COSTO_DIA_DISTINTO = 1
+COSTO_CAMBIO_AULA = 1
+
+
+@dataclass
+class ExamenPorProgramar:
+    materia_id: int
+    grupo_id: int
+    carrera_id: Optional[int] = None
+    profesor_id: Optional[int] = None
+    aula_preferida_id: Optional[int] = None
+    dia_preferido: Optional[int] = None  # 0 = lunes
+    bloque_preferido: Optional[Tuple[time, time]] = None
+    tipo: str = 'PARCIAL'
+
+
+@dataclass
+class AulaDisponible:
+    id: int
+    capacidad: Optional[int] = None
+
+
+@dataclass
+class Ocupacion:
+    """Un intervalo ya ocupado (examen existente que no se regenera o restricción)."""
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+    aula_id: Optional[int] = None
+    grupo_id: Optional[int] = None
+    profesor_ids: Tuple[int, ...] = ()
+    es_examen: bool = True
+
+
+@dataclass
+class Problema:
+    examenes: List[ExamenPorProgramar]
+    aulas: List[AulaDisponible]
+    fechas: List[date]
+    bloques: List[Tuple[time, time]]
+    ocupaciones: List[Ocupacion] = field(default_factory=list)
+
+
+@dataclass
+class Asignacion:
+    examen: ExamenPorProgramar
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+    aula_id: int
+
+
+@dataclass
+class Solucion:
+    asignaciones: List[Asignacion]
+    sin_asignar: List[ExamenPorProgramar]
+    costo: int
+
+
+def _minutos(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def _se_traslapan(a: Tuple[time, time], b: Tuple[time, time]) -> bool:
+    return _minutos(a[0]) < _minutos(b[1]) and _minutos(b[0]) < _minutos(a[1])
+
+
+def fechas_del_periodo(inicio: date, dias: int) -> List[date]:
+    """Regresa los primeros `dias` días hábiles (lunes a viernes) desde `inicio`."""
+    fechas = []
+    actual = inicio
+    while len(fechas) < dias:
+        if actual.weekday() < 5:
+            fechas.append(actual)
+        actual += timedelta(days=1)
+    return fechas
+
+
+def resolver(problema: Problema) -> Solucion:
+    """Asigna fecha, bloque y aula a cada examen del problema."""
+    fechas = problema.fechas
+    bloques = problema.bloques
+    n_bloques = len(bloques)
+    slots = [(d, b) for d in range(len(fechas)) for b in range(n_bloques)]
+    indice_fecha = {f: i for i, f in enumerate(fechas)}
+    # Bloques que se traslapan con cada bloque (incluido él mismo)
+    traslapes = [[b2 for b2, otro in enumerate(bloques) if _se_traslapan(bloque, otro)] for bloque in bloques]
+
+    # Ocupación: (recurso, slot) -> ocupado
+    aulas_ocupadas: Dict[int, Set[int]] = defaultdict(set)  # slot -> aulas
+    grupos_ocupados: Set[Tuple[int, int]] = set()
+    profesores_ocupados: Set[Tuple[int, int]] = set()
+    examenes_por_grupo_dia: Dict[Tuple[int, int], int] = defaultdict(int)
+
+    for oc in problema.ocupaciones:
+        d = indice_fecha.get(oc.fecha)
+        if d is None:
+            continue
+        for b, bloque in enumerate(bloques):
+            if not _se_traslapan(bloque, (oc.hora_inicio, oc.hora_fin)):
+                continue
+            s = d * n_bloques + b
+            if oc.aula_id is not None:
+                aulas_ocupadas[s].add(oc.aula_id)
+            if oc.grupo_id is not None:
+                grupos_ocupados.add((oc.grupo_id, s))
+            for p in oc.profesor_ids:
+                profesores_ocupados.add((p, s))
+        if oc.grupo_id is not None and oc.es_examen:
+            examenes_por_grupo_dia[(oc.grupo_id, d)] += 1
+
+    # Aulas ordenadas por capacidad para elegir la más pequeña que sirva
+    aulas = sorted(problema.aulas, key=lambda a: (a.capacidad or 0, a.id))
+    capacidad = {a.id: a.capacidad or 0 for a in aulas}
+    aulas_por_capacidad: Dict[int, List[int]] = {}
+
+    def aulas_para(ex: ExamenPorProgramar) -> List[int]:
+        """Aulas al menos tan grandes como la de la clase, de la más pequeña a la más grande."""
+        requerida = capacidad.get(ex.aula_preferida_id, 0)
+        if requerida not in aulas_por_capacidad:
+            aulas_por_capacidad[requerida] = [a.id for a in aulas if capacidad[a.id] >= requerida]
+        return aulas_por_capacidad[requerida]
+
+    # Grafo de conflictos implícito: exámenes que comparten grupo o profesor
+    examenes = problema.examenes
+    por_grupo: Dict[int, List[int]] = defaultdict(list)
+    por_profesor: Dict[int, List[int]] = defaultdict(list)
+    for i, ex in enumerate(examenes):
+        por_grupo[ex.grupo_id].append(i)
+        if ex.profesor_id is not None:
+            por_profesor[ex.profesor_id].append(i)
+
+    def vecinos(i: int) -> Iterable[int]:
+        ex = examenes[i]
+        yield from por_grupo[ex.grupo_id]
+        if ex.profesor_id is not None:
+            yield from por_profesor[ex.profesor_id]
+
+    grado = [len(por_grupo[ex.grupo_id]) + len(por_profesor.get(ex.profesor_id, ())) for ex in examenes]
+    bloqueados: List[Set[int]] = [set() for _ in examenes]
+    for i, ex in enumerate(examenes):
+        for s in range(len(slots)):
+            if (ex.grupo_id, s) in grupos_ocupados or (ex.profesor_id, s) in profesores_ocupados:
+                bloqueados[i].add(s)
+
+    def elegir_aula(ex: ExamenPorProgramar, s: int) -> Optional[int]:
+        ocupadas = aulas_ocupadas[s]
+        if ex.aula_preferida_id is not None and ex.aula_preferida_id not in ocupadas:
+            return ex.aula_preferida_id
+        for aula_id in aulas_para(ex):
+            if aula_id not in ocupadas:
+                return aula_id
+        return None
+
+    def costo_slot(ex: ExamenPorProgramar, s: int) -> int:
+        d, b = slots[s]
+        costo = COSTO_MISMO_DIA * examenes_por_grupo_dia[(ex.grupo_id, d)]
+        costo += COSTO_DIA_CONSECUTIVO * (
+            examenes_por_grupo_dia[(ex.grupo_id, d - 1)] + examenes_por_grupo_dia[(ex.grupo_id, d + 1)]
+        )
+        if ex.bloque_preferido is not None and bloques[b] != ex.bloque_preferido:
+            costo += COSTO_HORA_DISTINTA
+        if ex.dia_preferido is not None and fechas[d].weekday() != ex.dia_preferido:
+            costo += COSTO_DIA_DISTINTO
+        return costo
+
+    asignaciones: List[Optional[Asignacion]] = [None] * len(examenes)
+    sin_asignar: List[ExamenPorProgramar] = []
+    costo_total = 0
+    colocado = [False] * len(examenes)
+
+    # DSATUR con heap perezoso: (-saturación, -grado, índice)
+    heap = [(-len(bloqueados[i]), -grado[i], i) for i in range(len(examenes))]
+    heapq.heapify(heap)
+    while heap:
+        neg_sat, _, i = heapq.heappop(heap)
+        if colocado[i] or -neg_sat != len(bloqueados[i]):
+            continue
+        colocado[i] = True
+        ex = examenes[i]
+
+        candidatos = sorted(
+            (costo_slot(ex, s), s) for s in range(len(slots)) if s not in bloqueados[i]
+        )
+        elegido = None
+        for costo, s in candidatos:
+            aula_id = elegir_aula(ex, s)
+            if aula_id is not None:
+                elegido = (costo, s, aula_id)
+                break
+        if elegido is None:
+            sin_asignar.append(ex)
+            continue
+
+        costo, s, aula_id = elegido
+        if ex.aula_preferida_id is not None and aula_id != ex.aula_preferida_id:
+            costo += COSTO_CAMBIO_AULA
+        costo_total += costo
+        d, b = slots[s]
+        ocupados = [d * n_bloques + b2 for b2 in traslapes[b]]
+        for s2 in ocupados:
+            aulas_ocupadas[s2].add(aula_id)
+        examenes_por_grupo_dia[(ex.grupo_id, d)] += 1
+        asignaciones[i] = Asignacion(
+            examen=ex,
+            fecha=fechas[d],
+            hora_inicio=bloques[b][0],
+            hora_fin=bloques[b][1],
+            aula_id=aula_id,
+        )
+
+        for j in vecinos(i):
+            if colocado[j]:
+                continue
+            antes = len(bloqueados[j])
+            bloqueados[j].update(ocupados)
+            if len(bloqueados[j]) != antes:
+                heapq.heappush(heap, (-len(bloqueados[j]), -grado[j], j))
+
+    return Solucion(
+        asignaciones=[a for a in asignaciones if a is not None],
+        sin_asignar=sin_asignar,
+        costo=costo_total,
+    )
+
+
+def dividir_problema(problema: Problema) -> List[Problema]:
+    """
+    Separa el problema en partes independientes: carreras que no comparten
+    aulas ni profesores. Las aulas que ninguna parte usa en sus horarios se
+    reparten entre las partes, para que ninguna aula quede en dos a la vez, en
+    proporción al número de exámenes de cada parte y de la más grande a la más
+    pequeña.
+    """
+    padre: Dict[object, object] = {}
+
+    def raiz(x):
+        padre.setdefault(x, x)
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    def unir(a, b):
+        padre[raiz(a)] = raiz(b)
+
+    for ex in problema.examenes:
+        nodo = ('carrera', ex.carrera_id)
+        raiz(nodo)
+        if ex.aula_preferida_id is not None:
+            unir(('aula', ex.aula_preferida_id), nodo)
+        if ex.profesor_id is not None:
+            unir(('profesor', ex.profesor_id), nodo)
+
+    partes: Dict[object, List[ExamenPorProgramar]] = defaultdict(list)
+    for ex in problema.examenes:
+        partes[raiz(('carrera', ex.carrera_id))].append(ex)
+    if len(partes) <= 1:
+        return [problema]
+
+    claves = list(partes)
+    aulas_por_parte: Dict[object, List[AulaDisponible]] = defaultdict(list)
+    libres = []
+    for aula in problema.aulas:
+        nodo = ('aula', aula.id)
+        if nodo in padre and raiz(nodo) in partes:
+            aulas_por_parte[raiz(nodo)].append(aula)
+        else:
+            libres.append(aula)
+    # Cada aula va a la parte con más exámenes por aula libre recibida (D'Hondt)
+    turno = [(-len(partes[clave]), orden, clave) for orden, clave in enumerate(claves)]
+    heapq.heapify(turno)
+    recibidas: Dict[object, int] = defaultdict(int)
+    for aula in sorted(libres, key=lambda a: (-(a.capacidad or 0), a.id)):
+        _, orden, clave = heapq.heappop(turno)
+        aulas_por_parte[clave].append(aula)
+        recibidas[clave] += 1
+        heapq.heappush(turno, (-len(partes[clave]) / (recibidas[clave] + 1), orden, clave))
+
+    return [
+        Problema(
+            examenes=partes[clave],
+            aulas=aulas_por_parte[clave],
+            fechas=problema.fechas,
+            bloques=problema.bloques,
+            ocupaciones=problema.ocupaciones,
+        )
+        for clave in claves
+    ]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock_pool = threading.Lock()
+
+# Por debajo de este tamaño no vale la pena pagar el costo de otro proceso
+MIN_EXAMENES_PARALELO = int(os.getenv("SCHEDULER_MIN_PARALELO", "500"))
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            workers = int(os.getenv("SCHEDULER_WORKERS", "0")) or os.cpu_count() or 1
+            # Con spawn los procesos no heredan las conexiones abiertas del engine
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def cerrar_pool():
+    """Detiene el pool de procesos, si se llegó a crear; se llama desde el lifespan."""
+    global _pool
+    with _lock_pool:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def resolver_en_paralelo(problema: Problema) -> Tuple[Solucion, int]:
+    """
+    Divide el problema, resuelve las partes en un pool de procesos y une el
+    resultado. Los problemas chicos o que no se pueden dividir se resuelven
+    completos en este proceso, con todas las aulas.
+    """
+    if len(problema.examenes) < MIN_EXAMENES_PARALELO:
+        return resolver(problema), 1
+    partes = dividir_problema(problema)
+    if len(partes) == 1:
+        return resolver(problema), 1
+    soluciones = list(_get_pool().map(resolver, partes))
+
+    return Solucion(
+        asignaciones=[a for s in soluciones for a in s.asignaciones],
+        sin_asignar=[e for s in soluciones for e in s.sin_asignar],
+        costo=sum(s.costo for s in soluciones),
+    ), len(partes)
+
+
+def cargar_problema(
+    db: Session,
+    carrera_ids: Iterable[int],
+    grupo_ids: Optional[Iterable[int]] = None,
+    fecha_inicio: Optional[date] = None,
+    dias: int = 5,
+) -> Problema:
+    """
+    Construye el problema a partir de los horarios de las carreras indicadas.
+    Se programa un examen por cada par (materia, grupo); los exámenes de otras
+    carreras o grupos quedan como ocupación fija.
+    """
+    carrera_ids = list(carrera_ids)
+    grupo_ids = list(grupo_ids) if grupo_ids else None
+    if fecha_inicio is None:
+        hoy = date.today()
+        fecha_inicio = hoy + timedelta(days=(7 - hoy.weekday()) % 7)
+
+    query = db.query(
+        models.Horario.materia_id,
+        models.Horario.grupo_id,
+        models.Horario.aula_id,
+        models.Horario.dia_semana,
+        models.Horario.hora_inicio,
+        models.Horario.hora_fin,
+        models.Materia.carrera_id,
+        models.Materia.profesor_id,
+    ).join(models.Materia, models.Horario.materia_id == models.Materia.id).filter(
+        models.Materia.carrera_id.in_(carrera_ids)
+    )
+    if grupo_ids:
+        query = query.filter(models.Horario.grupo_id.in_(grupo_ids))
+
+    examenes: Dict[Tuple[int, int], ExamenPorProgramar] = {}
+    bloques: Set[Tuple[time, time]] = set()
+    for materia_id, grupo_id, aula_id, dia, inicio, fin, carrera_id, profesor_id in query.order_by(
+        models.Horario.id
+    ):
+        if inicio is None or fin is None:
+            continue
+        bloques.add((inicio, fin))
+        if (materia_id, grupo_id) in examenes or aula_id is None:
+            continue
+        examenes[(materia_id, grupo_id)] = ExamenPorProgramar(
+            materia_id=materia_id,
+            grupo_id=grupo_id,
+            carrera_id=carrera_id,
+            profesor_id=profesor_id,
+            aula_preferida_id=aula_id,
+            dia_preferido=DIAS_SEMANA.get((dia or '').upper()),
+            bloque_preferido=(inicio, fin),
+        )
+
+    aulas = [AulaDisponible(id=a_id, capacidad=cap) for a_id, cap in db.query(models.Aula.id, models.Aula.capacidad)]
+    fechas = fechas_del_periodo(fecha_inicio, dias)
+
+    # Exámenes existentes que no se van a regenerar ocupan aulas, grupos y profesores
+    existentes = db.query(
+        models.Examen.fecha,
+        models.Examen.hora_inicio,
+        models.Examen.hora_fin,
+        models.Examen.aula_id,
+        models.Examen.grupo_id,
+        models.Examen.sinodal_id,
+        models.Materia.profesor_id,
+        models.Materia.carrera_id,
+    ).join(models.Materia, models.Examen.materia_id == models.Materia.id).filter(
+        models.Examen.fecha >= fechas[0],
+        models.Examen.fecha <= fechas[-1],
+    )
+    ocupaciones = []
+    for fecha, inicio, fin, aula_id, grupo_id, sinodal_id, profesor_id, carrera_id in existentes:
+        if carrera_id in carrera_ids and (grupo_ids is None or grupo_id in grupo_ids):
+            continue
+        if inicio is None or fin is None:
+            continue
+        ocupaciones.append(Ocupacion(
+            fecha=fecha,
+            hora_inicio=inicio,
+            hora_fin=fin,
+            aula_id=aula_id,
+            grupo_id=grupo_id,
+            profesor_ids=tuple(p for p in (profesor_id, sinodal_id) if p is not None),
+        ))
+
+    # Ventanas de no disponibilidad (sin fecha aplican todos los días, sin horas todo el día)
+    for profesor_id, aula_id, grupo_id, fecha, inicio, fin in db.query(
+        models.Restriccion.profesor_id,
+        models.Restriccion.aula_id,
+        models.Restriccion.grupo_id,
+        models.Restriccion.fecha,
+        models.Restriccion.hora_inicio,
+        models.Restriccion.hora_fin,
+    ).filter(or_(models.Restriccion.fecha.is_(None), models.Restriccion.fecha.between(fechas[0], fechas[-1]))):
+        for f in ([fecha] if fecha else fechas):
+            ocupaciones.append(Ocupacion(
+                fecha=f,
+                hora_inicio=inicio or time(0, 0),
+                hora_fin=fin or time(23, 59),
+                aula_id=aula_id,
+                grupo_id=grupo_id,
+                profesor_ids=(profesor_id,) if profesor_id is not None else (),
+                es_examen=False,
+            ))
+
+    return Problema(
+        examenes=list(examenes.values()),
+        aulas=aulas,
+        fechas=fechas,
+        bloques=sorted(bloques),
+        ocupaciones=ocupaciones,
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Union
 from datetime import time, date
 
 class Profesor(BaseModel):
@@ -103,9 +103,201 @@ class Examen(ExamenBase):
     class Config:
         from_attributes = True
 
+class GeneracionLote(BaseModel):
+    carreras: Union[List[int], Literal["all"]] = "all"
+    dias: int = Field(5, ge=1, le=60)
+
+class ExamenSinAsignar(BaseModel):
+    materia_id: int
+    grupo_id: int
+
+class GeneracionLoteResultado(BaseModel):
+    creados: int
+    subproblemas: int
+    costo: int
+    sin_asignar: List[ExamenSinAsignar] = []
+
+class GrupoResumen(BaseModel):
+    id: int
+    nombre_grupo: str
+    class Config:
+        from_attributes = True
+
+class ExamenLigero(ExamenBase):
+    """Examen sin los horarios anidados del grupo"""
+    id: int
+    materia_id: int
+    aula_id: int
+    grupo_id: int
+    sinodal_id: Optional[int] = None
+    materia: Materia
+    aula: Aula
+    grupo: Optional[GrupoResumen] = None
+    status: Optional[str] = None
+    comentarios_rechazo: Optional[str] = None
+    fecha_envio: Optional[date] = None
+    fecha_aprobacion: Optional[date] = None
+
+    class Config:
+        from_attributes = True
+
+class OcupanteConflicto(BaseModel):
+    tipo: str  # 'examen' | 'restriccion'
+    id: int
+    motivo: Optional[str] = None
+
+class AsignacionSinodales(BaseModel):
+    """Exámenes a los que se asigna sinodal: por IDs o por filtros"""
+    examen_ids: Optional[List[int]] = None
+    carrera_id: Optional[int] = None
+    grupo_id: Optional[int] = None
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    solo_pendientes: bool = True  # False reasigna también los que ya tienen sinodal
+    incluir_clases: bool = True
+    guardar: bool = True  # False solo calcula la propuesta
+
+class SinodalAsignado(BaseModel):
+    examen_id: int
+    sinodal_id: int
+
+class CargaSinodal(BaseModel):
+    profesor_id: int
+    nombre: str
+    previos: int  # exámenes que ya tenía como sinodal en el periodo
+    nuevos: int
+
+class AsignacionSinodalesResultado(BaseModel):
+    asignados: int
+    sin_asignar: List[int]
+    costo: int
+    asignaciones: List[SinodalAsignado]
+    carga: List[CargaSinodal]
+
+class Disponibilidad(BaseModel):
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+    aulas: List[Aula]
+    sinodales: List[Profesor]
+
+class CargaProfesor(BaseModel):
+    profesor_id: int
+    nombre: Optional[str] = None
+    clases: int  # Bloques semanales como titular
+    horas_clase: float  # Por semana
+    examenes_sinodal: int
+    horas_sinodal: float
+
+class UsoAula(BaseModel):
+    aula_id: int
+    nombre: Optional[str] = None
+    clases: int
+    horas_clase: float  # Por semana
+    examenes: int
+    horas_examen: float
+
+class Estadisticas(BaseModel):
+    carrera_id: Optional[int] = None
+    profesores: List[CargaProfesor]
+    aulas: List[UsoAula]
+
+class CalidadCalendario(BaseModel):
+    examenes: int
+    dias: int
+    max_examenes_grupo_dia: int
+    promedio_examenes_grupo_dia: float
+    grupo_dias_con_varios: int
+    dias_consecutivos: int
+    hueco_promedio_min: float
+    hueco_maximo_min: int
+    choques_grupo: int
+    choques_aula: int
+    choques_profesor: int
+    aulas_usadas: int
+    ocupacion_aulas_promedio: float
+    ocupacion_aulas_maxima: float
+    aprovechamiento_capacidad: Optional[float] = None  # Capacidad del aula de la clase / del aula asignada
+    examenes_sobre_capacidad: int  # En un aula más chica que la de su clase
+    sin_sinodal: int
+    sinodales: int
+    carga_sinodal_promedio: float
+    carga_sinodal_maxima: int
+    carga_sinodal_cv: float
+    costo: float
+
+class Conflicto(BaseModel):
+    recurso: str  # 'aula' | 'grupo' | 'profesor'
+    recurso_id: int
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+    a: OcupanteConflicto
+    b: OcupanteConflicto
+
 class RejectionModel(BaseModel):
     comentarios: str
 
+class RestriccionNueva(BaseModel):
+    """Ventana en la que un profesor, aula o grupo deja de estar disponible"""
+    profesor_id: Optional[int] = None
+    aula_id: Optional[int] = None
+    grupo_id: Optional[int] = None
+    fecha: Optional[date] = None  # Sin fecha aplica todos los días
+    hora_inicio: Optional[time] = None  # Sin horas aplica todo el día
+    hora_fin: Optional[time] = None
+    motivo: Optional[str] = None
+
+class Reparacion(BaseModel):
+    """Exámenes a reparar (por IDs o filtros) y restricciones nuevas"""
+    examen_ids: Optional[List[int]] = None
+    carrera_id: Optional[int] = None
+    grupo_id: Optional[int] = None
+    fecha_desde: Optional[date] = None
+    fecha_hasta: Optional[date] = None
+    restricciones: List[RestriccionNueva] = []
+    presupuesto_ms: int = Field(2000, ge=10, le=60000)
+    semilla: Optional[int] = None
+    guardar: bool = True  # False solo calcula la propuesta
+
+class MovimientoExamen(BaseModel):
+    examen_id: int
+    fecha_anterior: date
+    hora_inicio_anterior: time
+    hora_fin_anterior: time
+    aula_id_anterior: Optional[int] = None
+    fecha: date
+    hora_inicio: time
+    hora_fin: time
+    aula_id: Optional[int] = None
+
+class ReparacionResultado(BaseModel):
+    examenes: int
+    choques_iniciales: int
+    choques_finales: int
+    costo_inicial: float
+    costo_final: float
+    sin_resolver: List[int]
+    iteraciones: int
+    aceptados: Dict[str, int]
+    tiempo_ms: float
+    movimientos: List[MovimientoExamen]
+
+class SeleccionExamenes(BaseModel):
+    """Exámenes a mover en el flujo de aprobación: por IDs, carrera y/o grupo"""
+    examen_ids: Optional[List[int]] = None
+    carrera_id: Optional[int] = None
+    grupo_id: Optional[int] = None
+
+class RechazoExamenes(SeleccionExamenes, RejectionModel):
+    pass
+
+class TransicionExamenesResultado(BaseModel):
+    status: str
+    actualizados: int
+    examen_ids: List[int]
+    omitidos: List[int] = []  # IDs pedidos que no estaban en un estado válido
+
 # Schemas de Autenticación
 class UserBase(BaseModel):
     username: str
@@ -123,6 +315,26 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserUpdate(BaseModel):
+    role: Optional[str] = None
+    email: Optional[str] = None
+    carrera: Optional[str] = None
+    is_active: Optional[bool] = None
+
+class ResultadoProvisionUsuario(BaseModel):
+    fila: int
+    username: Optional[str] = None
+    estado: Literal["creado", "actualizado", "existente", "error"]
+    detalle: Optional[str] = None
+    id: Optional[int] = None
+
+class ProvisionUsuarios(BaseModel):
+    creados: int
+    actualizados: int
+    existentes: int
+    errores: int
+    filas: List[ResultadoProvisionUsuario]
+
 class UserLogin(BaseModel):
     username: str
     password: str
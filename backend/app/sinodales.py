@@ -0,0 +1,296 @@
+"""
+Asignación automática de sinodales.
+
+Se plantea como un flujo de costo mínimo:
+
+    fuente -> examen -> (profesor, bloque) -> profesor -> sumidero
+
+  - cada examen recibe a lo más un sinodal (capacidad 1 desde la fuente);
+  - la arista examen -> profesor existe solo si el profesor está libre a esa
+    hora (sin clases, exámenes ni restricciones según la matriz de
+    disponibilidad) y no es el titular; cuesta COSTO_OTRA_CARRERA si el
+    profesor no da clases en la carrera del examen;
+  - los exámenes de una misma fecha que se traslapan forman un bloque, y el
+    nodo (profesor, bloque) tiene capacidad 1 para que nadie quede en dos
+    exámenes a la vez;
+  - de profesor a sumidero hay una arista por cada examen adicional con costo
+    creciente (PESO_CARGA × carga), así que el costo mínimo reparte la carga.
+
+Se resuelve con caminos más cortos sucesivos (Dijkstra con potenciales).
+Como los bloques son conservadores (en una cadena A-B-C de traslapes un
+profesor podría tomar A y C), los exámenes que queden sin sinodal se intentan
+completar al final con una pasada voraz.
+"""
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import disponibilidad, models
+
+COSTO_OTRA_CARRERA = 4
+PESO_CARGA = 1
+
+INF = float('inf')
+
+
+@dataclass
+class ExamenSinodal:
+    id: int
+    fecha: date
+    bits: int  # slots de disponibilidad.mascara
+    carrera_id: Optional[int] = None
+    titular_id: Optional[int] = None
+
+
+@dataclass
+class ResultadoSinodales:
+    asignaciones: Dict[int, int]  # examen_id -> profesor_id
+    sin_asignar: List[int]
+    costo: int
+    nuevos: Dict[int, int] = field(default_factory=dict)  # profesor_id -> exámenes asignados
+
+
+class _Red:
+    """Red de flujo con aristas en listas planas; cada arista tiene su reversa en i ^ 1."""
+
+    def __init__(self):
+        self.adyacencia: List[List[int]] = []
+        self.destino: List[int] = []
+        self.capacidad: List[int] = []
+        self.costo: List[int] = []
+
+    def nodo(self) -> int:
+        self.adyacencia.append([])
+        return len(self.adyacencia) - 1
+
+    def arista(self, u: int, v: int, capacidad: int, costo: int) -> int:
+        i = len(self.destino)
+        self.destino += [v, u]
+        self.capacidad += [capacidad, 0]
+        self.costo += [costo, -costo]
+        self.adyacencia[u].append(i)
+        self.adyacencia[v].append(i + 1)
+        return i
+
+
+def _bloques(examenes: List[ExamenSinodal]) -> Dict[int, int]:
+    """Examen -> bloque: componentes de exámenes traslapados en la misma fecha."""
+    por_fecha: Dict[date, List[Tuple[int, int, int]]] = defaultdict(list)
+    for ex in examenes:
+        # (primer slot, último slot, id)
+        por_fecha[ex.fecha].append(((ex.bits & -ex.bits).bit_length() - 1, ex.bits.bit_length() - 1, ex.id))
+    bloque, n = {}, 0
+    for intervalos in por_fecha.values():
+        ultimo = -1
+        for primero, fin, e_id in sorted(intervalos):
+            if primero > ultimo:
+                n += 1
+            ultimo = max(ultimo, fin)
+            bloque[e_id] = n
+    return bloque
+
+
+def asignar(
+    examenes: List[ExamenSinodal],
+    candidatos: Dict[int, List[int]],
+    carreras_profesor: Dict[int, Set[int]],
+    carga_previa: Optional[Dict[int, int]] = None,
+) -> ResultadoSinodales:
+    """
+    Elige un sinodal para cada examen entre sus `candidatos` (profesores libres
+    a esa hora). `carga_previa` son los exámenes que cada profesor ya tiene
+    como sinodal en el periodo.
+    """
+    carga_previa = carga_previa or {}
+
+    def costo_carrera(ex: ExamenSinodal, p: int) -> int:
+        return 0 if ex.carrera_id in carreras_profesor.get(p, ()) else COSTO_OTRA_CARRERA
+
+    red = _Red()
+    fuente, sumidero = red.nodo(), red.nodo()
+    nodo_examen = {}
+    arista_examen: Dict[int, List[Tuple[int, int]]] = {}  # examen -> [(arista, profesor)]
+    nodo_profesor: Dict[int, int] = {}
+    nodo_bloque: Dict[Tuple[int, int], int] = {}
+    bloque = _bloques(examenes)
+
+    for ex in examenes:
+        u = nodo_examen[ex.id] = red.nodo()
+        red.arista(fuente, u, 1, 0)
+        arista_examen[ex.id] = []
+        for p in candidatos.get(ex.id, ()):
+            if p == ex.titular_id:
+                continue
+            if p not in nodo_profesor:
+                nodo_profesor[p] = red.nodo()
+            clave = (p, bloque[ex.id])
+            if clave not in nodo_bloque:
+                nodo_bloque[clave] = red.nodo()
+                red.arista(nodo_bloque[clave], nodo_profesor[p], 1, 0)
+            arista_examen[ex.id].append((red.arista(u, nodo_bloque[clave], 1, costo_carrera(ex, p)), p))
+
+    # Aristas de carga: se agrega la siguiente cuando se usa la anterior
+    aristas_carga: Dict[int, int] = {}
+    nuevos_por_profesor: Dict[int, int] = defaultdict(int)
+    profesor_de_nodo = {v: p for p, v in nodo_profesor.items()}
+
+    def siguiente_arista_carga(p: int):
+        carga = carga_previa.get(p, 0) + nuevos_por_profesor[p]
+        aristas_carga[p] = red.arista(nodo_profesor[p], sumidero, 1, PESO_CARGA * carga)
+
+    for p in nodo_profesor:
+        siguiente_arista_carga(p)
+
+    n_nodos = len(red.adyacencia)
+    potencial = [0] * n_nodos
+    destino, capacidad, costo = red.destino, red.capacidad, red.costo
+    while True:
+        distancia = [INF] * n_nodos
+        previa = [-1] * n_nodos
+        distancia[fuente] = 0
+        heap = [(0, fuente)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > distancia[u]:
+                continue
+            if u == sumidero:
+                break
+            pu = potencial[u]
+            for i in red.adyacencia[u]:
+                if capacidad[i] <= 0:
+                    continue
+                v = destino[i]
+                nd = d + costo[i] + pu - potencial[v]
+                if nd < distancia[v]:
+                    distancia[v] = nd
+                    previa[v] = i
+                    heapq.heappush(heap, (nd, v))
+        tope = distancia[sumidero]
+        if tope == INF:
+            break
+        # Dijkstra se detuvo en el sumidero: los nodos no cerrados suben lo mismo que él
+        for v in range(n_nodos):
+            potencial[v] += min(distancia[v], tope)
+
+        v = sumidero
+        while v != fuente:
+            i = previa[v]
+            capacidad[i] -= 1
+            capacidad[i ^ 1] += 1
+            v = destino[i ^ 1]
+        # La arista que llega al sumidero es la de carga de un profesor
+        p = profesor_de_nodo[destino[previa[sumidero] ^ 1]]
+        if capacidad[aristas_carga[p]] == 0:
+            nuevos_por_profesor[p] += 1
+            siguiente_arista_carga(p)
+
+    asignaciones = {}
+    for ex in examenes:
+        for i, p in arista_examen[ex.id]:
+            if capacidad[i] == 0:
+                asignaciones[ex.id] = p
+                break
+
+    # Pasada voraz para lo que los bloques dejaron fuera
+    ocupado: Dict[Tuple[int, date], int] = defaultdict(int)
+    por_id = {ex.id: ex for ex in examenes}
+    carga = defaultdict(int)
+    for e_id, p in asignaciones.items():
+        ocupado[(p, por_id[e_id].fecha)] |= por_id[e_id].bits
+        carga[p] += 1
+    sin_asignar = []
+    for ex in examenes:
+        if ex.id in asignaciones:
+            continue
+        opciones = sorted(
+            (costo_carrera(ex, p) + PESO_CARGA * (carga_previa.get(p, 0) + carga[p]), p)
+            for p in candidatos.get(ex.id, ())
+            if p != ex.titular_id and not ocupado[(p, ex.fecha)] & ex.bits
+        )
+        if not opciones:
+            sin_asignar.append(ex.id)
+            continue
+        p = opciones[0][1]
+        asignaciones[ex.id] = p
+        ocupado[(p, ex.fecha)] |= ex.bits
+        carga[p] += 1
+
+    costo_total = sum(costo_carrera(por_id[e_id], p) for e_id, p in asignaciones.items())
+    for p, n in carga.items():
+        previa_p = carga_previa.get(p, 0)
+        costo_total += PESO_CARGA * sum(previa_p + k for k in range(n))
+    return ResultadoSinodales(asignaciones, sin_asignar, costo_total, dict(carga))
+
+
+def cargar_y_asignar(
+    db: Session,
+    condiciones=(),
+    solo_pendientes: bool = True,
+    incluir_clases: bool = True,
+) -> Tuple[ResultadoSinodales, Dict[int, int]]:
+    """
+    Arma el problema con los exámenes que cumplen `condiciones` y lo resuelve.
+    Regresa también la carga previa de cada profesor en el rango de fechas.
+    """
+    condiciones = list(condiciones)
+    if solo_pendientes:
+        condiciones.append(models.Examen.sinodal_id.is_(None))
+    filas = db.execute(
+        select(
+            models.Examen.id, models.Examen.fecha, models.Examen.hora_inicio, models.Examen.hora_fin,
+            models.Materia.carrera_id, models.Materia.profesor_id, models.Examen.sinodal_id,
+        ).outerjoin(models.Materia, models.Examen.materia_id == models.Materia.id)
+        .where(*condiciones).order_by(models.Examen.fecha, models.Examen.hora_inicio, models.Examen.id)
+    ).all()
+
+    examenes, sinodal_actual = [], {}
+    for e_id, fecha, inicio, fin, carrera_id, titular_id, sinodal_id in filas:
+        if fecha is None or inicio is None or fin is None:
+            continue
+        examenes.append(ExamenSinodal(e_id, fecha, disponibilidad.mascara(inicio, fin), carrera_id, titular_id))
+        if sinodal_id is not None:
+            sinodal_actual[e_id] = sinodal_id
+    if not examenes:
+        return ResultadoSinodales({}, [], 0), {}
+
+    # Ocupación de cada profesor sin los exámenes que se van a asignar; se
+    # vuelve a sumar la de los titulares, que no cambia
+    ids = frozenset(ex.id for ex in examenes)
+    matriz = disponibilidad.matriz(db)
+    candidatos = {}
+    por_fecha: Dict[date, List[ExamenSinodal]] = defaultdict(list)
+    for ex in examenes:
+        por_fecha[ex.fecha].append(ex)
+    for fecha, lista in por_fecha.items():
+        ocupacion = matriz.ocupacion_profesores(db, fecha, incluir_clases, ids)
+        for ex in lista:
+            if ex.titular_id in ocupacion:
+                ocupacion[ex.titular_id] |= ex.bits
+        for ex in lista:
+            candidatos[ex.id] = [p for p, bits in ocupacion.items() if not bits & ex.bits]
+
+    carreras_profesor: Dict[int, Set[int]] = defaultdict(set)
+    for p_id, carrera_id in db.execute(
+        select(models.Materia.profesor_id, models.Materia.carrera_id).distinct()
+        .where(models.Materia.profesor_id.is_not(None))
+    ):
+        carreras_profesor[p_id].add(carrera_id)
+
+    carga_previa: Dict[int, int] = defaultdict(int)
+    for p_id, n in db.execute(
+        select(models.Examen.sinodal_id, func.count())
+        .where(
+            models.Examen.sinodal_id.is_not(None),
+            models.Examen.fecha.between(examenes[0].fecha, max(ex.fecha for ex in examenes)),
+        ).group_by(models.Examen.sinodal_id)
+    ):
+        carga_previa[p_id] = n
+    for p_id in sinodal_actual.values():
+        carga_previa[p_id] -= 1
+
+    return asignar(examenes, candidatos, carreras_profesor, carga_previa), carga_previa
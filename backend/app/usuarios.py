@@ -0,0 +1,188 @@
+"""
+Alta masiva de usuarios desde CSV o JSON.
+
+`provisionar` valida todas las filas, revisa en una sola consulta por bloque
+qué usernames y emails ya existen, calcula los hashes en paralelo y hace los
+INSERT en lotes dentro de una sola transacción. Regresa un resultado por fila
+(creado, actualizado, existente o error) en el mismo orden de entrada. Lo
+usan POST /api/users/lote y los scripts de alta de usuarios.
+"""
+import csv
+import io
+import json
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .auth import ROLES
+from .hashing import hash_lote
+
+CAMPOS = ('username', 'password', 'role', 'email', 'carrera')
+OBLIGATORIOS = ('username', 'role')  # password sólo para usuarios nuevos
+TAMANO_LOTE = 1000
+# Límite de parámetros en un IN; SQLite admite pocos en versiones viejas
+TAMANO_IN = 500
+
+
+@dataclass
+class ResultadoFila:
+    fila: int  # 1 = primera fila de datos
+    username: Optional[str]
+    estado: str  # 'creado' | 'actualizado' | 'existente' | 'error'
+    detalle: Optional[str] = None
+    id: Optional[int] = None
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _limpiar(fila: dict) -> dict:
+    limpia = {}
+    for campo in CAMPOS:
+        valor = fila.get(campo)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        limpia[campo] = valor or None
+    return limpia
+
+
+def leer_csv(contenido: Union[str, Iterable[str]]) -> List[dict]:
+    """Filas de un CSV con encabezado (username,password,role,email,carrera)."""
+    if isinstance(contenido, str):
+        contenido = io.StringIO(contenido)
+    return [dict(fila) for fila in csv.DictReader(contenido)]
+
+
+def leer_json(contenido: Union[str, bytes, list, dict]) -> List[dict]:
+    """Acepta una lista de usuarios o un objeto {"usuarios": [...]}."""
+    if isinstance(contenido, (str, bytes)):
+        contenido = json.loads(contenido)
+    if isinstance(contenido, dict):
+        contenido = contenido.get("usuarios", [])
+    if not isinstance(contenido, list):
+        raise ValueError("Se esperaba una lista de usuarios")
+    return contenido
+
+
+def leer_archivo(ruta: str) -> List[dict]:
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        if ruta.lower().endswith('.json'):
+            return leer_json(f.read())
+        return leer_csv(f)
+
+
+def _en_bloques(valores: List, tamano: int):
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def _existentes(db: Session, usernames: List[str], emails: List[str]) -> List[tuple]:
+    """
+    (id, username, email) de los usuarios que ya usan alguno de esos
+    usernames o emails: un SELECT ... WHERE username IN (...) OR email IN (...)
+    por cada bloque de TAMANO_IN valores.
+    """
+    encontrados = {}
+    bloques = -(-max(len(usernames), len(emails)) // TAMANO_IN)
+    for i in range(bloques):
+        bloque_u = usernames[i * TAMANO_IN:(i + 1) * TAMANO_IN]
+        bloque_e = emails[i * TAMANO_IN:(i + 1) * TAMANO_IN]
+        condiciones = []
+        if bloque_u:
+            condiciones.append(models.User.username.in_(bloque_u))
+        if bloque_e:
+            condiciones.append(models.User.email.in_(bloque_e))
+        for fila in db.execute(
+            select(models.User.id, models.User.username, models.User.email).where(or_(*condiciones))
+        ):
+            encontrados[fila.id] = tuple(fila)
+    return list(encontrados.values())
+
+
+def provisionar(db: Session, filas: List[dict], actualizar_existentes: bool = False) -> List[ResultadoFila]:
+    """
+    Da de alta las filas nuevas. Los usernames que ya existen se reportan como
+    'existente', o con `actualizar_existentes` se les actualiza role y, si la
+    fila los trae, email y carrera (nunca la contraseña). No hace commit: el
+    llamador decide.
+    """
+    resultados: List[Optional[ResultadoFila]] = [None] * len(filas)
+    validas: Dict[int, dict] = {}
+    vistos_username, vistos_email = set(), set()
+
+    for i, fila in enumerate(filas):
+        if not isinstance(fila, dict):
+            resultados[i] = ResultadoFila(i + 1, None, 'error', 'La fila no es un objeto')
+            continue
+        datos = _limpiar(fila)
+        faltantes = [c for c in OBLIGATORIOS if not datos[c]]
+        if faltantes:
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'error', f"Faltan campos: {', '.join(faltantes)}")
+        elif datos['role'] not in ROLES:
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'error', f"Rol no válido: {datos['role']}")
+        elif datos['username'] in vistos_username:
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'error', 'Username repetido en el archivo')
+        elif datos['email'] and datos['email'] in vistos_email:
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'error', 'Email repetido en el archivo')
+        else:
+            vistos_username.add(datos['username'])
+            if datos['email']:
+                vistos_email.add(datos['email'])
+            validas[i] = datos
+
+    existentes = _existentes(db, sorted(vistos_username), sorted(vistos_email))
+    id_por_username = {username: u_id for u_id, username, _ in existentes}
+    dueno_email = {email: u_id for u_id, _, email in existentes if email}
+
+    nuevas, actualizaciones = [], []
+    for i, datos in validas.items():
+        u_id = id_por_username.get(datos['username'])
+        otro = dueno_email.get(datos['email']) if datos['email'] else None
+        if otro is not None and otro != u_id:
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'error', 'El email ya está registrado')
+        elif u_id is None:
+            if datos['password']:
+                nuevas.append(i)
+            else:
+                resultados[i] = ResultadoFila(i + 1, datos['username'], 'error', 'Faltan campos: password')
+        elif actualizar_existentes:
+            cambios = {'id': u_id, 'role': datos['role']}
+            cambios.update({c: datos[c] for c in ('email', 'carrera') if datos[c] is not None})
+            actualizaciones.append(cambios)
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'actualizado', id=u_id)
+        else:
+            resultados[i] = ResultadoFila(i + 1, datos['username'], 'existente', id=u_id)
+
+    hashes = hash_lote(validas[i]['password'] for i in nuevas)
+    for lote in _en_bloques(list(zip(nuevas, hashes)), TAMANO_LOTE):
+        ids = db.execute(
+            insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+            [
+                {
+                    'username': validas[i]['username'],
+                    'hashed_password': hashed,
+                    'role': validas[i]['role'],
+                    'email': validas[i]['email'],
+                    'carrera': validas[i]['carrera'],
+                    'is_active': 1,
+                }
+                for i, hashed in lote
+            ],
+        ).scalars().all()
+        for (i, _), u_id in zip(lote, ids):
+            resultados[i] = ResultadoFila(i + 1, validas[i]['username'], 'creado', id=u_id)
+
+    for lote in _en_bloques(actualizaciones, TAMANO_LOTE):
+        db.execute(update(models.User), lote)
+
+    return resultados
+
+
+def resumen(resultados: List[ResultadoFila]) -> Dict[str, int]:
+    conteo = {'creado': 0, 'actualizado': 0, 'existente': 0, 'error': 0}
+    for r in resultados:
+        conteo[r.estado] += 1
+    return conteo
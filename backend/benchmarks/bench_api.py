@@ -0,0 +1,205 @@
+"""
+Latencia de los endpoints principales con datos sintéticos a gran escala.
+
+Llena una base de datos temporal con benchmarks/datos_sinteticos.py y llama a
+cada endpoint `--repeticiones` veces, una petición a la vez, contra la
+aplicación en el mismo proceso (TestClient, con su lifespan). Por endpoint
+reporta p50/p95/p99, peticiones por segundo, respuestas con error y el pico de
+memoria (RSS máximo del proceso al terminar ese endpoint, así que sólo crece:
+un salto indica qué endpoint lo provocó).
+
+    cd backend
+    python benchmarks/bench_api.py [--examenes 20000] [--json benchmarks/baseline_api.json]
+    python benchmarks/bench_api.py --comparar benchmarks/baseline_api.json [--tolerancia 0.25]
+
+Con --comparar se marca como regresión cualquier endpoint cuyo p95 o pico de
+memoria supere al de la línea base en más de la tolerancia, y el código de
+salida es 1. La línea base sólo es comparable en la misma máquina y con los
+mismos tamaños y semilla; al cambiar algo a propósito se regenera con --json.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_login import percentil  # noqa: E402
+from datos_sinteticos import argumentos_tamanos, generar, tamanos_de  # noqa: E402
+
+
+def rss_maximo_mb():
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KiB y macOS en bytes
+    return round(maximo / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def escenarios(datos):
+    """
+    (nombre, método, función que arma (ruta, parámetros, cuerpo), repeticiones
+    relativas). Las escrituras pesadas corren menos veces.
+    """
+    lunes = datos["fecha_inicio"]
+
+    def fijo(ruta, params=None, cuerpo=None):
+        return lambda rnd: (ruta, params or {}, cuerpo)
+
+    def al_azar(ruta, llave, ids, **extra):
+        return lambda rnd: (ruta, {llave: rnd.choice(datos[ids]), **extra}, None)
+
+    def disponibilidad(rnd):
+        h = rnd.randint(7, 19)
+        return "/api/disponibilidad", {
+            "fecha": (lunes + timedelta(days=rnd.randrange(21))).isoformat(),
+            "hora_inicio": f"{h:02d}:00", "hora_fin": f"{h + 2:02d}:00", "capacidad": 30,
+        }, None
+
+    return [
+        ("GET /api/carreras", "GET", fijo("/api/carreras"), 1.0),
+        ("GET /api/materias", "GET", fijo("/api/materias"), 0.2),
+        ("GET /api/materias?carrera_id", "GET", al_azar("/api/materias", "carrera_id", "carreras"), 1.0),
+        ("GET /api/aulas", "GET", fijo("/api/aulas"), 1.0),
+        ("GET /api/profesores", "GET", fijo("/api/profesores"), 1.0),
+        ("GET /api/examenes?limit=500&vista=ligera", "GET", fijo("/api/examenes", {"limit": 500, "vista": "ligera"}), 1.0),
+        ("GET /api/examenes?carrera_id", "GET", al_azar("/api/examenes", "carrera_id", "carreras"), 0.5),
+        ("GET /api/examenes?grupo_id", "GET", al_azar("/api/examenes", "grupo_id", "grupos"), 1.0),
+        ("GET /api/conflictos", "GET", fijo("/api/conflictos"), 0.1),
+        ("GET /api/disponibilidad", "GET", disponibilidad, 1.0),
+        ("POST /api/generar-examenes", "POST", al_azar("/api/generar-examenes", "carrera_id", "carreras"), 0.1),
+        ("POST /api/generar-examenes/lote", "POST", fijo("/api/generar-examenes/lote", cuerpo={"carreras": "all"}), 0.05),
+    ]
+
+
+def medir(cliente, datos, repeticiones, calentamiento, semilla):
+    rnd = random.Random(semilla)
+    resultados = {}
+    for nombre, metodo, armar, peso in escenarios(datos):
+        n = max(3, round(repeticiones * peso))
+        latencias, codigos = [], Counter()
+        for i in range(calentamiento + n):
+            ruta, params, cuerpo = armar(rnd)
+            inicio = time.perf_counter()
+            r = cliente.request(metodo, ruta, params=params, json=cuerpo)
+            transcurrido = time.perf_counter() - inicio
+            if i >= calentamiento:
+                latencias.append(transcurrido * 1000)
+                codigos[r.status_code] += 1
+        resultados[nombre] = {
+            "peticiones": n,
+            "p50_ms": round(percentil(latencias, 50), 2),
+            "p95_ms": round(percentil(latencias, 95), 2),
+            "p99_ms": round(percentil(latencias, 99), 2),
+            "por_segundo": round(n / (sum(latencias) / 1000), 1),
+            "errores": sum(c for codigo, c in codigos.items() if codigo >= 400),
+            "rss_max_mb": rss_maximo_mb(),
+        }
+        print(f"{nombre:44} p50 {resultados[nombre]['p50_ms']:9.2f} ms   p95 {resultados[nombre]['p95_ms']:9.2f} ms"
+              f"   {resultados[nombre]['por_segundo']:8.1f}/s   RSS {resultados[nombre]['rss_max_mb']} MB")
+    return resultados
+
+
+def comparar(actual, base, tolerancia):
+    """Regresa las líneas de regresión contra la línea base."""
+    regresiones = []
+    for nombre, r in actual["endpoints"].items():
+        b = base.get("endpoints", {}).get(nombre)
+        if b is None:
+            continue
+        for llave in ("p95_ms", "rss_max_mb"):
+            if r.get(llave) is None or not b.get(llave):
+                continue
+            if r[llave] > b[llave] * (1 + tolerancia):
+                regresiones.append(f"{nombre}: {llave} {b[llave]} -> {r[llave]} (+{r[llave] / b[llave] - 1:.0%})")
+        if r["errores"] > b.get("errores", 0):
+            regresiones.append(f"{nombre}: errores {b.get('errores', 0)} -> {r['errores']}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argumentos_tamanos(parser)
+    parser.add_argument("--semilla", type=int, default=17)
+    parser.add_argument("--repeticiones", type=int, default=100)
+    parser.add_argument("--calentamiento", type=int, default=2)
+    parser.add_argument("--json", help="Guardar los resultados (p. ej. la línea base) en este archivo")
+    parser.add_argument("--comparar", help="Línea base JSON contra la cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+    tamanos = tamanos_de(args)
+
+    tmp = None
+    if "DATABASE_URL" not in os.environ:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        tmp.close()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}"
+    # Los avisos de exámenes sin slot de generar-examenes no ensucian la salida
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from fastapi.testclient import TestClient
+    from app.database import engine
+    from app.migraciones import actualizar
+
+    try:
+        actualizar()
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            datos = generar(conn, tamanos, args.semilla)
+        print(f"Datos sintéticos en {time.perf_counter() - t0:.1f}s: {len(datos['carreras'])} carreras, "
+              f"{len(datos['grupos'])} grupos, {datos['horarios']} horarios, {datos['examenes']} exámenes\n")
+
+        import app.main
+        with TestClient(app.main.app) as cliente:
+            # Las escrituras masivas (generación por lote) piden servicios_escolares
+            r = cliente.post("/api/auth/login", data={"username": datos["usuarios"][0], "password": "sintetico"})
+            cliente.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+            endpoints = medir(cliente, datos, args.repeticiones, args.calentamiento, args.semilla)
+    finally:
+        engine.dispose()
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    resultado = {
+        "semilla": args.semilla,
+        "tamanos": vars(tamanos),
+        "repeticiones": args.repeticiones,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "base_de_datos": engine.dialect.name,
+        "endpoints": endpoints,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("tamanos") != resultado["tamanos"] or base.get("semilla") != resultado["semilla"]:
+            print("\nAviso: la línea base usa otros tamaños o semilla; la comparación no es directa")
+        regresiones = comparar(resultado, base, args.tolerancia)
+        if regresiones:
+            print(f"\nRegresiones (tolerancia {args.tolerancia:.0%}):")
+            for linea in regresiones:
+                print(f"  {linea}")
+            sys.exit(1)
+        print(f"\nSin regresiones contra {args.comparar} (tolerancia {args.tolerancia:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Mide el arranque en frío del backend.
+
+Cada corrida es un proceso nuevo que importa `app.main`, ejecuta el arranque
+de la aplicación (lifespan) y atiende `GET /`, como lo haría un worker de
+uvicorn recién creado. Se reporta la mediana y el peor caso y se compara contra
+un objetivo; el código de salida es 1 si la mediana lo excede.
+
+    cd backend
+    python benchmarks/bench_arranque.py [--corridas 10] [--objetivo-ms 1500]
+
+Usa la base de datos de DATABASE_URL (por defecto la de app.database).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Se ejecuta en el proceso hijo; imprime los tiempos en milisegundos
+CORRIDA = """
+import time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as cliente:
+    t2 = time.perf_counter()
+    cliente.get("/")
+    t3 = time.perf_counter()
+print((t1 - t0) * 1000, (t2 - t1) * 1000, (t3 - t0) * 1000)
+"""
+
+
+def corrida():
+    salida = subprocess.run(
+        [sys.executable, "-c", CORRIDA], cwd=BACKEND, check=True,
+        capture_output=True, text=True,
+    ).stdout.split()
+    return [float(x) for x in salida[-3:]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corridas", type=int, default=10)
+    parser.add_argument("--objetivo-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    tiempos = [corrida() for _ in range(args.corridas)]
+    for i, nombre in enumerate(("import app.main", "arranque (lifespan)", "hasta la primera respuesta")):
+        valores = [t[i] for t in tiempos]
+        print(f"{nombre:28} mediana {statistics.median(valores):8.1f} ms   máx {max(valores):8.1f} ms")
+
+    total = statistics.median(t[2] for t in tiempos)
+    if total > args.objetivo_ms:
+        print(f"La mediana ({total:.1f} ms) excede el objetivo de {args.objetivo_ms:.0f} ms")
+        sys.exit(1)
+    print(f"Dentro del objetivo de {args.objetivo_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark de los índices de filtros frecuentes (migración 0002).
+
+Crea una base de datos temporal en la revisión 0001 (sin índices), la llena con
+datos sintéticos (por defecto 100,000 exámenes), mide las consultas más usadas
+y muestra su plan de ejecución; después aplica la migración 0002 y repite.
+
+    cd backend
+    python benchmarks/bench_indices.py [--examenes 100000] [--json resultado.json]
+
+Con DATABASE_URL se puede apuntar a PostgreSQL (la base debe estar vacía).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+
+CONSULTAS = {
+    "examenes_por_carrera": (
+        "SELECT * FROM examenes WHERE materia_id IN "
+        "(SELECT id FROM materias WHERE carrera_id = :carrera_id)"
+    ),
+    "examenes_por_grupo_y_fechas": (
+        "SELECT * FROM examenes WHERE grupo_id = :grupo_id AND fecha BETWEEN :desde AND :hasta"
+    ),
+    "choque_de_aula": (
+        "SELECT id FROM examenes WHERE aula_id = :aula_id AND fecha = :fecha "
+        "AND hora_inicio < :fin"
+    ),
+    "examenes_de_sinodal": (
+        "SELECT * FROM examenes WHERE sinodal_id = :sinodal_id AND fecha = :fecha"
+    ),
+    "examenes_por_status": (
+        "SELECT id FROM examenes WHERE status = 'pendiente_aprobacion'"
+    ),
+    "examenes_por_materia": (
+        "SELECT * FROM examenes WHERE materia_id = :materia_id"
+    ),
+    "horarios_por_grupo": (
+        "SELECT * FROM horarios WHERE grupo_id = :grupo_id"
+    ),
+    "materias_por_carrera": (
+        "SELECT * FROM materias WHERE carrera_id = :carrera_id"
+    ),
+}
+
+
+def poblar(conn, n_examenes, semilla=7):
+    """Inserta un catálogo proporcional al número de exámenes."""
+    from sqlalchemy import insert
+    from app import models
+
+    rnd = random.Random(semilla)
+    n_carreras = 20
+    n_grupos = max(n_examenes // 250, n_carreras)
+    n_profesores = max(n_examenes // 150, 10)
+    n_aulas = max(n_examenes // 700, 10)
+    n_materias = max(n_examenes // 50, n_carreras)
+
+    conn.execute(insert(models.Carrera),
+                 [{"id": i, "nombre": f"Carrera {i}"} for i in range(1, n_carreras + 1)])
+    conn.execute(insert(models.Profesor),
+                 [{"id": i, "nombre": f"Profesor {i}"} for i in range(1, n_profesores + 1)])
+    conn.execute(insert(models.Aula),
+                 [{"id": i, "nombre": f"A{i}", "capacidad": rnd.choice([20, 30, 40, 60])}
+                  for i in range(1, n_aulas + 1)])
+    conn.execute(insert(models.Grupo),
+                 [{"id": i, "nombre_grupo": str(100 + i), "carrera_id": (i % n_carreras) + 1}
+                  for i in range(1, n_grupos + 1)])
+    conn.execute(insert(models.Materia),
+                 [{"id": i, "nombre": f"Materia {i}", "carrera_id": (i % n_carreras) + 1,
+                   "profesor_id": rnd.randint(1, n_profesores)} for i in range(1, n_materias + 1)])
+    conn.execute(insert(models.Horario),
+                 [{"dia_semana": rnd.choice(["LUNES", "MARTES", "MIÉRCOLES", "JUEVES", "VIERNES"]),
+                   "hora_inicio": dtime(h, 0), "hora_fin": dtime(h + 1, 0), "grupo_id": g,
+                   "materia_id": rnd.randint(1, n_materias), "aula_id": rnd.randint(1, n_aulas)}
+                  for g in range(1, n_grupos + 1) for h in range(8, 15)])
+
+    inicio = date(2025, 1, 6)
+    statuses = ["borrador", "pendiente_aprobacion", "aprobado", "rechazado"]
+    lote = []
+    for _ in range(n_examenes):
+        h = rnd.randint(8, 18)
+        lote.append({
+            "fecha": inicio + timedelta(days=rnd.randint(0, 180)),
+            "hora_inicio": dtime(h, 0), "hora_fin": dtime(h + 2, 0), "tipo": "PARCIAL",
+            "materia_id": rnd.randint(1, n_materias), "aula_id": rnd.randint(1, n_aulas),
+            "grupo_id": rnd.randint(1, n_grupos),
+            "sinodal_id": rnd.randint(1, n_profesores) if rnd.random() < 0.7 else None,
+            "status": rnd.choices(statuses, weights=[70, 10, 15, 5])[0],
+        })
+        if len(lote) == 10000:
+            conn.execute(insert(models.Examen), lote)
+            lote = []
+    if lote:
+        conn.execute(insert(models.Examen), lote)
+    return {"grupos": n_grupos, "profesores": n_profesores, "aulas": n_aulas, "materias": n_materias}
+
+
+def _sql(sql):
+    """Texto SQL con los parámetros de fecha y hora tipados."""
+    from sqlalchemy import Date, Time, bindparam, text
+    tipos = {"fecha": Date, "desde": Date, "hasta": Date, "fin": Time}
+    return text(sql).bindparams(*(bindparam(k, type_=t) for k, t in tipos.items() if f":{k}" in sql))
+
+
+def plan(conn, sql, params):
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(_sql("EXPLAIN QUERY PLAN " + sql), params)]
+    return [row[0] for row in conn.execute(_sql("EXPLAIN " + sql), params)]
+
+
+def medir(conn, repeticiones, tamanos):
+    rnd = random.Random(11)
+    resultados = {}
+    for nombre, sql in CONSULTAS.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            fecha = date(2025, 1, 6) + timedelta(days=rnd.randint(0, 180))
+            params = {
+                "carrera_id": rnd.randint(1, 20),
+                "grupo_id": rnd.randint(1, tamanos["grupos"]),
+                "aula_id": rnd.randint(1, tamanos["aulas"]),
+                "sinodal_id": rnd.randint(1, tamanos["profesores"]),
+                "materia_id": rnd.randint(1, tamanos["materias"]),
+                "fecha": fecha, "desde": fecha, "hasta": fecha + timedelta(days=14),
+                "fin": dtime(12, 0),
+            }
+            usados = {k: v for k, v in params.items() if f":{k}" in sql}
+            t0 = time.perf_counter()
+            conn.execute(_sql(sql), usados).fetchall()
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        resultados[nombre] = {
+            "mediana_ms": round(statistics.median(tiempos), 3),
+            "plan": plan(conn, sql, usados),
+        }
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examenes", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    tmp = None
+    if "DATABASE_URL" not in os.environ:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        tmp.close()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}"
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+    from app.database import engine
+
+    config = Config(os.path.join(BACKEND, "alembic.ini"))
+    try:
+        command.upgrade(config, "0001")
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            tamanos = poblar(conn, args.examenes)
+        print(f"Datos sintéticos: {args.examenes} exámenes en {time.perf_counter() - t0:.1f}s")
+
+        with engine.connect() as conn:
+            antes = medir(conn, args.repeticiones, tamanos)
+        command.upgrade(config, "0002")
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        with engine.connect() as conn:
+            despues = medir(conn, args.repeticiones, tamanos)
+    finally:
+        engine.dispose()
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    print(f"\n{'consulta':32} {'antes (ms)':>12} {'después (ms)':>13} {'mejora':>8}")
+    for nombre in CONSULTAS:
+        a, d = antes[nombre]["mediana_ms"], despues[nombre]["mediana_ms"]
+        print(f"{nombre:32} {a:12.3f} {d:13.3f} {a / d if d else float('inf'):7.1f}x")
+    for nombre in CONSULTAS:
+        print(f"\n{nombre}")
+        print("  antes:   " + " | ".join(antes[nombre]["plan"]))
+        print("  después: " + " | ".join(despues[nombre]["plan"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"examenes": args.examenes, "antes": antes, "despues": despues}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
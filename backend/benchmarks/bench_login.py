@@ -0,0 +1,132 @@
+"""
+Latencia de /api/auth/login con muchos inicios de sesión simultáneos.
+
+Crea usuarios de prueba en una base de datos temporal y lanza `--peticiones`
+logins con `--concurrencia` clientes a la vez contra la aplicación en el mismo
+proceso (o contra un servidor en marcha con --url, cuyos usuarios deben
+existir: bench0..benchN con contraseña "bench"). Los clientes reintentan los
+429 después de Retry-After, así que la latencia es la que percibe el usuario.
+Reporta p50/p99, throughput y cuántas respuestas fueron 429.
+
+    cd backend
+    python benchmarks/bench_login.py [--concurrencia 50] [--peticiones 500]
+
+El tamaño del pool de bcrypt se controla con BCRYPT_WORKERS y BCRYPT_COLA.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+
+PASSWORD = "bench"
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano."""
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def crear_usuarios(n):
+    from sqlalchemy import insert
+    from app.database import engine
+    from app.hashing import hash_lote
+    from app.migraciones import actualizar
+    from app.models import User
+
+    actualizar()
+    hashed = hash_lote([PASSWORD])[0]  # mismo costo de verificación para todos
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"bench{i}", "hashed_password": hashed, "role": "secretaria", "is_active": 1}
+            for i in range(n)
+        ])
+
+
+async def correr(cliente, peticiones, concurrencia, usuarios):
+    latencias, codigos = [], Counter()
+    siguiente = iter(range(peticiones))
+
+    async def trabajador():
+        for i in siguiente:
+            datos = {"username": f"bench{i % usuarios}", "password": PASSWORD}
+            inicio = time.perf_counter()
+            while True:
+                r = await cliente.post("/api/auth/login", data=datos)
+                codigos[r.status_code] += 1
+                if r.status_code != 429:
+                    break
+                # Como un cliente real: esperar lo que indica Retry-After
+                await asyncio.sleep(float(r.headers.get("retry-after", 1)))
+            if r.status_code == 200:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    return latencias, codigos, time.perf_counter() - inicio
+
+
+async def main_async(args):
+    import httpx
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as cliente:
+            return await correr(cliente, args.peticiones, args.concurrencia, args.usuarios)
+
+    import app.main
+    async with app.main.lifespan(app.main.app):
+        transporte = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=60) as cliente:
+            return await correr(cliente, args.peticiones, args.concurrencia, args.usuarios)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--peticiones", type=int, default=500)
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--url", help="Servidor en marcha, p. ej. http://localhost:8000")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    tmp = None
+    if not args.url and "DATABASE_URL" not in os.environ:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        tmp.close()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}"
+    try:
+        if not args.url:
+            crear_usuarios(args.usuarios)
+        latencias, codigos, duracion = asyncio.run(main_async(args))
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    resultado = {
+        "concurrencia": args.concurrencia,
+        "peticiones": args.peticiones,
+        "bcrypt_workers": int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 1)),
+        "p50_ms": round(percentil(latencias, 50), 1),
+        "p99_ms": round(percentil(latencias, 99), 1),
+        "logins_por_segundo": round(len(latencias) / duracion, 1),
+        "codigos": dict(codigos),
+    }
+    for llave, valor in resultado.items():
+        print(f"{llave:20} {valor}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Generador de datos sintéticos con el tamaño de una universidad completa.
+
+Con la misma semilla y los mismos tamaños genera siempre los mismos datos:
+carreras, profesores, aulas, materias por carrera, grupos con su horario
+semanal (sin choques dentro del grupo), tipos de examen y exámenes ya
+programados alrededor del siguiente periodo. Los exámenes existentes reparten
+su estado entre borrador, pendiente, aprobado y rechazado.
+
+    cd backend
+    python benchmarks/datos_sinteticos.py [--carreras 20] [--examenes 20000] [--semilla 17]
+
+Escribe en la base de DATABASE_URL (aplica las migraciones primero); la base
+no debe tener carreras. También lo usa benchmarks/bench_api.py.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import date, time as dtime, timedelta
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+
+DIAS = ["LUNES", "MARTES", "MIÉRCOLES", "JUEVES", "VIERNES"]
+# Bloques de clase de una y dos horas entre 7:00 y 21:00
+BLOQUES = [(h, h + d) for d in (1, 2) for h in range(7, 22 - d)]
+TIPOS_AULA = [("salon", [25, 30, 35, 40, 45]), ("laboratorio", [20, 25, 30]), ("auditorio", [80, 120])]
+TIPOS_EXAMEN = ["Parcial", "Ordinario", "Extraordinario"]
+STATUS = ["borrador", "pendiente_aprobacion", "aprobado", "rechazado"]
+
+
+@dataclass
+class Tamanos:
+    carreras: int = 10
+    grupos_por_carrera: int = 8
+    materias_por_carrera: int = 40
+    materias_por_grupo: int = 7
+    aulas: int = 80
+    profesores: int = 250
+    examenes: int = 5000
+    usuarios: int = 1
+
+
+def siguiente_lunes(hoy: date = None) -> date:
+    hoy = hoy or date.today()
+    return hoy + timedelta(days=(7 - hoy.weekday()) % 7)
+
+
+def _horario_grupo(rnd, materias, por_grupo):
+    """Materias del grupo y sus bloques semanales, sin dos clases a la vez."""
+    ocupado = set()  # (dia, hora)
+    clases = []
+    for materia_id in rnd.sample(materias, min(por_grupo, len(materias))):
+        for _ in range(rnd.choice((2, 3))):
+            for _ in range(20):
+                dia = rnd.choice(DIAS)
+                inicio, fin = rnd.choice(BLOQUES)
+                horas = {(dia, h) for h in range(inicio, fin)}
+                if not horas & ocupado:
+                    ocupado |= horas
+                    clases.append((materia_id, dia, inicio, fin))
+                    break
+    return clases
+
+
+def generar(conn, tamanos: Tamanos, semilla: int = 17, fecha_inicio: date = None) -> dict:
+    """
+    Inserta los datos con INSERTs masivos en la conexión (dentro de su
+    transacción) y regresa los IDs generados por tabla.
+    """
+    from sqlalchemy import insert
+    from app import models
+    from app.estadisticas import recalcular
+    from app.hashing import hash_lote
+
+    rnd = random.Random(semilla)
+    fecha_inicio = fecha_inicio or siguiente_lunes()
+
+    carreras = list(range(1, tamanos.carreras + 1))
+    conn.execute(insert(models.Carrera), [
+        {"id": c, "nombre": f"Ingeniería Sintética {c}", "codigo": f"IS{c:03d}"} for c in carreras
+    ])
+    profesores = list(range(1, tamanos.profesores + 1))
+    conn.execute(insert(models.Profesor), [
+        {"id": p, "nombre": f"Profesor {p}", "email": f"profesor{p}@sintetico.edu"} for p in profesores
+    ])
+    aulas = []
+    for a in range(1, tamanos.aulas + 1):
+        tipo, capacidades = rnd.choices(TIPOS_AULA, weights=[80, 15, 5])[0]
+        aulas.append({"id": a, "nombre": f"{tipo[0].upper()}-{a}", "capacidad": rnd.choice(capacidades), "tipo": tipo})
+    conn.execute(insert(models.Aula), aulas)
+    conn.execute(insert(models.TipoExamen), [{"nombre": nombre} for nombre in TIPOS_EXAMEN])
+
+    # Cada carrera tiene su planta de profesores; algunos dan clase en varias
+    materias, materias_carrera = [], {}
+    for c in carreras:
+        planta = rnd.sample(profesores, min(len(profesores), max(5, tamanos.materias_por_carrera // 3)))
+        ids = list(range(len(materias) + 1, len(materias) + tamanos.materias_por_carrera + 1))
+        materias_carrera[c] = ids
+        materias += [{"id": m, "nombre": f"Materia {m}", "carrera_id": c, "profesor_id": rnd.choice(planta)} for m in ids]
+    conn.execute(insert(models.Materia), materias)
+
+    grupos, horarios, pares = [], [], []
+    for c in carreras:
+        for g in range(tamanos.grupos_por_carrera):
+            grupo_id = len(grupos) + 1
+            grupos.append({"id": grupo_id, "nombre_grupo": f"{c}{g + 1:02d}", "carrera_id": c})
+            aula_base = rnd.choice(aulas)["id"]
+            vistas = set()
+            for materia_id, dia, inicio, fin in _horario_grupo(rnd, materias_carrera[c], tamanos.materias_por_grupo):
+                horarios.append({
+                    "dia_semana": dia, "hora_inicio": dtime(inicio), "hora_fin": dtime(fin),
+                    "grupo_id": grupo_id, "materia_id": materia_id,
+                    # La mayoría de las clases del grupo son en su salón
+                    "aula_id": aula_base if rnd.random() < 0.7 else rnd.choice(aulas)["id"],
+                })
+                if materia_id not in vistas:
+                    vistas.add(materia_id)
+                    pares.append((materia_id, grupo_id))
+    conn.execute(insert(models.Grupo), grupos)
+    conn.execute(insert(models.Horario), horarios)
+
+    # Exámenes ya programados: pares (materia, grupo) reales en 3 semanas a partir de fecha_inicio
+    examenes = []
+    for _ in range(tamanos.examenes):
+        materia_id, grupo_id = rnd.choice(pares)
+        inicio, fin = rnd.choice(BLOQUES)
+        estado = rnd.choices(STATUS, weights=[60, 20, 15, 5])[0]
+        examenes.append({
+            "fecha": fecha_inicio + timedelta(days=rnd.randrange(21)),
+            "hora_inicio": dtime(inicio), "hora_fin": dtime(fin),
+            "tipo": rnd.choice(("PARCIAL", "PARCIAL", "FINAL")),
+            "materia_id": materia_id, "grupo_id": grupo_id, "aula_id": rnd.choice(aulas)["id"],
+            "sinodal_id": rnd.choice(profesores) if rnd.random() < 0.6 else None,
+            "status": estado,
+            "comentarios_rechazo": "Choque con otra evaluación" if estado == "rechazado" else None,
+        })
+    for i in range(0, len(examenes), 10000):
+        conn.execute(insert(models.Examen), examenes[i:i + 10000])
+
+    usuarios = [f"sintetico{i}" for i in range(tamanos.usuarios)]
+    if usuarios:
+        hashed = hash_lote(["sintetico"])[0]
+        conn.execute(insert(models.User), [
+            {"username": u, "hashed_password": hashed, "role": "servicios_escolares", "is_active": 1}
+            for u in usuarios
+        ])
+    recalcular(conn)
+
+    return {
+        "carreras": carreras,
+        "grupos": [g["id"] for g in grupos],
+        "materias": [m["id"] for m in materias],
+        "aulas": [a["id"] for a in aulas],
+        "profesores": profesores,
+        "horarios": len(horarios),
+        "examenes": len(examenes),
+        "usuarios": usuarios,
+        "fecha_inicio": fecha_inicio,
+    }
+
+
+def argumentos_tamanos(parser):
+    """Agrega un --opción por cada campo de Tamanos."""
+    for campo in fields(Tamanos):
+        parser.add_argument(f"--{campo.name.replace('_', '-')}", type=int, default=campo.default)
+
+
+def tamanos_de(args) -> Tamanos:
+    return Tamanos(**{campo.name: getattr(args, campo.name) for campo in fields(Tamanos)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argumentos_tamanos(parser)
+    parser.add_argument("--semilla", type=int, default=17)
+    args = parser.parse_args()
+
+    from sqlalchemy import func, select
+    from app import models
+    from app.database import engine
+    from app.migraciones import actualizar
+
+    actualizar()
+    tamanos = tamanos_de(args)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(models.Carrera)).scalar():
+            sys.exit("La base de datos ya tiene carreras; use una base vacía.")
+        t0 = time.perf_counter()
+        generado = generar(conn, tamanos, args.semilla)
+    print(f"Datos sintéticos generados en {time.perf_counter() - t0:.1f}s (semilla {args.semilla})")
+    for llave, valor in asdict(tamanos).items():
+        print(f"  {llave:22} {valor}")
+    print(f"  {'horarios':22} {generado['horarios']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Base de datos SQLite temporal con datos sintéticos pequeños
+(benchmarks/datos_sinteticos.py) y un TestClient de la aplicación.
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, 'benchmarks'))
+
+# La aplicación lee DATABASE_URL al importarse, así que se fija antes
+_tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+_tmp.close()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp.name}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+TAMANOS = dict(carreras=3, grupos_por_carrera=3, materias_por_carrera=8, materias_por_grupo=4,
+               aulas=10, profesores=20, examenes=200)
+
+
+@pytest.fixture(scope="session")
+def datos():
+    from datos_sinteticos import Tamanos, generar
+    from app.database import engine
+    from app.migraciones import actualizar
+
+    actualizar()
+    with engine.begin() as conn:
+        generado = generar(conn, Tamanos(**TAMANOS))
+    yield generado
+    engine.dispose()
+    os.unlink(_tmp.name)
+
+
+@pytest.fixture(scope="session")
+def cliente(datos):
+    from fastapi.testclient import TestClient
+    import app.main
+
+    with TestClient(app.main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def servicios_escolares(cliente, datos):
+    """Encabezados de autorización del usuario sintético (servicios_escolares)."""
+    return iniciar_sesion(cliente, datos["usuarios"][0], "sintetico")
+
+
+def crear_usuario(username, role, password="prueba"):
+    from app import models
+    from app.auth import get_password_hash
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        usuario = models.User(username=username, hashed_password=get_password_hash(password), role=role, is_active=1)
+        db.add(usuario)
+        db.commit()
+        return usuario.id
+    finally:
+        db.close()
+
+
+def iniciar_sesion(cliente, username, password="prueba"):
+    r = cliente.post("/api/auth/login", data={"username": username, "password": password})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def administrador(cliente):
+    crear_usuario("admin_pruebas", "administrador")
+    return iniciar_sesion(cliente, "admin_pruebas")
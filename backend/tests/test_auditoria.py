@@ -0,0 +1,90 @@
+"""Captura de cambios de app/auditoria.py: flush, escrituras masivas y rollback."""
+import json
+from datetime import time
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app import auditoria, models
+from app.database import SessionLocal
+
+
+@pytest.fixture
+def db(datos):
+    sesion = SessionLocal()
+    yield sesion
+    sesion.close()
+
+
+def registradas(db, desde: int):
+    """Entradas escritas después de la entrada `desde`, vaciando antes la cola."""
+    auditoria.cola.vaciar()
+    filas = db.execute(
+        select(models.Auditoria).where(models.Auditoria.id > desde).order_by(models.Auditoria.id)
+    ).scalars().all()
+    return [
+        (f.accion, f.tabla_afectada, f.registro_id,
+         json.loads(f.datos_anteriores) if f.datos_anteriores else None,
+         json.loads(f.datos_nuevos) if f.datos_nuevos else None)
+        for f in filas
+    ]
+
+
+def marca(db) -> int:
+    auditoria.cola.vaciar()
+    return db.execute(select(func.coalesce(func.max(models.Auditoria.id), 0))).scalar()
+
+
+def test_modificacion_por_orm(db):
+    desde = marca(db)
+    examen = db.query(models.Examen).order_by(models.Examen.id).first()
+    anterior = examen.hora_inicio
+    examen.hora_inicio = time(6, 30)
+    db.commit()
+
+    assert registradas(db, desde) == [(
+        'modificar', 'examenes', examen.id,
+        {'hora_inicio': str(anterior)},
+        {'hora_inicio': '06:30:00', 'grupo_id': examen.grupo_id, 'aula_id': examen.aula_id},
+    )]
+
+
+def test_modificacion_masiva(db):
+    desde = marca(db)
+    examen = db.query(models.Examen).order_by(models.Examen.id.desc()).first()
+    anterior = examen.tipo
+    db.execute(update(models.Examen).where(models.Examen.id == examen.id).values(tipo="FINAL MASIVO"))
+    db.commit()
+
+    assert registradas(db, desde) == [(
+        'modificar', 'examenes', examen.id,
+        {'tipo': anterior},
+        {'tipo': "FINAL MASIVO", 'grupo_id': examen.grupo_id, 'aula_id': examen.aula_id},
+    )]
+
+
+def test_password_oculto(db):
+    desde = marca(db)
+    usuario = models.User(username="auditado", hashed_password="hash-secreto", role="secretaria", is_active=1)
+    db.add(usuario)
+    db.commit()
+    db.execute(update(models.User).where(models.User.id == usuario.id).values(hashed_password="otro-hash"))
+    db.commit()
+
+    creado, modificado = registradas(db, desde)
+    assert creado[0] == 'crear' and creado[4]['hashed_password'] == '***'
+    assert modificado[0] == 'modificar'
+    assert modificado[3] == {'hashed_password': '***'} and modificado[4] == {'hashed_password': '***'}
+    assert 'secreto' not in json.dumps([creado, modificado])
+
+
+def test_rollback_descarta(db):
+    desde = marca(db)
+    examen = db.query(models.Examen).order_by(models.Examen.id).first()
+    examen.tipo = "NO SE GUARDA"
+    db.flush()
+    db.execute(update(models.Examen).where(models.Examen.id == examen.id).values(hora_fin=time(23, 0)))
+    db.rollback()
+    db.commit()
+
+    assert registradas(db, desde) == []
@@ -0,0 +1,31 @@
+"""Métricas de capacidad de app/calidad.py."""
+from datetime import date, time
+
+from app import calidad
+from app.scheduler import AulaDisponible, Asignacion, ExamenPorProgramar, Problema, Solucion
+
+LUNES = date(2026, 11, 2)
+
+
+def test_capacidad_contra_aula_de_la_clase():
+    problema = Problema(
+        examenes=[],
+        aulas=[AulaDisponible(1, 30), AulaDisponible(2, 20), AulaDisponible(3, 60)],
+        fechas=[LUNES],
+        bloques=[(time(9), time(11))],
+    )
+    # Grupo de 30 lugares en un aula de 20 y otro en un aula de 60
+    asignaciones = [
+        Asignacion(ExamenPorProgramar(1, 1, aula_preferida_id=1), LUNES, time(9), time(11), 2),
+        Asignacion(ExamenPorProgramar(2, 2, aula_preferida_id=1), LUNES, time(9), time(11), 3),
+    ]
+    metricas = calidad.evaluar(calidad.desde_solucion(Solucion(asignaciones, [], 0), problema), 1)
+
+    assert metricas.examenes_sobre_capacidad == 1
+    assert metricas.aprovechamiento_capacidad == round((30 / 20 + 30 / 60) / 2, 4)
+
+
+def test_calidad_de_la_base_mide_capacidad(cliente):
+    r = cliente.get("/api/calidad")
+    assert r.status_code == 200, r.text
+    assert r.json()["aprovechamiento_capacidad"] is not None
@@ -0,0 +1,88 @@
+"""
+Número de consultas SQL por petición (encabezado X-SQL-Queries de
+app/instrumentation.py). Los loaders de app/loaders.py cargan las relaciones
+con un número fijo de consultas; si alguna vuelve a cargarse fila por fila,
+el conteo crece con los datos y estas pruebas fallan.
+"""
+from datetime import time
+
+import pytest
+
+from app import cache, models
+from app.database import SessionLocal
+
+
+def consultas(cliente, ruta, **params):
+    r = cliente.get(ruta, params=params)
+    assert r.status_code == 200, r.text
+    return int(r.headers["X-SQL-Queries"]), r.json()
+
+
+def agregar_carrera(profesores, aulas):
+    """Carrera nueva con grupos, materias y horarios; el flush cambia la versión del catálogo."""
+    db = SessionLocal()
+    try:
+        n = db.query(models.Carrera).count() + 1
+        carrera = models.Carrera(nombre=f"Carrera Extra {n}", codigo=f"EX{n:03d}")
+        materias = [
+            models.Materia(nombre=f"Materia Extra {n}-{i}", carrera=carrera, profesor_id=profesores[i % len(profesores)])
+            for i in range(4)
+        ]
+        for g in range(3):
+            grupo = models.Grupo(nombre_grupo=f"X{n}{g}", carrera=carrera)
+            for i, materia in enumerate(materias):
+                db.add(models.Horario(
+                    dia_semana="LUNES", hora_inicio=time(7 + 2 * i), hora_fin=time(8 + 2 * i),
+                    grupo=grupo, materia=materia, aula_id=aulas[(g + i) % len(aulas)],
+                ))
+        db.add(carrera)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_carreras_no_crece_con_los_datos(cliente, datos):
+    # La primera petición crea la versión del catálogo; se mide sin caché
+    consultas(cliente, "/api/carreras")
+    cache.cache.clear()
+    antes, carreras = consultas(cliente, "/api/carreras")
+    assert len(carreras) == len(datos["carreras"])
+
+    agregar_carrera(datos["profesores"], datos["aulas"])
+    agregar_carrera(datos["profesores"], datos["aulas"])
+    despues, carreras = consultas(cliente, "/api/carreras")
+    assert len(carreras) == len(datos["carreras"]) + 2
+    assert sum(len(g["horarios"]) for c in carreras for g in c["grupos"]) > datos["horarios"]
+    assert despues == antes
+
+
+def test_carreras_desde_cache(cliente):
+    consultas(cliente, "/api/carreras")
+    # Con la respuesta en caché sólo se lee la versión del catálogo
+    en_cache, _ = consultas(cliente, "/api/carreras")
+    assert en_cache == 1
+
+    cache.cache.clear()
+    sin_cache, _ = consultas(cliente, "/api/carreras")
+    assert sin_cache > en_cache
+
+
+@pytest.mark.parametrize("vista", ["completa", "ligera"])
+def test_examenes_no_crece_con_los_datos(cliente, datos, vista):
+    pocos, examenes = consultas(cliente, "/api/examenes", vista=vista, limit=2)
+    assert len(examenes) == 2
+
+    muchos, examenes = consultas(cliente, "/api/examenes", vista=vista)
+    assert len(examenes) == datos["examenes"]
+    assert len({e["grupo_id"] for e in examenes}) > 1
+    assert muchos == pocos
+
+
+@pytest.mark.parametrize("vista", ["completa", "ligera"])
+def test_examenes_por_grupo(cliente, datos, vista):
+    conteos = set()
+    for grupo_id in datos["grupos"][:3]:
+        n, _ = consultas(cliente, "/api/examenes", vista=vista, grupo_id=grupo_id)
+        conteos.add(n)
+    total, _ = consultas(cliente, "/api/examenes", vista=vista)
+    assert conteos == {total}
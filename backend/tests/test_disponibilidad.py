@@ -0,0 +1,51 @@
+"""Caché de fechas y reconstrucción de la matriz de app/disponibilidad.py."""
+import threading
+from datetime import time, timedelta
+
+from app import disponibilidad
+from app.database import SessionLocal
+
+
+def test_fechas_acotadas(monkeypatch, datos):
+    monkeypatch.setattr(disponibilidad, "DISPONIBILIDAD_FECHAS", 3)
+    disponibilidad.invalidar()
+    fechas = [datos["fecha_inicio"] + timedelta(days=d) for d in range(6)]
+    db = SessionLocal()
+    try:
+        primeras = [disponibilidad.consultar(db, f, time(9), time(11)) for f in fechas]
+        m = disponibilidad.matriz(db)
+        assert list(m._fechas) == fechas[-3:]
+        assert all(fecha in fechas[-3:] for fecha, _ in m._examenes.values())
+        # Las fechas que salieron se vuelven a cargar igual
+        assert [disponibilidad.consultar(db, f, time(9), time(11)) for f in fechas] == primeras
+        assert len(m._fechas) == 3
+    finally:
+        db.close()
+
+
+def test_una_sola_reconstruccion(monkeypatch, datos):
+    construidas = []
+    original = disponibilidad.MatrizDisponibilidad.__init__
+
+    def contar(self, *args):
+        construidas.append(self)
+        original(self, *args)
+
+    monkeypatch.setattr(disponibilidad.MatrizDisponibilidad, "__init__", contar)
+    disponibilidad.invalidar()
+    resultados = []
+
+    def consultar():
+        db = SessionLocal()
+        try:
+            resultados.append(disponibilidad.matriz(db))
+        finally:
+            db.close()
+
+    hilos = [threading.Thread(target=consultar) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(construidas) == 1
+    assert all(m is construidas[0] for m in resultados)
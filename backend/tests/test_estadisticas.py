@@ -0,0 +1,81 @@
+"""Los resúmenes incrementales de app/estadisticas.py deben coincidir con recalcular()."""
+from datetime import time
+
+from sqlalchemy import delete, insert, select, update
+
+from app import estadisticas, models
+from app.database import SessionLocal, engine
+
+
+def resumenes(conn):
+    return {
+        modelo.__tablename__: sorted(tuple(fila) for fila in conn.execute(select(modelo.__table__)))
+        for modelo in (models.CargaProfesor, models.UsoAula)
+    }
+
+
+def recalculados():
+    with engine.connect() as conn:
+        estadisticas.recalcular(conn)
+        esperados = resumenes(conn)
+        conn.rollback()
+    return esperados
+
+
+def actuales():
+    with engine.connect() as conn:
+        return resumenes(conn)
+
+
+def test_escrituras_por_orm(datos):
+    db = SessionLocal()
+    try:
+        examenes = db.query(models.Examen).order_by(models.Examen.id).limit(3).all()
+        examenes[0].sinodal_id = datos["profesores"][-1]
+        examenes[0].hora_fin = time(examenes[0].hora_inicio.hour + 3)
+        examenes[1].aula_id = datos["aulas"][-1]
+        db.delete(examenes[2])
+        horario = db.query(models.Horario).order_by(models.Horario.id).first()
+        db.add(models.Horario(dia_semana="SÁBADO", hora_inicio=time(8), hora_fin=time(10),
+                              grupo_id=horario.grupo_id, materia_id=horario.materia_id, aula_id=horario.aula_id))
+        db.delete(horario)
+        db.commit()
+        assert actuales() == recalculados()
+
+        # Cambio de titular y de carrera de una materia
+        materia = db.query(models.Materia).order_by(models.Materia.id).first()
+        materia.profesor_id = datos["profesores"][-2]
+        materia.carrera_id = datos["carreras"][-1]
+        db.commit()
+        assert actuales() == recalculados()
+    finally:
+        db.close()
+
+
+def test_escrituras_masivas(datos):
+    db = SessionLocal()
+    try:
+        ids = [e for e, in db.query(models.Examen.id).order_by(models.Examen.id).limit(20)]
+        db.execute(update(models.Examen).where(models.Examen.id.in_(ids[:10])).values(sinodal_id=datos["profesores"][0]))
+        db.execute(delete(models.Examen).where(models.Examen.id.in_(ids[10:])))
+        horario = db.query(models.Horario).order_by(models.Horario.id.desc()).first()
+        db.execute(insert(models.Horario), [
+            {"dia_semana": "SÁBADO", "hora_inicio": time(h), "hora_fin": time(h + 1),
+             "grupo_id": horario.grupo_id, "materia_id": horario.materia_id, "aula_id": horario.aula_id}
+            for h in (8, 10)
+        ])
+        db.execute(update(models.Materia).where(models.Materia.id == horario.materia_id)
+                   .values(carrera_id=datos["carreras"][0]))
+        db.commit()
+        assert actuales() == recalculados()
+
+        # Borrar todo lo de un profesor deja sus filas en cero: se eliminan
+        profesor_id = datos["profesores"][0]
+        db.execute(delete(models.Examen).where(models.Examen.sinodal_id == profesor_id))
+        materias = select(models.Materia.id).where(models.Materia.profesor_id == profesor_id).scalar_subquery()
+        db.query(models.Horario).filter(models.Horario.materia_id.in_(materias)).delete(synchronize_session=False)
+        db.commit()
+        assert actuales() == recalculados()
+        assert profesor_id not in {fila[0] for fila in actuales()["carga_profesores"]}
+    finally:
+        db.close()
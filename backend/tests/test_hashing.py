@@ -0,0 +1,52 @@
+"""Pool acotado de bcrypt de app/hashing.py."""
+import threading
+import time
+
+import pytest
+
+from app import hashing
+from app.auth import pwd_context
+
+
+def test_lote_respeta_el_pool(monkeypatch):
+    pool = hashing.PoolHashing(workers=2, cola=2)
+    en_curso, maximo = [0], [0]
+    lock = threading.Lock()
+
+    def hash_lento(password):
+        with lock:
+            en_curso[0] += 1
+            maximo[0] = max(maximo[0], en_curso[0])
+        time.sleep(0.01)
+        with lock:
+            en_curso[0] -= 1
+        return f"hash-{password}"
+
+    monkeypatch.setattr(pwd_context, "hash", hash_lento)
+    try:
+        passwords = [str(i) for i in range(10)]
+        assert pool.hash_lote(passwords) == [f"hash-{p}" for p in passwords]
+        assert maximo[0] <= pool.workers
+        # El lote no se queda con lugares del pool
+        assert all(pool._cupo.acquire(blocking=False) for _ in range(pool.capacidad))
+    finally:
+        pool.shutdown()
+
+
+def test_lote_deja_lugar_para_inicios_de_sesion(monkeypatch):
+    pool = hashing.PoolHashing(workers=1, cola=1)
+    liberar = threading.Event()
+    monkeypatch.setattr(pwd_context, "hash", lambda password: liberar.wait() and password)
+    try:
+        hilo = threading.Thread(target=pool.hash_lote, args=(["a", "b", "c"],))
+        hilo.start()
+        time.sleep(0.05)
+        # Con el lote en curso todavía cabe una petición en la cola
+        futuro = pool.enviar(lambda: "login")
+        with pytest.raises(hashing.PoolSaturado):
+            pool.enviar(lambda: "otro")
+        liberar.set()
+        assert futuro.result() == "login"
+        hilo.join()
+    finally:
+        pool.shutdown()
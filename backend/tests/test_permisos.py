@@ -0,0 +1,27 @@
+"""Los endpoints de usuarios y las escrituras masivas piden rol."""
+
+from conftest import crear_usuario
+
+
+def test_generar_lote_requiere_rol(cliente, servicios_escolares):
+    cuerpo = {"carreras": "all", "dias": 5}
+    assert cliente.post("/api/generar-examenes/lote", json=cuerpo).status_code == 401
+    r = cliente.post("/api/generar-examenes/lote", json=cuerpo, headers=servicios_escolares)
+    assert r.status_code == 200, r.text
+    assert r.json()["creados"] > 0
+
+
+def test_listar_usuarios_solo_administrador(cliente, servicios_escolares, administrador):
+    assert cliente.get("/api/users").status_code == 401
+    assert cliente.get("/api/users", headers=servicios_escolares).status_code == 403
+    r = cliente.get("/api/users", headers=administrador)
+    assert r.status_code == 200
+    assert "admin_pruebas" in {u["username"] for u in r.json()}
+
+
+def test_borrar_usuario_solo_administrador(cliente, servicios_escolares, administrador):
+    usuario_id = crear_usuario("borrable", "secretaria")
+    assert cliente.delete(f"/api/users/{usuario_id}").status_code == 401
+    assert cliente.delete(f"/api/users/{usuario_id}", headers=servicios_escolares).status_code == 403
+    assert cliente.delete(f"/api/users/{usuario_id}", headers=administrador).status_code == 200
+    assert cliente.delete(f"/api/users/{usuario_id}", headers=administrador).status_code == 404
@@ -0,0 +1,39 @@
+"""Reparación de calendarios de app/reparacion.py."""
+from datetime import date
+
+from app.reparacion import Bloqueo, ExamenReparable, reparar
+
+LUNES, MARTES = date(2026, 11, 2), date(2026, 11, 3)
+AULAS = {1: 30, 2: 10, 3: 40}
+
+
+def test_mueve_solo_el_examen_bloqueado():
+    examenes = [
+        ExamenReparable(1, LUNES, 9 * 60, 11 * 60, aula_id=1, grupo_id=1, profesores=(10,), capacidad=30),
+        ExamenReparable(2, LUNES, 9 * 60, 11 * 60, aula_id=1, grupo_id=2, profesores=(20,), capacidad=30),
+    ]
+    # Además de chocar en el aula 1, el grupo 2 tiene una restricción a esa hora
+    bloqueos = [Bloqueo(('grupo', 2), LUNES, 8 * 60, 12 * 60)]
+    resultado = reparar(examenes, bloqueos, [LUNES, MARTES], [9 * 60, 11 * 60, 13 * 60], AULAS,
+                        presupuesto=0.5, semilla=17)
+
+    assert resultado.choques_iniciales > 0
+    assert resultado.choques_finales == 0
+    assert resultado.sin_resolver == []
+    assert [m.examen_id for m in resultado.movimientos] == [2]
+    for m in resultado.movimientos:
+        assert AULAS[m.despues[3]] >= AULAS[m.antes[3]]
+
+
+def test_no_pasa_a_aulas_mas_chicas():
+    # Cuatro exámenes en el aula 1 a la misma hora y sólo un horario: deben repartirse
+    # entre las aulas 1 y 3, nunca en la 2
+    examenes = [
+        ExamenReparable(e, LUNES, 9 * 60, 11 * 60, aula_id=1, grupo_id=e, profesores=(e,), capacidad=30)
+        for e in range(1, 5)
+    ]
+    resultado = reparar(examenes, [], [LUNES], [9 * 60], AULAS, presupuesto=0.3, semilla=3)
+
+    for m in resultado.movimientos:
+        assert m.despues[3] != 2
+    assert resultado.choques_finales > 0  # dos aulas no alcanzan para cuatro exámenes
@@ -0,0 +1,171 @@
+"""Restricciones duras de app/scheduler.py sobre problemas armados a mano."""
+import random
+from datetime import date, time
+
+import pytest
+
+from app import scheduler
+from app.scheduler import (
+    AulaDisponible, ExamenPorProgramar, Problema, _se_traslapan, dividir_problema, resolver,
+)
+
+LUNES = date(2026, 11, 2)
+
+
+def examen(materia_id, grupo_id, aula_id, profesor_id=None):
+    return ExamenPorProgramar(materia_id=materia_id, grupo_id=grupo_id, profesor_id=profesor_id,
+                              aula_preferida_id=aula_id)
+
+
+def test_examen_desplazado_no_pasa_a_aula_mas_chica():
+    # Tres grupos toman la clase en el aula 1 (30 lugares) y sólo hay un slot
+    problema = Problema(
+        examenes=[examen(m, m, 1) for m in (1, 2, 3)],
+        aulas=[AulaDisponible(1, 30), AulaDisponible(2, 10), AulaDisponible(3, 50), AulaDisponible(4, 35)],
+        fechas=[LUNES],
+        bloques=[(time(9), time(11))],
+    )
+    solucion = resolver(problema)
+
+    aulas = sorted(a.aula_id for a in solucion.asignaciones)
+    # El aula 2 es demasiado chica; la 4 se prefiere sobre la 3 por ser la más pequeña que sirve
+    assert aulas == [1, 3, 4]
+    assert solucion.sin_asignar == []
+
+
+def test_sin_aula_suficiente_queda_sin_asignar():
+    problema = Problema(
+        examenes=[examen(1, 1, 1), examen(2, 2, 1)],
+        aulas=[AulaDisponible(1, 30), AulaDisponible(2, 25)],
+        fechas=[LUNES],
+        bloques=[(time(9), time(11))],
+    )
+    solucion = resolver(problema)
+
+    assert [a.aula_id for a in solucion.asignaciones] == [1]
+    assert len(solucion.sin_asignar) == 1
+
+
+def problema_dos_carreras():
+    """
+    La carrera 1 tiene seis grupos que toman clase en el aula 1 y la carrera 2
+    un grupo en el aula 2; sólo hay un slot, así que la carrera 1 necesita
+    casi todas las aulas libres (3 a 8).
+    """
+    examenes = [
+        ExamenPorProgramar(materia_id=g, grupo_id=g, carrera_id=1, profesor_id=g, aula_preferida_id=1)
+        for g in range(1, 7)
+    ]
+    examenes.append(ExamenPorProgramar(materia_id=7, grupo_id=7, carrera_id=2, profesor_id=7, aula_preferida_id=2))
+    return Problema(
+        examenes=examenes,
+        aulas=[AulaDisponible(a, 30) for a in range(1, 9)],
+        fechas=[LUNES],
+        bloques=[(time(9), time(11))],
+    )
+
+
+def test_lote_asigna_lo_mismo_que_una_sola_llamada(monkeypatch):
+    problema = problema_dos_carreras()
+    completa = resolver(problema)
+    assert len(completa.asignaciones) == 7
+
+    # Las aulas libres se reparten según los exámenes de cada parte
+    partes = dividir_problema(problema)
+    assert sorted(len(p.aulas) for p in partes) == [1, 7]
+
+    monkeypatch.setattr(scheduler, "MIN_EXAMENES_PARALELO", 0)
+    try:
+        lote, n_partes = scheduler.resolver_en_paralelo(problema)
+    finally:
+        scheduler.cerrar_pool()
+    assert n_partes == 2
+    assert len(lote.asignaciones) == len(completa.asignaciones)
+    assert lote.sin_asignar == []
+
+
+def test_lote_chico_no_se_divide():
+    problema = problema_dos_carreras()
+    solucion, n_partes = scheduler.resolver_en_paralelo(problema)
+    assert n_partes == 1
+    assert len(solucion.asignaciones) == 7
+
+
+def choques(solucion):
+    """Pares de asignaciones que se traslapan en la misma fecha y comparten aula, grupo o profesor."""
+    encontrados = []
+    asignaciones = solucion.asignaciones
+    for i, a in enumerate(asignaciones):
+        for b in asignaciones[i + 1:]:
+            if a.fecha != b.fecha or not _se_traslapan((a.hora_inicio, a.hora_fin), (b.hora_inicio, b.hora_fin)):
+                continue
+            if a.aula_id == b.aula_id:
+                encontrados.append(('aula', a, b))
+            if a.examen.grupo_id == b.examen.grupo_id:
+                encontrados.append(('grupo', a, b))
+            if a.examen.profesor_id is not None and a.examen.profesor_id == b.examen.profesor_id:
+                encontrados.append(('profesor', a, b))
+    return encontrados
+
+
+def test_bloques_traslapados_no_comparten_recursos():
+    # 7-9 se traslapa con 8-9: el mismo grupo, profesor o aula no puede estar en ambos
+    problema = Problema(
+        examenes=[
+            ExamenPorProgramar(materia_id=1, grupo_id=1, profesor_id=10, aula_preferida_id=1),
+            ExamenPorProgramar(materia_id=2, grupo_id=1, profesor_id=11, aula_preferida_id=2),
+            ExamenPorProgramar(materia_id=3, grupo_id=2, profesor_id=10, aula_preferida_id=3),
+            ExamenPorProgramar(materia_id=4, grupo_id=3, profesor_id=12, aula_preferida_id=1),
+        ],
+        aulas=[AulaDisponible(a, 30) for a in (1, 2, 3)],
+        fechas=[LUNES],
+        bloques=[(time(7), time(9)), (time(8), time(9)), (time(9), time(11))],
+    )
+    solucion = resolver(problema)
+
+    assert choques(solucion) == []
+    # Hay dos momentos sin traslape (7-9 u 8-9, y 9-11): alcanzan para todos
+    assert solucion.sin_asignar == []
+
+
+def test_problemas_al_azar_sin_choques():
+    rnd = random.Random(7)
+    horas = [(7, 9), (8, 9), (8, 10), (9, 11), (10, 12), (11, 13), (12, 14)]
+    for _ in range(50):
+        aulas = [AulaDisponible(a, rnd.choice((20, 30, 40))) for a in range(1, rnd.randint(2, 6))]
+        examenes = [
+            ExamenPorProgramar(
+                materia_id=m, grupo_id=rnd.randint(1, 6), profesor_id=rnd.randint(1, 5),
+                aula_preferida_id=rnd.choice(aulas).id,
+            )
+            for m in range(rnd.randint(5, 30))
+        ]
+        problema = Problema(
+            examenes=examenes,
+            aulas=aulas,
+            fechas=scheduler.fechas_del_periodo(LUNES, rnd.randint(1, 4)),
+            bloques=sorted({(time(i), time(f)) for i, f in rnd.sample(horas, 4)}),
+        )
+        solucion = resolver(problema)
+
+        assert choques(solucion) == []
+        assert len(solucion.asignaciones) + len(solucion.sin_asignar) == len(examenes)
+        capacidad = {a.id: a.capacidad for a in aulas}
+        for a in solucion.asignaciones:
+            assert capacidad[a.aula_id] >= capacidad[a.examen.aula_preferida_id]
+
+
+@pytest.mark.parametrize("dias", [1, 5, 12])
+def test_fechas_del_periodo(dias):
+    fechas = scheduler.fechas_del_periodo(date(2026, 11, 4), dias)  # miércoles
+    assert len(fechas) == dias
+    assert all(f.weekday() < 5 for f in fechas)
+    assert fechas == sorted(set(fechas))
+
+
+@pytest.mark.parametrize("dias", [0, 61])
+def test_dias_fuera_de_rango(cliente, servicios_escolares, datos, dias):
+    r = cliente.post("/api/generar-examenes", params={"carrera_id": datos["carreras"][0], "dias": dias})
+    assert r.status_code == 422
+    r = cliente.post("/api/generar-examenes/lote", json={"dias": dias}, headers=servicios_escolares)
+    assert r.status_code == 422
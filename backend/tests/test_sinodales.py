@@ -0,0 +1,57 @@
+"""Asignación de sinodales de app/sinodales.py (flujo de costo mínimo y pasada voraz)."""
+from datetime import date, time
+
+from app.disponibilidad import mascara
+from app.sinodales import COSTO_OTRA_CARRERA, ExamenSinodal, asignar
+
+LUNES = date(2026, 11, 2)
+
+
+def examen(e_id, inicio, fin, carrera_id=1, titular_id=None, fecha=LUNES):
+    return ExamenSinodal(e_id, fecha, mascara(time(inicio), time(fin)), carrera_id, titular_id)
+
+
+def test_titular_no_es_sinodal():
+    examenes = [examen(1, 9, 11, titular_id=10), examen(2, 12, 14, titular_id=10)]
+    resultado = asignar(examenes, {1: [10], 2: [10, 20]}, {10: {1}, 20: {1}})
+
+    assert resultado.asignaciones == {2: 20}
+    assert resultado.sin_asignar == [1]
+
+
+def test_nadie_en_dos_examenes_a_la_vez():
+    examenes = [examen(1, 9, 11), examen(2, 10, 12)]
+    resultado = asignar(examenes, {1: [10], 2: [10]}, {10: {1}})
+
+    assert list(resultado.asignaciones.values()) == [10]
+    assert len(resultado.sin_asignar) == 1
+
+
+def test_cadena_de_traslapes_se_completa_con_la_pasada_voraz():
+    # A-B y B-C se traslapan (un solo bloque), pero A y C no: el profesor 10 puede tomar A y C
+    examenes = [examen(1, 9, 11), examen(2, 10, 12), examen(3, 11, 13)]
+    resultado = asignar(examenes, {1: [10], 2: [20], 3: [10]}, {10: {1}, 20: {1}})
+
+    assert resultado.asignaciones == {1: 10, 2: 20, 3: 10}
+    assert resultado.sin_asignar == []
+
+
+def test_la_carga_se_reparte():
+    examenes = [examen(e, 7 + 2 * e, 8 + 2 * e) for e in range(4)]
+    candidatos = {e: [10, 20] for e in range(4)}
+    resultado = asignar(examenes, candidatos, {10: {1}, 20: {1}})
+    assert resultado.nuevos == {10: 2, 20: 2}
+
+    # Con carga previa, el profesor más ocupado recibe menos
+    resultado = asignar(examenes, candidatos, {10: {1}, 20: {1}}, carga_previa={10: 2})
+    assert resultado.nuevos == {10: 1, 20: 3}
+
+
+def test_se_prefiere_la_misma_carrera():
+    examenes = [examen(1, 9, 11, carrera_id=1)]
+    carreras = {10: {2}, 20: {1}}
+    # Aunque el de la misma carrera ya tenga carga menor que el costo de otra carrera
+    resultado = asignar(examenes, {1: [10, 20]}, carreras, carga_previa={20: COSTO_OTRA_CARRERA - 1})
+
+    assert resultado.asignaciones == {1: 20}
+    assert resultado.costo == COSTO_OTRA_CARRERA - 1
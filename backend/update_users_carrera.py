@@ -7,44 +7,43 @@ import os
 
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app.database import engine, SessionLocal
+from app.database import SessionLocal
+from app.migraciones import actualizar
 from app.models import User
-from sqlalchemy import inspect, text
+from app.usuarios import provisionar
+
+# Mapeo de usernames a carreras
+CARRERA_MAP = {
+    'jefe_informatica': 'Licenciatura en Informática',
+    'jefe_enfermeria': 'Licenciatura en Enfermería',
+    'jefe_contaduria': 'Licenciatura en Contaduría',
+}
 
 def update_users():
     """Actualiza usuarios jefe_carrera con su carrera"""
+    # Las migraciones agregan la columna 'carrera' si falta
+    actualizar()
     db = SessionLocal()
     try:
-        # Verificar si la columna carrera existe
-        inspector = inspect(engine)
-        columns = [col['name'] for col in inspector.get_columns('users')]
-        
-        if 'carrera' not in columns:
-            print("Agregando columna 'carrera' a la tabla 'users'...")
-            db.execute(text("ALTER TABLE users ADD COLUMN carrera VARCHAR"))
-            db.commit()
-            print("✓ Columna 'carrera' agregada")
-        
-        # Mapeo de usernames a carreras
-        carrera_map = {
-            'jefe_informatica': 'Licenciatura en Informática',
-            'jefe_enfermeria': 'Licenciatura en Enfermería',
-            'jefe_contaduria': 'Licenciatura en Contaduría',
-        }
-        
-        # Actualizar usuarios jefe_carrera
         jefe_users = db.query(User).filter(User.role == 'jefe_carrera').all()
-        updated = 0
-        
+        filas = []
         for user in jefe_users:
-            if not user.carrera and user.username in carrera_map:
-                user.carrera = carrera_map[user.username]
-                print(f"✓ Actualizado {user.username} -> {user.carrera}")
-                updated += 1
+            if not user.carrera and user.username in CARRERA_MAP:
+                filas.append({'username': user.username, 'role': user.role, 'carrera': CARRERA_MAP[user.username]})
             elif user.carrera:
                 print(f"  {user.username} ya tiene carrera: {user.carrera}")
-        
+
+        # Misma validación y actualización que POST /api/users/lote
+        resultados = provisionar(db, filas, actualizar_existentes=True)
         db.commit()
+        updated = 0
+        for fila, resultado in zip(filas, resultados):
+            if resultado.estado == 'actualizado':
+                print(f"✓ Actualizado {fila['username']} -> {fila['carrera']}")
+                updated += 1
+            else:
+                print(f"✗ {fila['username']}: {resultado.detalle or resultado.estado}")
+
         print(f"\n✓ {updated} usuarios actualizados")
         return True
         